@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+import redis
+import redis.asyncio as redis_async
+from config.redis_config import REDIS_CONFIG
+from config.settings import DOSSIE_CACHE_CONFIG
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalho de 2 bytes no valor: formato (m = msgpack, j = json) e compressão
+# (z = zstd, g = zlib), para que workers com bibliotecas diferentes se entendam
+if HAS_ZSTD:
+    _compressor = zstandard.ZstdCompressor(level=3)
+    _descompressor = zstandard.ZstdDecompressor()
+
+def serializar(valor: Any) -> bytes:
+    if HAS_MSGPACK:
+        formato, dados = b"m", msgpack.packb(valor, use_bin_type=True)
+    else:
+        formato, dados = b"j", json.dumps(valor, ensure_ascii=False, default=str).encode()
+    if HAS_ZSTD:
+        return formato + b"z" + _compressor.compress(dados)
+    return formato + b"g" + zlib.compress(dados, 3)
+
+def desserializar(bruto: bytes) -> Any:
+    formato, compressao, dados = bruto[:1], bruto[1:2], bruto[2:]
+    if compressao == b"z":
+        if not HAS_ZSTD:
+            raise ValueError("Valor comprimido com zstd, mas zstandard não está instalado")
+        dados = _descompressor.decompress(dados)
+    else:
+        dados = zlib.decompress(dados)
+    if formato == b"m":
+        if not HAS_MSGPACK:
+            raise ValueError("Valor serializado com msgpack, mas msgpack não está instalado")
+        return msgpack.unpackb(dados, raw=False)
+    return json.loads(dados)
+
+class DossieCache:
+    """
+    Cache em dois níveis das seções do dossiê: LRU no processo e Redis compartilhado.
+
+    Cada seção tem chave própria (dossie:v{versão}:{cpf}:{seção}) e TTL próprio, então
+    uma consulta pode aproveitar as seções em cache e buscar só as que faltam.
+    Consultas simultâneas ao mesmo CPF são coalescidas: só a primeira vai ao banco e
+    as demais aguardam o mesmo resultado. Com o Redis fora, fica só o nível local.
+    """
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(DossieCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self.redis_client = redis_async.Redis(**{**REDIS_CONFIG, 'decode_responses': False})
+        self._redis_disponivel = True
+        self._proxima_sondagem = 0.0
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()
+        self._em_andamento: Dict[str, asyncio.Task] = {}
+        self._contadores = {"hits_memoria": 0, "hits_redis": 0, "misses": 0, "coalescidas": 0, "erros_redis": 0}
+        DossieCache._initialized = True
+
+    @staticmethod
+    def chave(cpf: str, secao: str) -> str:
+        return f"dossie:v{DOSSIE_CACHE_CONFIG['versao']}:{cpf}:{secao}"
+
+    # --- Nível local ---------------------------------------------------------
+
+    def _ler_memoria(self, chave: str):
+        entrada = self._memoria.get(chave)
+        if entrada is None:
+            return None
+        if time.monotonic() >= entrada[1]:
+            del self._memoria[chave]
+            return None
+        self._memoria.move_to_end(chave)
+        return entrada
+
+    def _gravar_memoria(self, chave: str, valor: Any, ttl: float):
+        ttl = min(ttl, DOSSIE_CACHE_CONFIG['ttl_memoria_max'])
+        self._memoria[chave] = (valor, time.monotonic() + ttl)
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > DOSSIE_CACHE_CONFIG['max_entradas_memoria']:
+            self._memoria.popitem(last=False)
+
+    # --- Redis ---------------------------------------------------------------
+
+    def _usar_redis(self) -> bool:
+        if self._redis_disponivel:
+            return True
+        if time.monotonic() < self._proxima_sondagem:
+            return False
+        # Deixa a próxima operação testar o Redis de novo
+        self._redis_disponivel = True
+        return True
+
+    def _falha_redis(self, e: Exception):
+        self._contadores["erros_redis"] += 1
+        if self._redis_disponivel:
+            logger.error(f"Erro no Redis do cache de dossiê, usando só a memória: {str(e)}")
+        self._redis_disponivel = False
+        self._proxima_sondagem = time.monotonic() + DOSSIE_CACHE_CONFIG['intervalo_sondagem']
+
+    # --- API -----------------------------------------------------------------
+
+    async def obter(self, cpf: str, secoes: Iterable[str]) -> Dict[str, Any]:
+        """Retorna {seção: valor} das seções em cache (memória e, para o resto, um MGET no Redis)"""
+        encontradas = {}
+        faltantes = []
+        for secao in secoes:
+            entrada = self._ler_memoria(self.chave(cpf, secao))
+            if entrada is not None:
+                encontradas[secao] = entrada[0]
+                self._contadores["hits_memoria"] += 1
+            else:
+                faltantes.append(secao)
+
+        if faltantes and self._usar_redis():
+            try:
+                valores = await self.redis_client.mget([self.chave(cpf, secao) for secao in faltantes])
+            except (redis.RedisError, OSError) as e:
+                self._falha_redis(e)
+                valores = [None] * len(faltantes)
+            for secao, bruto in zip(faltantes, valores):
+                if bruto is None:
+                    continue
+                try:
+                    valor = desserializar(bruto)
+                except Exception as e:
+                    logger.warning(f"Valor inválido no cache para {secao}: {str(e)}")
+                    continue
+                encontradas[secao] = valor
+                self._contadores["hits_redis"] += 1
+                # O TTL restante no Redis não é consultado; a memória usa o teto local
+                self._gravar_memoria(self.chave(cpf, secao), valor, DOSSIE_CACHE_CONFIG['ttl_secoes'][secao])
+
+        self._contadores["misses"] += sum(1 for secao in faltantes if secao not in encontradas)
+        return encontradas
+
+    async def guardar(self, cpf: str, secoes: Dict[str, Any]):
+        """Grava as seções nos dois níveis, cada uma com o TTL configurado"""
+        if not secoes:
+            return
+        ttls = DOSSIE_CACHE_CONFIG['ttl_secoes']
+        for secao, valor in secoes.items():
+            self._gravar_memoria(self.chave(cpf, secao), valor, ttls[secao])
+
+        if self._usar_redis():
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for secao, valor in secoes.items():
+                        pipe.set(self.chave(cpf, secao), serializar(valor), ex=ttls[secao])
+                    await pipe.execute()
+            except (redis.RedisError, OSError) as e:
+                self._falha_redis(e)
+
+    async def coalescer(self, cpf: str, carregar: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa `carregar` uma única vez por CPF entre as chamadas simultâneas.
+
+        A tarefa é protegida com shield: se quem a iniciou desistir (cliente
+        desconectou), as demais continuam esperando o mesmo resultado.
+        """
+        tarefa = self._em_andamento.get(cpf)
+        if tarefa is not None:
+            self._contadores["coalescidas"] += 1
+        else:
+            tarefa = asyncio.ensure_future(carregar())
+            self._em_andamento[cpf] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_andamento.pop(cpf, None))
+        return await asyncio.shield(tarefa)
+
+    def metricas(self) -> Dict:
+        return {
+            **self._contadores,
+            "entradas_memoria": len(self._memoria),
+            "em_andamento": len(self._em_andamento),
+            "redis_disponivel": self._redis_disponivel,
+            "msgpack": HAS_MSGPACK,
+            "zstd": HAS_ZSTD
+        }
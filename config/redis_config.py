@@ -18,5 +18,17 @@ REDIS_CONFIG = {
 RATE_LIMIT_CONFIG = {
     'window_size': 60,  # 1 minuto em segundos
     'requests_per_minute': 60,
-    'requests_per_hour': 1000
+    'requests_per_hour': 1000,
+    # Limites por chave de API (aplicados junto com os por IP)
+    'por_api_key': {
+        'requests_per_minute': int(os.getenv('RATE_LIMIT_API_KEY_MINUTO', 300)),
+        'requests_per_hour': int(os.getenv('RATE_LIMIT_API_KEY_HORA', 10000))
+    },
+    # Limitador em memória usado enquanto o Redis estiver fora (por worker)
+    'fallback_local': {
+        'shards': 16,
+        'intervalo_eviccao': 30,  # segundos entre limpezas de chaves ociosas (um shard por vez)
+        'intervalo_sondagem': 5,  # segundos entre tentativas de voltar ao Redis
+        'intervalo_log': 60  # segundos entre linhas de log agregadas
+    }
 } 
\ No newline at end of file
@@ -1,4 +1,5 @@
 from pathlib import Path
+import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -61,4 +62,198 @@ try:
     FEATURES['redis'] = True
     FEATURES['rate_limit'] = True
 except ImportError:
-    pass 
\ No newline at end of file
+    pass 
+
+# Execução paralela das seções do dossiê (CPF)
+FANOUT_CONFIG = {
+    'max_workers': int(os.getenv('FANOUT_MAX_WORKERS', 16)),
+    'timeout_padrao': float(os.getenv('FANOUT_TIMEOUT', 10)),  # segundos por seção
+    'timeouts': {
+        'enderecos': 30,  # leitura do CSV de endereços é a mais lenta
+    }
+}
+
+# Endereços: CSV bruto e índice SQLite gerado por scripts/csv_to_sqlite.py
+ENDERECOS_CONFIG = {
+    'csv_path': os.getenv('ENDERECOS_CSV_PATH', r'G:\SERASA DB\serasa_enderecos\srs_enderecos.csv'),
+    'tabela': 'enderecos',
+    'colunas': ['CONTATOS_ID', 'LOGR_TIPO', 'LOGR_NOME', 'LOGR_NUMERO',
+                'LOGR_COMPLEMENTO', 'BAIRRO', 'CIDADE', 'UF', 'CEP'],
+    'verificacao_indice_ttl': 60  # segundos entre verificações do arquivo de índice
+}
+
+# Pool de conexões SQLite (valores por banco podem ser sobrescritos em 'por_banco')
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', 1)),
+    'max_size': int(os.getenv('DB_POOL_MAX', 10)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),  # espera máxima por uma conexão livre
+    'somente_leitura': os.getenv('DB_SOMENTE_LEITURA', '1') == '1',  # abre com mode=ro&immutable=1
+    # Intervalo (s) entre checagens de inode/mtime do arquivo: um banco trocado por um rebuild é reaberto
+    'verificacao_arquivo': float(os.getenv('DB_VERIFICACAO_ARQUIVO', 5)),
+    'por_banco': {
+        'SRS_CONTATOS': {'min_size': 4, 'max_size': 20},
+        'SRS_HISTORICO_TELEFONES': {'min_size': 2, 'max_size': 16},
+    }
+}
+
+# Modo "attached": uma conexão por thread com os bancos do dossiê anexados ao SRS_CONTATOS
+# (o SQLite aceita no máximo 10 ATTACH por conexão)
+ATTACH_CONFIG = {
+    'ativo': os.getenv('DB_MODO_ATTACH', '0') == '1',
+    'bancos': [
+        'SRS_EMAIL',
+        'SRS_HISTORICO_TELEFONES',
+        'SRS_TB_MODELOS_ANALYTICS_SCORE',
+        'SRS_TB_PIS',
+        'SRS_TB_PROFISSAO',
+        'SRS_TB_TSE',
+        'SRS_TB_UNIVERSITARIOS',
+        'SRS_TB_IRPF',
+    ]
+}
+
+# Consulta de CPFs em lote
+LOTE_CONFIG = {
+    'max_cpfs': int(os.getenv('LOTE_MAX_CPFS', 1000)),
+    'tamanho_bloco': 500,  # CPFs/CONTATOS_IDs por cláusula IN
+    'timeout': float(os.getenv('LOTE_TIMEOUT', 60)),  # segundos por seção (tabela)
+}
+
+# Respostas em streaming (Accept: application/x-ndjson)
+STREAM_CONFIG = {
+    'linhas_por_bloco': int(os.getenv('STREAM_LINHAS_POR_BLOCO', 200)),  # linhas lidas do cursor por vez
+}
+
+# Índice FTS5 de nomes (banco auxiliar gerado por scripts/build_nome_fts.py)
+NOME_FTS_CONFIG = {
+    'banco': 'SRS_NOMES_FTS',
+    'tabela': 'nomes_fts',
+    'pesos': (10.0, 1.0, 1.0),  # bm25 para NOME, NOME_MAE, NOME_PAI
+    'verificacao_indice_ttl': 60,
+}
+
+# Chaves fonéticas dos nomes (banco auxiliar gerado por scripts/build_nome_fonetico.py)
+NOME_FONETICO_CONFIG = {
+    'banco': 'SRS_NOMES_FONETICO',
+    'tabela': 'nomes_fonetico',
+    'verificacao_indice_ttl': 60,
+}
+
+# Autocomplete de nomes (arquivo mapeado em memória, gerado por scripts/build_sugestoes_nomes.py)
+SUGESTOES_NOMES_CONFIG = {
+    'arquivo': os.getenv(
+        'SUGESTOES_NOMES_ARQUIVO',
+        os.path.join(os.getenv('DB_BASE_DIR', '/mnt/hdexterno'), 'SRS_NOMES_SUGESTOES', 'sugestoes_nomes.bin')
+    ),
+    'top_k': 10,  # sugestões guardadas por prefixo (máximo por requisição)
+    'limite_varredura': 2048,  # prefixos com mais nomes que isso têm o top-k pré-computado
+    'min_caracteres': 2,
+    'verificacao_arquivo_ttl': 60,  # segundos entre verificações de um arquivo novo
+}
+
+# Índice reverso de telefones (banco auxiliar gerado por scripts/build_telefone_reverso.py)
+TELEFONE_REVERSO_CONFIG = {
+    'banco': 'SRS_TELEFONES_REVERSO',
+    'tabela': 'telefones_reverso',
+    'verificacao_indice_ttl': 60,
+}
+
+# Cobrança write-behind: débito reservado no ledger local e enviado ao Firestore em lote.
+# Desligada por padrão: sem ela cada consulta debita numa transação do Firestore.
+BILLING_CONFIG = {
+    'write_behind': os.getenv('BILLING_WRITE_BEHIND', '0') == '1',
+    'ledger_path': os.getenv(
+        'BILLING_LEDGER_PATH',
+        os.path.join(os.getenv('DB_BASE_DIR', '/mnt/hdexterno'), 'billing', 'ledger.db')
+    ),
+    'intervalo_flush': float(os.getenv('BILLING_INTERVALO_FLUSH', 2)),  # segundos
+    'lote_flush': 400,  # lançamentos por transação do Firestore (limite de 500 escritas)
+    'ttl_saldo': 30,  # segundos até reler o saldo do Firestore
+    'retencao_dias': 30,  # lançamentos já enviados são apagados depois disso
+}
+
+# Cache da tabela de preços (configuracoes/precos no Firestore)
+PRECOS_CONFIG = {
+    'ttl': int(os.getenv('PRECOS_CACHE_TTL', 300)),  # segundos até revalidar em background
+    'timeout_firestore': 3,  # segundos de espera pela leitura quando não há cache
+    'listener': os.getenv('PRECOS_LISTENER', '1') == '1',  # atualiza o cache via on_snapshot
+}
+
+# Novas tentativas e circuit breaker das chamadas ao Firebase
+FIREBASE_RETRY_CONFIG = {
+    'tentativas': 3,
+    'atraso': 0.2,  # segundos; base do backoff exponencial (com jitter)
+    'atraso_max': 2.0,
+    'prazo': float(os.getenv('FIREBASE_PRAZO', 5)),  # segundos no total, somando tentativas e esperas
+    'circuito': {
+        'limite_falhas': 5,  # falhas transitórias seguidas até abrir o circuito
+        'tempo_aberto': 30,  # segundos recusando chamadas antes de sondar de novo
+    },
+}
+
+# Cache de tokens de admin já verificados (claims guardadas até o exp do token)
+TOKEN_CACHE_CONFIG = {
+    'max_tokens': 1000,
+}
+
+# Cache do dossiê por CPF: LRU no processo na frente do Redis, uma chave por seção
+DOSSIE_CACHE_CONFIG = {
+    'ativo': os.getenv('DOSSIE_CACHE', '1') == '1',
+    'versao': 1,  # incrementar quando o formato de alguma seção mudar
+    'max_entradas_memoria': 20000,  # seções guardadas no LRU local
+    'ttl_memoria_max': 300,  # segundos; limita por quanto tempo cada worker serve da memória
+    'intervalo_sondagem': 5,  # segundos entre tentativas de voltar ao Redis
+    'ttl_secoes': {  # segundos no Redis
+        'basicos': 7 * 86400,
+        'emails': 86400,
+        'telefones': 86400,
+        'enderecos': 3 * 86400,
+        'score': 86400,
+        'irpf': 30 * 86400,
+        'pis': 30 * 86400,
+        'profissao': 7 * 86400,
+        'educacao': 30 * 86400,
+        'eleitoral': 30 * 86400,
+    },
+}
+
+# Elasticsearch (busca por nome) e reindexação a partir do SRS_CONTATOS
+ELASTICSEARCH_CONFIG = {
+    'hosts': [os.getenv('ELASTICSEARCH_URL', 'http://elasticsearch:9200')],
+    'indice': os.getenv('ELASTICSEARCH_INDICE', 'pessoas'),  # alias; os dados ficam em pessoas_vN
+    'versoes_mantidas': 1,  # índices anteriores preservados após a troca do alias (para rollback)
+    'cliente': {
+        'connections_per_node': int(os.getenv('ES_CONEXOES_POR_NO', 25)),  # pool HTTP compartilhado pelos requests
+        'request_timeout': 10,  # segundos por requisição de busca
+        'max_retries': 2,
+        'retry_on_timeout': True,  # tenta outro nó (ou o mesmo) quando uma busca estoura o timeout
+        'timeout_ping': 2,  # health check do /api/status
+    },
+    'busca_nome': {
+        'campos': ['nome', 'cpf', 'nascimento', 'sexo', 'nome_mae', 'nome_pai'],  # _source devolvido
+        'max_limit': 100,  # resultados por página; páginas seguintes via cursor (search_after)
+        'minimo_termos': '2<75%',  # até 2 termos: todos; acima disso, 75% deles
+        # Boosts: nome completo exato > frase na mesma ordem > todos os termos sem correção
+        'pesos': {'exato': 20, 'frase': 8, 'termos': 3},
+    },
+    'roteamento': {
+        'intervalo_sondagem': 5,  # segundos entre as sondagens de saúde em background
+        'timeout_sondagem': 2,
+        'orcamento_latencia': 0.5,  # latência média (s) acima da qual a busca por nome vai para o SQLite
+        'timeout_busca': 1.5,  # teto de uma busca no ES antes de refazê-la no SQLite
+        'peso_media': 0.3,  # peso da última medida na média móvel de latência
+        'fator_candidatos': 5,  # candidatos do FTS por resultado quando há filtros (ano/sexo)
+    },
+    'indexacao': {
+        'particoes': int(os.getenv('ES_INDEXACAO_PARTICOES', 4)),  # faixas de rowid lidas em paralelo
+        'leitura_bloco': 10000,  # linhas por consulta keyset no SQLite
+        'chunk_size': 2000,  # documentos por requisição _bulk
+        'max_chunk_bytes': 15 * 1024 * 1024,
+        'max_retries': 5,  # novas tentativas do streaming_bulk em 429
+        'intervalo_checkpoint': 10,  # segundos entre gravações do checkpoint e do relatório
+        'checkpoint_path': os.getenv(
+            'ES_INDEXACAO_CHECKPOINT',
+            os.path.join(os.getenv('DB_BASE_DIR', '/mnt/hdexterno'), 'elasticsearch', 'indexacao_checkpoint.json')
+        ),
+    },
+}
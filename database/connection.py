@@ -1,9 +1,14 @@
 import sqlite3
 from pathlib import Path
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
+from collections import deque
+from typing import Dict, Optional
+import asyncio
 import logging
-from queue import Queue
+import threading
+import time
 import os
+from config.settings import DB_POOL_CONFIG, ATTACH_CONFIG
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -13,87 +18,393 @@ if not logger.handlers:
     handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
     logger.addHandler(handler)
 
-# Pool de conexões por banco
-connection_pools = {
-    "SRS_CONTATOS": Queue(maxsize=10),
-    "SRS_EMAIL": Queue(maxsize=10),
-    "SRS_HISTORICO_TELEFONES": Queue(maxsize=10),
-    "SRS_TB_MODELOS_ANALYTICS_SCORE": Queue(maxsize=10),
-    "SRS_TB_PIS": Queue(maxsize=10),
-    "SRS_TB_PROFISSAO": Queue(maxsize=10),
-    "SRS_TB_TSE": Queue(maxsize=10),
-    "SRS_TB_UNIVERSITARIOS": Queue(maxsize=10),
-    "SRS_MAPA_PARENTES_ANALYTICS": Queue(maxsize=10),
-    "SRS_TB_IRPF": Queue(maxsize=10)
-}
+# Bancos configurados (cada um em {DB_BASE_DIR}/{nome}.db/{nome}.db)
+BANCOS = (
+    "SRS_CONTATOS",
+    "SRS_EMAIL",
+    "SRS_HISTORICO_TELEFONES",
+    "SRS_TB_ENDERECOS",
+    "SRS_TB_MODELOS_ANALYTICS_SCORE",
+    "SRS_MAPA_PARENTES_ANALYTICS",
+    "SRS_TB_PIS",
+    "SRS_TB_PODER_AQUISITIVO",
+    "SRS_TB_PROFISSAO",
+    "SRS_TB_TSE",
+    "SRS_TB_UNIVERSITARIOS",
+    "SRS_TB_IRPF",
+    "SRS_NOMES_FTS",
+    "SRS_NOMES_FONETICO",
+    "SRS_TELEFONES_REVERSO"
+)
+
+class PoolEsgotadoError(Exception):
+    """Nenhuma conexão livre no pool dentro do tempo de espera"""
+    pass
+
+def get_db_path(db_name: str) -> Path:
+    """Retorna o caminho do arquivo .db de um banco configurado"""
+    if db_name not in BANCOS:
+        raise ValueError(f"Banco de dados não configurado: {db_name}")
 
-def create_db_connection(db_name: str):
-    """Cria uma nova conexão com o banco de dados"""
     # Define o diretório base para os bancos de dados
     base_dir = os.getenv('DB_BASE_DIR', '/mnt/hdexterno')
-    
-    db_paths = {
-        "SRS_CONTATOS": f"{base_dir}/SRS_CONTATOS.db/SRS_CONTATOS.db",
-        "SRS_HISTORICO_TELEFONES": f"{base_dir}/SRS_HISTORICO_TELEFONES.db/SRS_HISTORICO_TELEFONES.db",
-        "SRS_TB_ENDERECOS": f"{base_dir}/SRS_TB_ENDERECOS.db/SRS_TB_ENDERECOS.db",
-        "SRS_TB_MODELOS_ANALYTICS_SCORE": f"{base_dir}/SRS_TB_MODELOS_ANALYTICS_SCORE.db/SRS_TB_MODELOS_ANALYTICS_SCORE.db",
-        "SRS_MAPA_PARENTES_ANALYTICS": f"{base_dir}/SRS_MAPA_PARENTES_ANALYTICS.db/SRS_MAPA_PARENTES_ANALYTICS.db",
-        "SRS_TB_PIS": f"{base_dir}/SRS_TB_PIS.db/SRS_TB_PIS.db",
-        "SRS_TB_PROFISSAO": f"{base_dir}/SRS_TB_PROFISSAO.db/SRS_TB_PROFISSAO.db",
-        "SRS_TB_TSE": f"{base_dir}/SRS_TB_TSE.db/SRS_TB_TSE.db",
-        "SRS_TB_UNIVERSITARIOS": f"{base_dir}/SRS_TB_UNIVERSITARIOS.db/SRS_TB_UNIVERSITARIOS.db",
-        "SRS_TB_IRPF": f"{base_dir}/SRS_TB_IRPF.db/SRS_TB_IRPF.db"
-    }
-    
-    if db_name not in db_paths:
-        raise ValueError(f"Banco de dados não configurado: {db_name}")
-        
-    db_path = Path(db_paths[db_name])
-    
+    return Path(f"{base_dir}/{db_name}.db/{db_name}.db")
+
+def create_db_connection(db_name: str):
+    """Cria uma nova conexão com o banco de dados"""
+    db_path = get_db_path(db_name)
+
     # Cria o diretório pai se não existir
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    
+
     if not db_path.exists():
         logger.warning(f"Banco de dados não encontrado: {db_path}")
         # Cria um banco vazio se não existir
         conn = sqlite3.connect(str(db_path))
         conn.close()
         logger.info(f"Banco de dados vazio criado: {db_path}")
-    
-    conn = sqlite3.connect(str(db_path))
+
+    # As conexões do pool são usadas pelas threads do fan-out (uma thread por vez)
+    conn = sqlite3.connect(_uri_banco(db_path), uri=True, check_same_thread=False)
+    _aplicar_pragmas(conn)
+    return conn
+
+def _uri_banco(db_path: Path) -> str:
+    """URI de abertura do banco (somente leitura por padrão)"""
+    if DB_POOL_CONFIG['somente_leitura']:
+        # immutable=1 dispensa locks e verificação de alterações no arquivo
+        return f"{db_path.resolve().as_uri()}?mode=ro&immutable=1"
+    return db_path.resolve().as_uri()
+
+def _identidade_arquivo(db_path: Path):
+    """(inode, mtime) do arquivo; muda quando um rebuild troca o banco com os.replace"""
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns)
+
+def _aplicar_pragmas(conn):
+    """PRAGMAs aplicados uma única vez, na criação da conexão"""
     cursor = conn.cursor()
     cursor.execute("PRAGMA temp_store=MEMORY")
     cursor.execute("PRAGMA cache_size=-2000000")
-    cursor.execute("PRAGMA page_size=4096")
-    cursor.execute("PRAGMA journal_mode=OFF")
-    cursor.execute("PRAGMA synchronous=OFF")
+    if not DB_POOL_CONFIG['somente_leitura']:
+        cursor.execute("PRAGMA journal_mode=OFF")
+        cursor.execute("PRAGMA synchronous=OFF")
     cursor.execute("PRAGMA locking_mode=NORMAL")
     cursor.execute("PRAGMA read_uncommitted=1")
-    
-    return conn
+
+class SQLitePool:
+    """Pool limitado de conexões de um banco, com espera por conexão livre e métricas"""
+
+    def __init__(self, db_name: str, min_size: int, max_size: int, timeout: float):
+        self.db_name = db_name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._ociosas = deque()
+        self._cond = threading.Condition()
+        self._total = 0
+        self._em_uso = 0
+        self._criadas = 0
+        self._descartadas = 0
+        self._checkouts = 0
+        self._esperas = 0
+        self._timeouts = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        # Um descritor aberto continua lendo o arquivo antigo depois do os.replace de um
+        # rebuild: as conexões são marcadas com a geração do arquivo em que foram abertas
+        self._arquivo = None
+        self._geracao = 0
+        self._geracoes = {}
+        self._verificado_em = 0.0
+
+    def _abrir(self):
+        arquivo = _identidade_arquivo(get_db_path(self.db_name))
+        conn = create_db_connection(self.db_name)
+        with self._cond:
+            self._criadas += 1
+            if self._arquivo is None:
+                self._arquivo = arquivo
+            self._geracoes[conn] = self._geracao
+        logger.debug(f"Nova conexão criada para {self.db_name}")
+        return conn
+
+    def _verificar_arquivo(self):
+        """Fecha as conexões ociosas se o arquivo do banco foi substituído (checagem a cada N segundos)"""
+        agora = time.monotonic()
+        if agora - self._verificado_em < DB_POOL_CONFIG['verificacao_arquivo']:
+            return
+        self._verificado_em = agora
+        arquivo = _identidade_arquivo(get_db_path(self.db_name))
+        with self._cond:
+            if arquivo is None or self._arquivo is None or arquivo == self._arquivo:
+                return
+            self._arquivo = arquivo
+            self._geracao += 1
+            antigas = list(self._ociosas)
+            self._ociosas.clear()
+            for conn in antigas:
+                self._geracoes.pop(conn, None)
+            self._total -= len(antigas)
+            self._descartadas += len(antigas)
+            self._cond.notify_all()
+        for conn in antigas:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        # As conexões em uso são fechadas na devolução
+        logger.info(f"Arquivo de {self.db_name} substituído, reabrindo conexões")
+
+    def aquecer(self):
+        """Abre conexões até o mínimo configurado"""
+        while True:
+            with self._cond:
+                if self._total >= self.min_size:
+                    return
+                self._total += 1
+            try:
+                conn = self._abrir()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                raise
+            with self._cond:
+                self._ociosas.append(conn)
+                self._cond.notify()
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Retira uma conexão do pool, esperando até `timeout` segundos por uma livre"""
+        timeout = self.timeout if timeout is None else timeout
+        self._verificar_arquivo()
+        inicio = time.monotonic()
+        limite = inicio + timeout
+        criar = False
+        with self._cond:
+            esperou = False
+            while True:
+                if self._ociosas:
+                    conn = self._ociosas.pop()
+                    break
+                if self._total < self.max_size:
+                    self._total += 1
+                    criar = True
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._timeouts += 1
+                    raise PoolEsgotadoError(
+                        f"Pool de {self.db_name} esgotado ({self.max_size} conexões em uso por {timeout}s)"
+                    )
+                esperou = True
+                self._cond.wait(restante)
+
+            espera = time.monotonic() - inicio
+            self._em_uso += 1
+            self._checkouts += 1
+            if esperou:
+                self._esperas += 1
+            self._espera_total += espera
+            self._espera_max = max(self._espera_max, espera)
+
+        if criar:
+            try:
+                conn = self._abrir()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._em_uso -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def tentar_acquire(self):
+        """Retira uma conexão ociosa sem esperar nem abrir uma nova (None se não houver)"""
+        self._verificar_arquivo()
+        with self._cond:
+            if not self._ociosas:
+                return None
+            self._em_uso += 1
+            self._checkouts += 1
+            return self._ociosas.pop()
+
+    def release(self, conn, descartar: bool = False):
+        """Devolve a conexão ao pool (ou a fecha, se ficou em estado inválido)"""
+        with self._cond:
+            self._em_uso -= 1
+            antiga = self._geracoes.get(conn) != self._geracao
+            if descartar or antiga:
+                self._total -= 1
+                self._descartadas += 1
+                self._geracoes.pop(conn, None)
+            else:
+                self._ociosas.append(conn)
+            self._cond.notify()
+        if descartar or antiga:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            if descartar:
+                logger.debug(f"Fechando conexão com erro de {self.db_name}")
+
+    def metricas(self) -> Dict:
+        with self._cond:
+            return {
+                "em_uso": self._em_uso,
+                "ociosas": len(self._ociosas),
+                "abertas": self._total,
+                "max": self.max_size,
+                "criadas": self._criadas,
+                "descartadas": self._descartadas,
+                "checkouts": self._checkouts,
+                "esperas": self._esperas,
+                "timeouts": self._timeouts,
+                "espera_media_ms": round(self._espera_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "espera_max_ms": round(self._espera_max * 1000, 3)
+            }
+
+# Pool de conexões por banco (criado sob demanda)
+connection_pools: Dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_name: str) -> SQLitePool:
+    pool = connection_pools.get(db_name)
+    if pool is None:
+        get_db_path(db_name)  # valida o nome do banco
+        with _pools_lock:
+            pool = connection_pools.get(db_name)
+            if pool is None:
+                config = {**DB_POOL_CONFIG, **DB_POOL_CONFIG['por_banco'].get(db_name, {})}
+                pool = SQLitePool(db_name, config['min_size'], config['max_size'], config['timeout'])
+                connection_pools[db_name] = pool
+    return pool
+
+def aquecer_pools():
+    """Pré-abre as conexões mínimas dos bancos existentes (chamado no lifespan)"""
+    for db_name in BANCOS:
+        if not get_db_path(db_name).exists():
+            logger.warning(f"Pool de {db_name} não aquecido: banco não encontrado")
+            continue
+        try:
+            get_pool(db_name).aquecer()
+        except Exception as e:
+            logger.error(f"Erro ao aquecer pool de {db_name}: {str(e)}")
+
+def metricas_pools() -> Dict[str, Dict]:
+    return {db_name: pool.metricas() for db_name, pool in connection_pools.items()}
 
 @contextmanager
-def get_db_connection(db_name: str):
-    conn = None
+def get_db_connection(db_name: str, timeout: Optional[float] = None):
+    """Checkout bloqueante (para código que roda em threads do fan-out)"""
+    pool = get_pool(db_name)
+    conn = pool.acquire(timeout)
+    descartar = False
     try:
+        yield conn
+    except sqlite3.Error:
+        descartar = True
+        raise
+    finally:
+        pool.release(conn, descartar)
+
+@asynccontextmanager
+async def get_db_connection_async(db_name: str, timeout: Optional[float] = None):
+    """Checkout para código no event loop: a espera por conexão livre não bloqueia o loop"""
+    pool = get_pool(db_name)
+    conn = pool.tentar_acquire()
+    if conn is None:
+        loop = asyncio.get_running_loop()
+        futuro = loop.run_in_executor(None, pool.acquire, timeout)
         try:
-            conn = connection_pools[db_name].get_nowait()
-            logger.debug(f"Reusando conexão do pool para {db_name}")
-        except:
-            logger.debug(f"Criando nova conexão para {db_name}")
-            conn = create_db_connection(db_name)
+            conn = await asyncio.shield(futuro)
+        except asyncio.CancelledError:
+            # O acquire continua na thread: a conexão que ele obtiver volta direto ao pool
+            def _devolver(f):
+                if not f.cancelled() and f.exception() is None:
+                    pool.release(f.result())
+            futuro.add_done_callback(_devolver)
+            raise
+    descartar = False
+    try:
         yield conn
+    except sqlite3.Error:
+        descartar = True
+        raise
     finally:
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("SELECT 1")
-                cursor.fetchone()
-                connection_pools[db_name].put(conn)
-                logger.debug(f"Devolvendo conexão ao pool de {db_name}")
-            except:
-                try:
-                    conn.close()
-                except:
-                    pass
-                logger.debug(f"Fechando conexão com erro de {db_name}") 
\ No newline at end of file
+        pool.release(conn, descartar)
+
+# Conexões do modo attached: uma por thread do fan-out, reaproveitada entre requisições
+_attached_local = threading.local()
+_attached_abertas = 0
+_attached_lock = threading.Lock()
+
+def _arquivos_attached():
+    return tuple(
+        _identidade_arquivo(get_db_path(db_name))
+        for db_name in ("SRS_CONTATOS", *ATTACH_CONFIG['bancos'])
+    )
+
+def _fechar_attached(conn):
+    global _attached_abertas
+    _attached_local.conn = None
+    with _attached_lock:
+        _attached_abertas -= 1
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+def create_attached_connection():
+    """Abre o SRS_CONTATOS com os bancos de ATTACH_CONFIG anexados (schema = nome do banco)"""
+    contatos_path = get_db_path("SRS_CONTATOS")
+    if not contatos_path.exists():
+        raise FileNotFoundError(f"Banco de dados não encontrado: {contatos_path}")
+
+    conn = sqlite3.connect(_uri_banco(contatos_path), uri=True)
+    try:
+        for db_name in ATTACH_CONFIG['bancos']:
+            db_path = get_db_path(db_name)
+            if not db_path.exists():
+                raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
+            conn.execute(f"ATTACH DATABASE ? AS {db_name}", (_uri_banco(db_path),))
+        _aplicar_pragmas(conn)
+    except Exception:
+        conn.close()
+        raise
+    logger.debug(f"Conexão attached criada com {len(ATTACH_CONFIG['bancos'])} bancos anexados")
+    return conn
+
+@contextmanager
+def get_attached_connection():
+    """Conexão attached da thread atual (criada no primeiro uso)"""
+    global _attached_abertas
+    conn = getattr(_attached_local, "conn", None)
+    if conn is not None and time.monotonic() - _attached_local.verificado_em >= DB_POOL_CONFIG['verificacao_arquivo']:
+        _attached_local.verificado_em = time.monotonic()
+        if _arquivos_attached() != _attached_local.arquivos:
+            # Algum dos bancos foi substituído por um rebuild
+            logger.info("Banco do modo attached substituído, reabrindo a conexão")
+            _fechar_attached(conn)
+            conn = None
+    if conn is None:
+        arquivos = _arquivos_attached()
+        conn = create_attached_connection()
+        _attached_local.conn = conn
+        _attached_local.arquivos = arquivos
+        _attached_local.verificado_em = time.monotonic()
+        with _attached_lock:
+            _attached_abertas += 1
+    try:
+        yield conn
+    except sqlite3.Error:
+        # Descarta a conexão; a próxima chamada nesta thread abre outra
+        _fechar_attached(conn)
+        raise
+
+def conexoes_attached_abertas() -> int:
+    with _attached_lock:
+        return _attached_abertas
@@ -52,9 +52,16 @@ from services.endereco_service import get_endereco
 from utils.logger import setup_logger
 from middleware.transaction_logger import TransactionLoggerMiddleware
 from config.firebase_config import get_firebase_credentials
-from services.firebase_service import FirebaseService
-from database.connection import get_db_connection, connection_pools
+from services.firebase_service import FirebaseService, tokens_verificados
+from services.billing_ledger import BillingLedger
+from services.telefone_service import buscar_pessoas_por_telefone
+from database.connection import get_db_connection, get_db_connection_async, connection_pools, aquecer_pools, metricas_pools, conexoes_attached_abertas
 from services.external_api_service import ExternalAPIService
+from utils.fanout import metricas_secoes
+from utils.firebase_retry import metricas_circuitos
+from cache.dossie_cache import DossieCache
+from services.roteador_busca_nome import RoteadorBuscaNome
+from config.settings import BILLING_CONFIG
 
 # Configuração dos diretórios
 BASE_DIR = Path(__file__).parent.parent
@@ -108,9 +115,26 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Erro ao inicializar Firebase: {str(e)}")
         raise
+
+    # Cliente assíncrono do Elasticsearch, compartilhado por todos os requests
+    await elasticsearch_service.iniciar()
+    # Sondagem de saúde que decide entre Elasticsearch e SQLite na busca por nome
+    sondagem_es = asyncio.create_task(RoteadorBuscaNome().monitorar())
+
+    # Pré-abre as conexões SQLite para o primeiro request não pagar o custo
+    await asyncio.to_thread(aquecer_pools)
+    logger.info(f"Pools de conexão aquecidos: {list(metricas_pools().keys())}")
+
+    # Envio em background dos débitos reservados no ledger de cobrança
+    if BILLING_CONFIG['write_behind']:
+        await BillingLedger().iniciar()
     yield
     # Limpeza ao encerrar
     logger.info("Encerrando aplicação...")
+    sondagem_es.cancel()
+    if BILLING_CONFIG['write_behind']:
+        await BillingLedger().parar()
+    await elasticsearch_service.fechar()
 
 app = FastAPI(
     title="API de Consulta SERASA",
@@ -152,7 +176,7 @@ async def get_emails(cpf: str, contatos_conn):
         contatos_id = contato[0]
         
         # Agora buscamos os emails
-        with get_db_connection("SRS_EMAIL") as email_conn:
+        async with get_db_connection_async("SRS_EMAIL") as email_conn:
             email_cursor = email_conn.cursor()
             result = email_cursor.execute("""
                 SELECT DISTINCT EMAIL FROM SRS_EMAIL WHERE CONTATOS_ID = ?
@@ -181,7 +205,7 @@ async def get_telefones(cpf: str, contatos_conn):
         print(f"CONTATOS_ID encontrado: {contatos_id}")
         
         # Agora buscamos os telefones usando with
-        with get_db_connection("SRS_HISTORICO_TELEFONES") as tel_conn:
+        async with get_db_connection_async("SRS_HISTORICO_TELEFONES") as tel_conn:
             tel_cursor = tel_conn.cursor()
             result = tel_cursor.execute("""
                 SELECT DISTINCT DDD || TELEFONE as telefone
@@ -221,25 +245,34 @@ def remover_acentos(texto):
 async def consulta_nome(
     nome: str, 
     limit: int = 10,
+    ano_nascimento: Optional[int] = None,
+    sexo: Optional[str] = None,
+    apos: Optional[str] = None,
     api_key: str = Depends(api_key_header)
 ):
     """
-    Busca pessoas por nome completo
+    Busca pessoas por nome completo, ordenadas por relevância
     
-    - **nome**: Nome completo (nome + sobrenome)
-    - **limit**: Número máximo de resultados (padrão: 10)
+    - **nome**: Nome completo (nome + sobrenome); tolera pequenos erros de digitação
+    - **limit**: Número máximo de resultados (padrão: 10, máximo: 100)
+    - **ano_nascimento**: Filtra pelo ano de nascimento (opcional)
+    - **sexo**: Filtra pelo sexo, M ou F (opcional)
+    - **apos**: Cursor da página anterior (header X-Proximo-Cursor) para buscar a seguinte
     - **api_key**: Chave de API (obrigatória)
     
-    Retorna uma lista de pessoas encontradas
+    Retorna uma lista de pessoas encontradas; se houver mais resultados, o cursor da
+    próxima página vem no header X-Proximo-Cursor. O header X-Backend-Busca indica quem
+    respondeu: elasticsearch ou sqlite (fallback, sem paginação)
     """
     conn_id = str(uuid.uuid4())
     return await connection_manager.track_connection(
         conn_id,
-        _consulta_nome(nome, api_key, limit),
+        _consulta_nome(nome, api_key, limit, ano_nascimento, sexo, apos),
         timeout=300
     )
 
-async def _consulta_nome(nome: str, api_key: str, limit: int = 10):
+async def _consulta_nome(nome: str, api_key: str, limit: int = 10, ano_nascimento: Optional[int] = None,
+                         sexo: Optional[str] = None, apos: Optional[str] = None):
     if api_key != API_KEY:
         raise HTTPException(status_code=403, detail="Chave API inválida")
     
@@ -255,17 +288,24 @@ async def _consulta_nome(nome: str, api_key: str, limit: int = 10):
                 status_code=400,
                 detail="Por favor, forneça nome e sobrenome para busca"
             )
+        if sexo and sexo.upper() not in ("M", "F"):
+            raise HTTPException(status_code=400, detail="Sexo deve ser M ou F")
             
-        es_service = ElasticsearchService()
-        pessoas = await es_service.search_nome(nome, limit=limit)
+        # Elasticsearch ou, se ele estiver fora ou lento, o SQLite local
+        pagina, backend = await RoteadorBuscaNome().buscar(
+            " ".join(nomes), limit=limit, ano_nascimento=ano_nascimento, sexo=sexo, apos=apos
+        )
         
-        if not pessoas:
+        if not pagina["resultados"] and not apos:
             raise HTTPException(
                 status_code=404,
                 detail="Nenhuma pessoa encontrada com esse nome"
             )
         
-        return pessoas
+        headers = {"X-Backend-Busca": backend}
+        if pagina["proximo"]:
+            headers["X-Proximo-Cursor"] = pagina["proximo"]
+        return JSONResponse(content=pagina["resultados"], headers=headers)
             
     except HTTPException:
         raise
@@ -321,68 +361,17 @@ async def _consulta_telefone(telefone: str, api_key: str):
     print(f"\n=== Iniciando consulta para telefone: {telefone} ===")
     
     try:
-        # Primeiro busca o CONTATOS_ID pelo telefone
-        with get_db_connection("SRS_HISTORICO_TELEFONES") as tel_conn:
-            print("1. Conexão estabelecida com SRS_HISTORICO_TELEFONES")
-            tel_cursor = tel_conn.cursor()
-            
-            # Separa DDD e telefone para busca
-            ddd = telefone[:2] if len(telefone) >= 2 else ''
-            num = telefone[2:] if len(telefone) >= 2 else telefone
-            
-            print(f"2. Buscando DDD: {ddd}, Telefone: {num}")
-            
-            result = tel_cursor.execute("""
-                SELECT DISTINCT CONTATOS_ID 
-                FROM SRS_HISTORICO_TELEFONES 
-                WHERE DDD = ? AND TELEFONE = ?
-            """, (ddd, num))
-            
-            contatos_ids = [row[0] for row in result.fetchall()]
-            print(f"3. IDs encontrados: {len(contatos_ids)}")
-            
-            if not contatos_ids:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Nenhuma pessoa encontrada com esse telefone"
-                )
-            
-            # Agora busca os dados das pessoas usando os CONTATOS_IDs
-            pessoas = []
-            with get_db_connection("SRS_CONTATOS") as conn:
-                print("4. Conexão estabelecida com SRS_CONTATOS")
-                cursor = conn.cursor()
-                
-                for contatos_id in contatos_ids:
-                    result = cursor.execute("""
-                        SELECT NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO
-                        FROM SRS_CONTATOS 
-                        WHERE CONTATOS_ID = ?
-                    """, (contatos_id,))
-                    
-                    pessoa = result.fetchone()
-                    if pessoa:
-                        print(f"5. Processando pessoa: {pessoa[0]}")
-                        
-                        # Busca todos os telefones da pessoa
-                        tel_result = tel_cursor.execute("""
-                            SELECT DISTINCT DDD || TELEFONE as telefone
-                            FROM SRS_HISTORICO_TELEFONES 
-                            WHERE CONTATOS_ID = ?
-                        """, (contatos_id,))
-                        telefones = [row[0] for row in tel_result.fetchall()]
-                        
-                        pessoas.append({
-                            "nome": pessoa[0],
-                            "cpf": pessoa[1],
-                            "nascimento": pessoa[2],
-                            "nome_mae": pessoa[3],
-                            "nome_pai": pessoa[4],
-                            "sexo": pessoa[5],
-                            "telefones": telefones
-                        })
-            
-            return pessoas
+        # Índice reverso (telefone normalizado → CONTATOS_IDs) e leitura em lote das pessoas e telefones
+        pessoas = await buscar_pessoas_por_telefone(telefone)
+        print(f"Pessoas encontradas: {len(pessoas)}")
+        
+        if not pessoas:
+            raise HTTPException(
+                status_code=404,
+                detail="Nenhuma pessoa encontrada com esse telefone"
+            )
+        
+        return pessoas
             
     except Exception as e:
         print(f"ERRO: {str(e)}")
@@ -667,7 +656,7 @@ async def health():
 async def stats():
     """Retorna estatísticas da API"""
     try:
-        with get_db_connection("SRS_CONTATOS") as conn:
+        async with get_db_connection_async("SRS_CONTATOS") as conn:
             cursor = conn.cursor()
             stats = {
                 "total_registros": cursor.execute("SELECT COUNT(*) FROM SRS_CONTATOS").fetchone()[0],
@@ -679,6 +668,21 @@ async def stats():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/metricas", tags=["Status"])
+async def metricas():
+    """Retorna métricas internas (latência por seção do dossiê e pools de conexão)"""
+    return {
+        "secoes": metricas_secoes(),
+        "pools": metricas_pools(),
+        "conexoes_attached": conexoes_attached_abertas(),
+        "circuitos_firebase": metricas_circuitos(),
+        "tokens_admin": tokens_verificados.metricas(),
+        "cache_dossie": DossieCache().metricas(),
+        "busca_nome": RoteadorBuscaNome().metricas(),
+        "cobranca": await asyncio.to_thread(BillingLedger().metricas) if BILLING_CONFIG['write_behind'] else None,
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.get("/api/status")
 async def get_status():
     """Endpoint para verificar o status da API e seus serviços"""
@@ -689,7 +693,7 @@ async def get_status():
         # Verifica o status dos serviços opcionais
         redis_status = check_redis_connection()
         firebase_status = firebase_service.check_connection()
-        elasticsearch_status = elasticsearch_service.check_connection()
+        elasticsearch_status = await elasticsearch_service.check_connection()
         
         # Determina o status geral
         if db_status:
@@ -784,7 +788,7 @@ async def proxy_precos(
 async def check_database_connection():
     """Verifica se a conexão com o banco de dados está funcionando"""
     try:
-        with get_db_connection("SRS_CONTATOS") as conn:
+        async with get_db_connection_async("SRS_CONTATOS") as conn:
             conn.cursor().execute("SELECT 1")
         return True
     except Exception as e:
@@ -0,0 +1,65 @@
+import math
+import time
+from typing import Dict, List, Tuple
+
+
+class LimitadorLocal:
+    """
+    Token bucket em memória para quando o Redis estiver fora.
+
+    Os buckets ficam em dicionários particionados por hash da chave. Tudo roda no
+    event loop, sem await entre a leitura e a escrita, então não há lock. A cada
+    intervalo um shard é varrido e os buckets ociosos (já cheios de novo) são removidos.
+    """
+
+    def __init__(self, shards: int, intervalo_eviccao: float):
+        self._shards: List[Dict[str, List[float]]] = [{} for _ in range(shards)]
+        self._intervalo_eviccao = intervalo_eviccao
+        self._proxima_eviccao = time.monotonic() + intervalo_eviccao
+        self._proximo_shard = 0
+
+    def _shard(self, chave: str) -> Dict[str, List[float]]:
+        return self._shards[hash(chave) % len(self._shards)]
+
+    def verificar(self, limites: List[Tuple[str, int, int]]) -> Tuple[bool, int, List[int]]:
+        """
+        Consome um token de cada bucket se TODOS tiverem saldo.
+
+        - **limites**: [(chave, limite, período em ms)]
+
+        Retorna (permitido, retry_after_ms, restante por limite).
+        """
+        agora = time.monotonic()
+        self._evictar(agora)
+
+        buckets = []
+        retry_after = 0.0
+        for chave, limite, periodo_ms in limites:
+            taxa = limite / (periodo_ms / 1000)  # tokens por segundo
+            bucket = self._shard(chave).get(chave)
+            tokens = limite if bucket is None else min(limite, bucket[0] + (agora - bucket[1]) * taxa)
+            if tokens < 1:
+                retry_after = max(retry_after, (1 - tokens) / taxa)
+            buckets.append((chave, limite, taxa, tokens))
+
+        if retry_after > 0:
+            return False, math.ceil(retry_after * 1000), [int(b[3]) for b in buckets]
+
+        for chave, limite, taxa, tokens in buckets:
+            # [tokens, última atualização, instante em que o bucket estará cheio de novo]
+            self._shard(chave)[chave] = [tokens - 1, agora, agora + (limite - tokens + 1) / taxa]
+        return True, 0, [int(b[3] - 1) for b in buckets]
+
+    def _evictar(self, agora: float):
+        """Remove de um shard os buckets que já teriam recarregado por completo"""
+        if agora < self._proxima_eviccao:
+            return
+        self._proxima_eviccao = agora + self._intervalo_eviccao
+        shard = self._shards[self._proximo_shard]
+        self._proximo_shard = (self._proximo_shard + 1) % len(self._shards)
+        ociosos = [chave for chave, bucket in shard.items() if agora >= bucket[2]]
+        for chave in ociosos:
+            del shard[chave]
+
+    def total_chaves(self) -> int:
+        return sum(len(shard) for shard in self._shards)
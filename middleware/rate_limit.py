@@ -1,89 +1,208 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import asyncio
+import hashlib
+import math
 import time
 import redis
-from typing import Dict, Tuple
+import redis.asyncio as redis_async
+from typing import Dict, List, Tuple
 import logging
 from config.public_settings import PUBLIC_CONFIG
 from config.redis_config import REDIS_CONFIG, RATE_LIMIT_CONFIG
+from middleware.local_rate_limit import LimitadorLocal
 
 logger = logging.getLogger(__name__)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        try:
-            self.redis_client = redis.Redis(**REDIS_CONFIG)
-            # Testa a conexão
-            self.redis_client.ping()
-            logger.info("Conexão com Redis estabelecida com sucesso")
-        except redis.ConnectionError as e:
-            logger.error(f"Erro ao conectar com Redis: {str(e)}")
-            self.redis_client = None
-        
+# GCRA para vários limites numa única chamada. Cada chave em KEYS tem o par
+# (limite, período em ms) correspondente em ARGV. A requisição só é contada se
+# TODOS os limites permitirem; assim a verificação e o incremento são atômicos.
+# Retorna {permitido, retry_after_ms, restante_1, ..., restante_n}.
+GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local novos = {}
+local restantes = {}
+local retry_after = 0
+for i, chave in ipairs(KEYS) do
+    local limite = tonumber(ARGV[2 * i - 1])
+    local periodo = tonumber(ARGV[2 * i])
+    local intervalo = periodo / limite
+    local tat = tonumber(redis.call('GET', chave) or agora)
+    if tat < agora then tat = agora end
+    local novo_tat = tat + intervalo
+    local liberado_em = novo_tat - periodo
+    if agora < liberado_em then
+        retry_after = math.max(retry_after, math.ceil(liberado_em - agora))
+        restantes[i] = 0
+    else
+        novos[i] = novo_tat
+        restantes[i] = math.floor((periodo - (novo_tat - agora)) / intervalo)
+    end
+end
+
+if retry_after > 0 then
+    return {0, retry_after, unpack(restantes)}
+end
+for i, chave in ipairs(KEYS) do
+    redis.call('SET', chave, novos[i], 'PX', math.ceil(novos[i] - agora))
+end
+return {1, 0, unpack(restantes)}
+"""
+
+# Períodos dos limites: (nome, chave de configuração, duração em segundos)
+PERIODOS = (
+    ("minute", "requests_per_minute", RATE_LIMIT_CONFIG['window_size']),
+    ("hour", "requests_per_hour", 3600),
+)
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # Cliente assíncrono: a conexão é aberta no primeiro uso, sem bloquear o event loop
+        self.redis_client = redis_async.Redis(**REDIS_CONFIG)
+        self.gcra = self.redis_client.register_script(GCRA_SCRIPT)
         self.rate_limits = RATE_LIMIT_CONFIG
         self.window_size = RATE_LIMIT_CONFIG['window_size']
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        # Se o Redis não estiver disponível, permite a requisição
-        if not self.redis_client:
-            logger.warning("Redis não disponível, rate limiting desativado")
-            return await call_next(request)
+        # Fallback em memória enquanto o Redis estiver fora
+        self.fallback = RATE_LIMIT_CONFIG['fallback_local']
+        self.local = LimitadorLocal(self.fallback['shards'], self.fallback['intervalo_eviccao'])
+        self._redis_disponivel = True
+        self._proxima_sondagem = 0.0
+        self._proximo_log = 0.0
+        self._requisicoes_locais = 0
+        self._bloqueios_locais = 0
+
+    def _limites(self, request: Request) -> List[Tuple[str, str, int, int]]:
+        """(sujeito, período, limite, duração em ms) de cada limite aplicável à requisição"""
+        sujeitos = [(f"ip:{request.client.host}", self.rate_limits)]
+        api_key = request.headers.get("X-API-Key")
+        if api_key:
+            # A chave de API não vai em claro para o Redis
+            digest = hashlib.sha256(api_key.encode()).hexdigest()[:32]
+            sujeitos.append((f"key:{digest}", self.rate_limits['por_api_key']))
+
+        return [
+            (sujeito, periodo, limites[config], duracao * 1000)
+            for sujeito, limites in sujeitos
+            for periodo, config, duracao in PERIODOS
+        ]
+
+    async def verificar(self, request: Request) -> Tuple[bool, int, Dict[str, int], List[str]]:
+        """
+        Executa o script uma vez.
+
+        Retorna (permitido, retry_after_ms, restante por período, limites esgotados).
+        """
+        limites = self._limites(request)
+        keys = [f"rate_limit:{sujeito}:{periodo}" for sujeito, periodo, _, _ in limites]
+        permitido, retry_after_ms, valores = await self._executar(keys, limites)
+
+        # O restante informado é o menor entre os sujeitos (IP e chave de API)
+        restantes = {}
+        esgotados = []
+        for (sujeito, periodo, _, _), restante in zip(limites, valores):
+            restantes[periodo] = min(restantes.get(periodo, restante), restante)
+            if restante == 0:
+                esgotados.append(f"{sujeito.split(':')[0]}:{periodo}")
+        return permitido, retry_after_ms, restantes, esgotados
 
+    async def _executar(self, keys: List[str], limites: List[Tuple[str, str, int, int]]) -> Tuple[bool, int, List[int]]:
+        """Verifica no Redis; se ele estiver fora, no limitador local deste worker"""
+        if self._redis_disponivel or await self._sondar_redis():
+            try:
+                args = [valor for _, _, limite, duracao in limites for valor in (limite, duracao)]
+                resultado = await self.gcra(keys=keys, args=args)
+                return bool(resultado[0]), int(resultado[1]), [int(r) for r in resultado[2:]]
+            except redis.RedisError as e:
+                self._redis_disponivel = False
+                self._proxima_sondagem = time.monotonic() + self.fallback['intervalo_sondagem']
+                logger.error(f"Erro no Redis durante rate limiting, usando limitador local: {str(e)}")
+
+        permitido, retry_after_ms, valores = self.local.verificar([
+            (key, limite, duracao) for key, (_, _, limite, duracao) in zip(keys, limites)
+        ])
+        self._requisicoes_locais += 1
+        if not permitido:
+            self._bloqueios_locais += 1
+        self._logar_fallback()
+        return permitido, retry_after_ms, valores
+
+    async def _sondar_redis(self) -> bool:
+        """Testa o Redis no máximo uma vez por intervalo; volta a usá-lo se responder"""
+        agora = time.monotonic()
+        if agora < self._proxima_sondagem:
+            return False
+        self._proxima_sondagem = agora + self.fallback['intervalo_sondagem']
+        try:
+            await asyncio.wait_for(self.redis_client.ping(), timeout=1)
+        except (redis.RedisError, asyncio.TimeoutError, OSError):
+            return False
+        self._logar_fallback(forcar=True)
+        logger.info("Redis disponível novamente, rate limiting voltou ao Redis")
+        self._redis_disponivel = True
+        return True
+
+    def _logar_fallback(self, forcar: bool = False):
+        """Uma linha de log por intervalo com o resumo do limitador local"""
+        agora = time.monotonic()
+        if not forcar and agora < self._proximo_log:
+            return
+        if self._requisicoes_locais:
+            logger.warning(
+                f"Redis indisponível: {self._requisicoes_locais} requisições limitadas localmente, "
+                f"{self._bloqueios_locais} bloqueadas, {self.local.total_chaves()} chaves em memória"
+            )
+        self._proximo_log = agora + self.fallback['intervalo_log']
+        self._requisicoes_locais = 0
+        self._bloqueios_locais = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Ignora rate limiting para endpoints de status e configuração
-        if request.url.path in ['/api/status', '/api/config']:
-            return await call_next(request)
+        if scope["type"] != "http" or scope["path"] in ['/api/status', '/api/config']:
+            await self.app(scope, receive, send)
+            return
 
+        request = Request(scope)
         client_ip = request.client.host
-        current_time = int(time.time())
-        
+
         try:
-            # Verifica limite por minuto
-            minute_key = f"rate_limit:{client_ip}:minute:{current_time // self.window_size}"
-            minute_count = int(self.redis_client.get(minute_key) or 0)
-            
-            if minute_count >= self.rate_limits['requests_per_minute']:
-                logger.warning(f"Rate limit excedido para IP {client_ip} (minuto)")
-                raise HTTPException(
-                    status_code=429,
-                    detail="Muitas requisições. Tente novamente em alguns segundos."
-                )
-            
-            # Verifica limite por hora
-            hour_key = f"rate_limit:{client_ip}:hour:{current_time // 3600}"
-            hour_count = int(self.redis_client.get(hour_key) or 0)
-            
-            if hour_count >= self.rate_limits['requests_per_hour']:
-                logger.warning(f"Rate limit excedido para IP {client_ip} (hora)")
-                raise HTTPException(
-                    status_code=429,
-                    detail="Limite de requisições por hora excedido. Tente novamente mais tarde."
-                )
-            
-            # Incrementa contadores
-            pipe = self.redis_client.pipeline()
-            pipe.incr(minute_key)
-            pipe.incr(hour_key)
-            pipe.expire(minute_key, self.window_size)
-            pipe.expire(hour_key, 3600)  # 1 hora
-            pipe.execute()
-            
-            # Adiciona headers de rate limit
-            response = await call_next(request)
-            response.headers["X-RateLimit-Limit-Minute"] = str(self.rate_limits['requests_per_minute'])
-            response.headers["X-RateLimit-Remaining-Minute"] = str(self.rate_limits['requests_per_minute'] - minute_count - 1)
-            response.headers["X-RateLimit-Limit-Hour"] = str(self.rate_limits['requests_per_hour'])
-            response.headers["X-RateLimit-Remaining-Hour"] = str(self.rate_limits['requests_per_hour'] - hour_count - 1)
-            
-            return response
-            
-        except redis.RedisError as e:
-            logger.error(f"Erro no Redis durante rate limiting: {str(e)}")
-            # Em caso de erro no Redis, permite a requisição mas loga o erro
-            return await call_next(request)
-        except HTTPException:
-            raise
+            permitido, retry_after_ms, restantes, esgotados = await self.verificar(request)
         except Exception as e:
             logger.error(f"Erro inesperado no rate limiting: {str(e)}")
-            return await call_next(request) 
\ No newline at end of file
+            await self.app(scope, receive, send)
+            return
+
+        if not permitido:
+            if self._redis_disponivel:
+                # Com o limitador local os bloqueios entram no log agregado
+                logger.warning(f"Rate limit excedido para IP {client_ip} ({', '.join(esgotados)})")
+            detalhe = (
+                "Limite de requisições por hora excedido. Tente novamente mais tarde."
+                if restantes.get("minute", 0) > 0
+                else "Muitas requisições. Tente novamente em alguns segundos."
+            )
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": detalhe},
+                headers={"Retry-After": str(math.ceil(retry_after_ms / 1000))}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_com_headers(message: Message):
+            if message["type"] == "http.response.start":
+                # Adiciona headers de rate limit
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit-Minute"] = str(self.rate_limits['requests_per_minute'])
+                headers["X-RateLimit-Remaining-Minute"] = str(restantes["minute"])
+                headers["X-RateLimit-Limit-Hour"] = str(self.rate_limits['requests_per_hour'])
+                headers["X-RateLimit-Remaining-Hour"] = str(restantes["hour"])
+            await send(message)
+
+        await self.app(scope, receive, send_com_headers)
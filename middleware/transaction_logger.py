@@ -1,13 +1,21 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 import time
 from datetime import datetime
 
 logger = logging.getLogger('transactions')
 
-class TransactionLoggerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class TransactionLoggerMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
         start_time = time.time()
         
         # Log da requisição
@@ -21,26 +29,32 @@ class TransactionLoggerMiddleware(BaseHTTPMiddleware):
         Client: {request.client.host}
         User-Agent: {request.headers.get('user-agent')}
         """)
-        
-        try:
-            response = await call_next(request)
-            
-            # Log do resultado
-            process_time = time.time() - start_time
-            logger.info(f"""
+
+        response_started = False
+
+        async def send_com_log(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                # Log do resultado (quando os headers da resposta ficam prontos)
+                process_time = time.time() - start_time
+                logger.info(f"""
             Transaction Complete:
             ID: {transaction_id}
-            Status: {response.status_code}
+            Status: {message['status']}
             Duration: {process_time:.2f}s
             """)
-            
-            return response
-            
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_com_log)
         except Exception as e:
-            logger.error(f"""
+            # Falhas depois do início da resposta já foram registradas como concluídas
+            if not response_started:
+                logger.error(f"""
             Transaction Failed:
             ID: {transaction_id}
             Error: {str(e)}
             Duration: {time.time() - start_time:.2f}s
             """)
-            raise 
\ No newline at end of file
+            raise
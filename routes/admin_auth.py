@@ -43,6 +43,8 @@ async def login(request: LoginRequest):
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro no login: {str(e)}")
         raise HTTPException(
@@ -68,6 +70,8 @@ async def verify_admin_token(credentials: HTTPBearer = Security(security)):
             )
         return claims
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro na autenticação admin: {str(e)}")
         raise HTTPException(
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request
 from fastapi.security.api_key import APIKeyHeader
 from typing import List, Optional, Dict
-from config.settings import SECURITY, DATABASES
+from config.settings import SECURITY, DATABASES, LOTE_CONFIG, SUGESTOES_NOMES_CONFIG
 from validators.cpf_validator import CPFValidator
 from cache.redis_cache import cache_decorator
 import apsw
@@ -13,10 +13,19 @@ import logging
 from services.pessoa_service import (
     get_emails, get_telefones, get_score, get_pis,
     get_profissao, get_dados_universitarios, get_dados_eleitorais,
-    get_parentes, get_irpf, get_endereco, _consulta_cpf as consulta_cpf_service
+    get_parentes, get_irpf, get_endereco, _consulta_cpf as consulta_cpf_service,
+    consulta_cpf_lote as consulta_cpf_lote_service
 )
-from database.connection import get_db_connection
+from database.connection import get_db_connection, get_db_connection_async
+from utils.fanout import executar_em_thread
 from utils.timeout import executar_com_timeout
+from utils.streaming import quer_ndjson, stream_query, resposta_ndjson
+from services.telefone_service import contatos_ids_por_telefone
+from services.nome_service import (
+    indice_disponivel as indice_nomes_disponivel, ranquear_nomes, montar_busca_por_rowids,
+    indice_fonetico_disponivel, ranquear_nomes_foneticos
+)
+from services.sugestoes_nomes import obter_indice as obter_sugestoes_nomes
 import asyncio
 
 try:
@@ -55,25 +64,24 @@ async def _consulta_nome(nome: str, api_key: str, limit: int = 10):
     nome = remover_acentos(nome).upper()
     print(f"\n=== Iniciando consulta para nome: {nome} ===")
     
-    try:
-        # Validação de nome + sobrenome
-        nomes = nome.strip().split()
-        if len(nomes) < 2:
-            raise HTTPException(
-                status_code=400,
-                detail="Por favor, forneça nome e sobrenome para busca"
-            )
+    # Validação de nome + sobrenome
+    nomes = nome.strip().split()
+    if len(nomes) < 2:
+        raise HTTPException(
+            status_code=400,
+            detail="Por favor, forneça nome e sobrenome para busca"
+        )
 
-        conn = get_db_connection("SRS_CONTATOS")
+    async with get_db_connection_async("SRS_CONTATOS") as conn:
         cursor = conn.cursor()
-        
+    
         result = cursor.execute("""
             SELECT NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO 
             FROM SRS_CONTATOS 
             WHERE NOME LIKE ? 
             LIMIT ?
         """, (f"%{nome}%", limit))
-        
+    
         pessoas = []
         for row in result:
             pessoas.append({
@@ -84,39 +92,38 @@ async def _consulta_nome(nome: str, api_key: str, limit: int = 10):
                 "nome_pai": row[4],
                 "sexo": row[5]
             })
-            
+        
         return pessoas
-    finally:
-        conn.close()
+
+def _formatar_pessoa(row) -> Dict:
+    return {
+        "nome": row[0],
+        "cpf": row[1],
+        "nascimento": row[2],
+        "nome_mae": row[3],
+        "nome_pai": row[4],
+        "sexo": row[5]
+    }
+
+def _consultar_pessoas(query: str, params) -> List[Dict]:
+    """Executa a busca no SRS_CONTATOS (bloqueante, roda no pool de threads)"""
+    with get_db_connection("SRS_CONTATOS") as conn:
+        return [_formatar_pessoa(row) for row in conn.cursor().execute(query, params)]
+
+def _montar_busca_telefone(contatos_ids: List):
+    query = f"""
+        SELECT NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO 
+        FROM SRS_CONTATOS 
+        WHERE CONTATOS_ID IN ({','.join('?' * len(contatos_ids))})
+    """
+    return query, contatos_ids
 
 async def _consulta_telefone(telefone: str, api_key: str):
-    with get_db_connection("SRS_HISTORICO_TELEFONES") as conn:
-        cursor = conn.cursor()
-        
-        try:
-            result = cursor.execute("""
-                SELECT NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO 
-                FROM SRS_CONTATOS 
-                WHERE CPF IN (
-                    SELECT CPF FROM SRS_HISTORICO_TELEFONES 
-                    WHERE TELEFONE = ?
-                )
-            """, (telefone,))
-            
-            pessoas = []
-            for row in result:
-                pessoas.append({
-                    "nome": row[0],
-                    "cpf": row[1],
-                    "nascimento": row[2],
-                    "nome_mae": row[3],
-                    "nome_pai": row[4],
-                    "sexo": row[5]
-                })
-            
-            return pessoas
-        finally:
-            cursor.close()
+    contatos_ids = await contatos_ids_por_telefone(telefone)
+    if not contatos_ids:
+        return []
+    query, params = _montar_busca_telefone(contatos_ids)
+    return await executar_em_thread(_consultar_pessoas, query, params)
 
 class ConsultaCPFRequest(BaseModel):
     cpf: str = Field(
@@ -176,6 +183,69 @@ async def consulta_cpf(
             }
         )
 
+class ConsultaCPFLoteRequest(BaseModel):
+    cpfs: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=LOTE_CONFIG['max_cpfs'],
+        description="Lista de CPFs (com ou sem pontuação)"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "cpfs": ["12345678901", "98765432100"]
+            }
+        }
+
+@router.post("/consulta/cpf/lote")
+async def consulta_cpf_lote(
+    user_id: str = Query(..., description="ID do usuário no Firebase"),
+    api_key: str = Depends(api_key_header),
+    payload: ConsultaCPFLoteRequest = Body(...)
+):
+    """Consulta o dossiê de vários CPFs com uma única cobrança"""
+    try:
+        # Normaliza, remove duplicados (mantendo a ordem) e separa os inválidos
+        cpfs = list(dict.fromkeys(''.join(filter(str.isdigit, cpf)) for cpf in payload.cpfs))
+        validos = [cpf for cpf in cpfs if CPFValidator.validate(cpf)]
+        invalidos = [cpf for cpf in cpfs if cpf not in validos]
+        logger.info(f"Recebido lote de {len(payload.cpfs)} CPFs ({len(validos)} válidos) - User ID: {user_id}")
+
+        if not validos:
+            raise HTTPException(
+                status_code=400,
+                detail={"code": "VALIDATION_ERROR", "message": "Nenhum CPF válido no lote"}
+            )
+
+        # Uma única cobrança pelo total de CPFs válidos
+        preco_service = get_preco_service()
+        valor_consulta = await preco_service.get_preco_consulta("cpf")
+        firebase_service = get_firebase_service()
+        await firebase_service.verificar_saldo(
+            user_id, "cpf_lote", valor_consulta * len(validos), {"quantidade": len(validos)}
+        )
+
+        result = await consulta_cpf_lote_service(validos)
+        return {
+            "total": len(cpfs),
+            "encontrados": len(result["resultados"]),
+            "invalidos": invalidos,
+            **result
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro na consulta em lote: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "code": "INTERNAL_ERROR",
+                "message": str(e)
+            }
+        )
+
 @router.get("/consulta/", response_model=List[Dict])
 async def consulta_nome(
     nome: str = Query(..., min_length=3),
@@ -187,7 +257,7 @@ async def consulta_nome(
         raise HTTPException(status_code=403, detail="Chave API inválida")
         
     try:
-        with get_db_connection("SRS_CONTATOS") as conn:
+        async with get_db_connection_async("SRS_CONTATOS") as conn:
             cursor = conn.cursor()
             nome_busca = f"%{remover_acentos(nome.upper())}%"
             
@@ -224,14 +294,93 @@ async def consulta_nome(
             detail={"code": "SEARCH_ERROR", "message": str(e)}
         )
 
+def _montar_busca_nome(nome: str, limit: int):
+    """Monta a query de busca por nome com LIKE (usada quando o índice FTS não existe)"""
+    # Normaliza e divide o nome
+    nome_normalizado = remover_acentos(nome.upper())
+    nomes = nome_normalizado.strip().split()
+    
+    if len(nomes) < 2:
+        raise HTTPException(
+            status_code=400,
+            detail="Por favor, forneça nome e sobrenome para busca"
+        )
+    
+    # Monta query dinâmica com LIKE otimizado
+    where_conditions = []
+    params = []
+    
+    # Primeiro nome e último nome são mais importantes
+    where_conditions.append("upper(nome) LIKE ?")
+    params.append(f"{nomes[0]}%")
+    
+    where_conditions.append("upper(nome) LIKE ?")
+    params.append(f"%{nomes[-1]}")
+    
+    # Nomes do meio (se houver)
+    for nome_meio in nomes[1:-1]:
+        where_conditions.append("upper(nome) LIKE ?")
+        params.append(f"%{nome_meio}%")
+    
+    query = f"""
+        SELECT 
+            NOME, 
+            CPF, 
+            NASC, 
+            NOME_MAE, 
+            NOME_PAI, 
+            SEXO,
+            CASE 
+                WHEN upper(NOME) = ? THEN 100
+                WHEN upper(NOME) LIKE ? THEN 90
+                ELSE (
+                    length(?) - (
+                        abs(length(NOME) - length(?)) + 
+                        (length(NOME) - length(replace(upper(NOME), ?, '')))
+                    )
+                )
+            END as score
+        FROM SRS_CONTATOS 
+        WHERE {' AND '.join(where_conditions)}
+        ORDER BY score DESC
+        LIMIT ?
+    """
+    
+    # Adiciona parâmetros para o CASE
+    params = [nome_normalizado, f"{nome_normalizado}%", 
+             nome_normalizado, nome_normalizado, 
+             nome_normalizado] + params + [limit]
+    return query, params
+
+@router.get("/consulta/nome/sugestoes", response_model=List[Dict])
+async def sugestoes_nome(
+    q: str = Query(..., min_length=SUGESTOES_NOMES_CONFIG['min_caracteres'], max_length=100),
+    limit: int = Query(default=10, ge=1, le=SUGESTOES_NOMES_CONFIG['top_k']),
+    api_key: str = Depends(api_key_header)
+):
+    """
+    Autocomplete de nomes completos: os nomes mais frequentes que começam com `q`.
+
+    Sem acento e sem diferenciar maiúsculas; espaço no fim de `q` restringe à palavra
+    já digitada. Não consulta o banco nem cobra créditos.
+    """
+    if api_key != SECURITY['api_key']:
+        raise HTTPException(status_code=403, detail="Chave API inválida")
+
+    indice = obter_sugestoes_nomes()
+    if indice is None:
+        raise HTTPException(status_code=503, detail="Sugestões de nomes indisponíveis")
+    return indice.sugerir(q, limit)
+
 @router.post("/consulta/nome", response_model=List[Dict])
 async def consulta_nome_post(
+    request: Request,
     nome: str = Query(..., min_length=3),
     user_id: str = Query(..., description="ID do usuário no Firebase"),
     limit: int = Query(default=10, le=100),
     api_key: str = Depends(api_key_header)
 ):
-    """Consulta pessoas por nome (POST)"""
+    """Consulta pessoas por nome (POST). Com Accept: application/x-ndjson a resposta é enviada em streaming."""
     try:
         # Obtém o preço da consulta
         preco_service = get_preco_service()
@@ -242,94 +391,27 @@ async def consulta_nome_post(
         await firebase_service.verificar_saldo(user_id, "nome", valor_consulta, {"nome": nome})
         
         logger.info(f"Iniciando consulta para nome: {nome}")
+        query, params = _montar_busca_nome(nome, limit)
+        rowids = None
+        if indice_fonetico_disponivel():
+            # Chaves fonéticas: acha as variantes de grafia (SOUSA/SOUZA, LUIS/LUIZ),
+            # só com nomes que têm todas as chaves da busca
+            rowids = await ranquear_nomes_foneticos(nome, limit) or None
+        if (rowids is None or len(rowids) < limit) and indice_nomes_disponivel():
+            # Índice FTS5: ranking bm25 no banco auxiliar (também cobre termos incompletos),
+            # completando a página depois dos resultados fonéticos
+            ranking = await ranquear_nomes(nome, limit)
+            rowids = list(dict.fromkeys((rowids or []) + ranking))[:limit]
+        if rowids is not None:
+            # Leitura das pessoas por rowid, na ordem do ranking
+            query, params = montar_busca_por_rowids(rowids)
+
+        if quer_ndjson(request):
+            return resposta_ndjson(
+                stream_query(request, "SRS_CONTATOS", query, params, _formatar_pessoa)
+            )
         
-        with get_db_connection("SRS_CONTATOS") as conn:
-            cursor = conn.cursor()
-            
-            # Otimizações SQLite
-            cursor.execute("PRAGMA temp_store = MEMORY")
-            cursor.execute("PRAGMA cache_size = -2000000")  # Usa ~2GB de RAM para cache
-            cursor.execute("PRAGMA synchronous = OFF")
-            cursor.execute("PRAGMA journal_mode = MEMORY")
-            
-            # Normaliza e divide o nome
-            nome_normalizado = remover_acentos(nome.upper())
-            nomes = nome_normalizado.strip().split()
-            
-            if len(nomes) < 2:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Por favor, forneça nome e sobrenome para busca"
-                )
-            
-            # Cria índice temporário se não existir
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_nome_upper 
-                ON SRS_CONTATOS(upper(nome))
-            """)
-            
-            # Monta query dinâmica com LIKE otimizado
-            where_conditions = []
-            params = []
-            
-            # Primeiro nome e último nome são mais importantes
-            where_conditions.append("upper(nome) LIKE ?")
-            params.append(f"{nomes[0]}%")
-            
-            where_conditions.append("upper(nome) LIKE ?")
-            params.append(f"%{nomes[-1]}")
-            
-            # Nomes do meio (se houver)
-            for nome_meio in nomes[1:-1]:
-                where_conditions.append("upper(nome) LIKE ?")
-                params.append(f"%{nome_meio}%")
-            
-            query = f"""
-                SELECT 
-                    NOME, 
-                    CPF, 
-                    NASC, 
-                    NOME_MAE, 
-                    NOME_PAI, 
-                    SEXO,
-                    CASE 
-                        WHEN upper(NOME) = ? THEN 100
-                        WHEN upper(NOME) LIKE ? THEN 90
-                        ELSE (
-                            length(?) - (
-                                abs(length(NOME) - length(?)) + 
-                                (length(NOME) - length(replace(upper(NOME), ?, '')))
-                            )
-                        )
-                    END as score
-                FROM SRS_CONTATOS 
-                WHERE {' AND '.join(where_conditions)}
-                ORDER BY score DESC
-                LIMIT ?
-            """
-            
-            # Adiciona parâmetros para o CASE
-            params = [nome_normalizado, f"{nome_normalizado}%", 
-                     nome_normalizado, nome_normalizado, 
-                     nome_normalizado] + params + [limit]
-            
-            result = cursor.execute(query, params)
-            
-            pessoas = []
-            for row in result:
-                pessoas.append({
-                    "nome": row[0],
-                    "cpf": row[1],
-                    "nascimento": row[2],
-                    "nome_mae": row[3],
-                    "nome_pai": row[4],
-                    "sexo": row[5]
-                })
-            
-            if not pessoas:
-                return []
-                
-            return pessoas
+        return await executar_em_thread(_consultar_pessoas, query, params)
             
     except Exception as e:
         logger.error(f"Erro na consulta por nome: {str(e)}")
@@ -340,11 +422,12 @@ async def consulta_nome_post(
 
 @router.post("/consulta/telefone")
 async def consulta_telefone_post(
+    request: Request,
     telefone: str = Query(..., min_length=8, description="Telefone para consulta"),
     user_id: str = Query(..., description="ID do usuário no Firebase"),
     api_key: str = Depends(api_key_header)
 ):
-    """Consulta pessoas por telefone (POST)"""
+    """Consulta pessoas por telefone (POST). Com Accept: application/x-ndjson a resposta é enviada em streaming."""
     try:
         # Obtém o preço da consulta
         preco_service = get_preco_service()
@@ -354,6 +437,13 @@ async def consulta_telefone_post(
         firebase_service = get_firebase_service()
         await firebase_service.verificar_saldo(user_id, "telefone", valor_consulta, {"telefone": telefone})
         
+        if quer_ndjson(request):
+            contatos_ids = await contatos_ids_por_telefone(telefone)
+            query, params = _montar_busca_telefone(contatos_ids)
+            return resposta_ndjson(
+                stream_query(request, "SRS_CONTATOS", query, params, _formatar_pessoa)
+            )
+
         return await _consulta_telefone(telefone, api_key)
     except Exception as e:
         logger.error(f"Erro na consulta por telefone: {str(e)}")
@@ -3,6 +3,7 @@ import { coinsService } from './services/coins.service.js';
 import { showNotification } from './utils/notifications.js';
 import { maskService } from './services/mask.service.js';
 import { errorService } from './services/error.service.js';
+import API_CONFIG from './config.js';
 
 document.addEventListener('DOMContentLoaded', function() {
     // Referências das modais
@@ -148,8 +149,42 @@ document.addEventListener('DOMContentLoaded', function() {
             inputGroup.classList.remove('error');
             this.setCustomValidity('');
         }
+
+        carregarSugestoesNome(this.value);
     });
 
+    // Sugestões de nomes completos enquanto o usuário digita
+    let sugestoesTimer = null;
+    let sugestoesController = null;
+    function carregarSugestoesNome(texto) {
+        clearTimeout(sugestoesTimer);
+        if (texto.trim().length < 2) return;
+
+        sugestoesTimer = setTimeout(async () => {
+            if (sugestoesController) sugestoesController.abort();
+            sugestoesController = new AbortController();
+            try {
+                const params = new URLSearchParams({ q: texto });
+                const response = await fetch(`${API_CONFIG.BASE_URL}/consulta/nome/sugestoes?${params}`, {
+                    headers: { 'X-API-Key': API_CONFIG.API_KEY },
+                    signal: sugestoesController.signal
+                });
+                if (!response.ok) return;
+
+                const sugestoes = await response.json();
+                const lista = document.getElementById('nomeSugestoes');
+                lista.replaceChildren(...sugestoes.map(({ nome }) => {
+                    const opcao = document.createElement('option');
+                    opcao.value = nome;
+                    return opcao;
+                }));
+            } catch (error) {
+                // Sugestão é opcional: falha silenciosa (inclusive requisições canceladas)
+                if (error.name !== 'AbortError') console.warn('Erro ao buscar sugestões de nomes:', error);
+            }
+        }, 150);
+    }
+
     // Atualizar handler do botão de telefone
     document.getElementById('searchTelefone').addEventListener('click', async function() {
         const input = document.getElementById('telefoneInput');
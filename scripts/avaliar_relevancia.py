@@ -0,0 +1,84 @@
+"""
+Avalia a relevância da busca por nome contra a fixture scripts/fixtures/relevancia_nomes.json.
+
+Cria um índice temporário com o mesmo mapping do índice de pessoas, carrega os
+documentos da fixture, roda cada consulta com a query de produção (montar_query_nome)
+e reporta MRR, hits@1 e hits@3. O índice temporário é removido no fim.
+
+Uso: python scripts/avaliar_relevancia.py [--fixture caminho.json] [--manter-indice]
+"""
+import argparse
+import json
+import sys
+import uuid
+from pathlib import Path
+
+# Corrige o caminho para importação
+current_dir = Path(__file__).resolve().parent
+src_dir = current_dir.parent
+sys.path.append(str(src_dir))
+
+from elasticsearch import helpers
+
+from services.elasticsearch_service import ElasticsearchService, montar_query_nome
+
+
+def _posicao(cpfs, esperados):
+    """Posição (1-based) do primeiro CPF esperado nos resultados, ou None"""
+    for posicao, cpf in enumerate(cpfs, start=1):
+        if cpf in esperados:
+            return posicao
+    return None
+
+
+def main(fixture: Path, manter_indice: bool) -> bool:
+    with open(fixture, encoding="utf-8") as f:
+        dados = json.load(f)
+
+    es_service = ElasticsearchService()
+    if not es_service.es.ping():
+        print("❌ Erro: Elasticsearch não está rodando")
+        return False
+
+    indice = f"relevancia_{uuid.uuid4().hex[:8]}"
+    es_service._criar_indice(indice)
+    try:
+        helpers.bulk(
+            es_service.es,
+            ({"_index": indice, "_id": doc["cpf"], "_source": doc} for doc in dados["documentos"]),
+            refresh="wait_for"
+        )
+
+        soma_rr = 0.0
+        hits_1 = hits_3 = 0
+        for consulta in dados["consultas"]:
+            corpo = montar_query_nome(
+                consulta["nome"], 10, consulta.get("ano_nascimento"), consulta.get("sexo")
+            )
+            hits = es_service.es.search(index=indice, body=corpo)["hits"]["hits"]
+            cpfs = [hit["_source"]["cpf"] for hit in hits]
+            posicao = _posicao(cpfs, set(consulta["esperados"]))
+
+            soma_rr += 1 / posicao if posicao else 0.0
+            hits_1 += posicao == 1
+            hits_3 += bool(posicao and posicao <= 3)
+            marca = "✅" if posicao == 1 else ("⚠️ " if posicao else "❌")
+            print(f"{marca} {consulta['descricao']}: '{consulta['nome']}' -> posição {posicao or '-'} {cpfs[:3]}")
+
+        total = len(dados["consultas"])
+        print(f"\nConsultas: {total}")
+        print(f"MRR: {soma_rr / total:.3f}")
+        print(f"hits@1: {hits_1 / total:.3f}")
+        print(f"hits@3: {hits_3 / total:.3f}")
+        return hits_3 == total
+    finally:
+        if not manter_indice:
+            es_service.es.indices.delete(index=indice)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Avalia a relevância da busca por nome")
+    parser.add_argument("--fixture", type=Path, default=current_dir / "fixtures" / "relevancia_nomes.json")
+    parser.add_argument("--manter-indice", action="store_true", help="não remove o índice temporário")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.fixture, args.manter_indice) else 1)
@@ -0,0 +1,137 @@
+"""
+Microbenchmark da pilha de middlewares: BaseHTTPMiddleware (antiga) x ASGI puro (atual).
+
+A pilha antiga são as classes que a conversão para ASGI substituiu, lidas do git
+(o último commit em que middleware/security_headers.py ainda usava
+BaseHTTPMiddleware, ou o --revisao informado). As duas pilhas ficam na mesma
+ordem do main.py em volta de um endpoint trivial (/), e a medida é em
+requisições/s em processo, via httpx.ASGITransport (sem rede nem servidor).
+O rate limit usa o limitador local, para o Redis não entrar na medição.
+
+Uso: python scripts/benchmark_middlewares.py [--requisicoes 5000] [--concorrencia 50] [--revisao REV]
+"""
+import argparse
+import asyncio
+import logging
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+
+# Corrige o caminho para importação
+current_dir = Path(__file__).resolve().parent
+src_dir = current_dir.parent
+sys.path.append(str(src_dir))
+
+import httpx
+from fastapi import FastAPI
+
+from config.redis_config import RATE_LIMIT_CONFIG
+from middleware.rate_limit import RateLimitMiddleware
+from middleware.security_headers import SecurityHeadersMiddleware
+from middleware.transaction_logger import TransactionLoggerMiddleware
+
+MODULOS_ANTIGOS = ("security_headers", "transaction_logger", "rate_limit")
+
+
+def _git(*args) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=src_dir, check=True, capture_output=True, text=True
+    ).stdout
+
+
+def revisao_antiga() -> str:
+    """Pai do commit que tirou o BaseHTTPMiddleware de middleware/security_headers.py"""
+    conversao = _git("log", "-1", "--format=%H", "-S", "BaseHTTPMiddleware",
+                     "--", "middleware/security_headers.py").strip()
+    if not conversao:
+        raise SystemExit("Commit da conversão para ASGI não encontrado; informe --revisao")
+    return f"{conversao}^"
+
+
+def carregar_antigos(revisao: str) -> dict:
+    """Módulos de middleware como estavam na revisão, sem tocar na árvore de trabalho"""
+    modulos = {}
+    for nome in MODULOS_ANTIGOS:
+        modulo = types.ModuleType(f"middleware_antigo.{nome}")
+        codigo = _git("show", f"{revisao}:middleware/{nome}.py")
+        exec(compile(codigo, f"{revisao}:middleware/{nome}.py", "exec"), modulo.__dict__)
+        modulos[nome] = modulo
+    return modulos
+
+
+def criar_limitador(app, classe=RateLimitMiddleware):
+    """RateLimitMiddleware forçado a usar o limitador local"""
+    limitador = classe(app)
+    limitador._redis_disponivel = False
+    limitador._proxima_sondagem = float("inf")
+    return limitador
+
+
+def criar_app(antigos: dict = None):
+    app = FastAPI()
+
+    @app.get("/")
+    async def raiz():
+        return {"status": "ok"}
+
+    if antigos:
+        # Mesma ordem do main.py, instanciada à mão para forçar o limitador local
+        return criar_limitador(
+            antigos["transaction_logger"].TransactionLoggerMiddleware(
+                antigos["security_headers"].SecurityHeadersMiddleware(app)
+            ),
+            antigos["rate_limit"].RateLimitMiddleware
+        )
+    return criar_limitador(TransactionLoggerMiddleware(SecurityHeadersMiddleware(app)))
+
+
+async def medir(app, requisicoes: int, concorrencia: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Aquecimento (monta a pilha de middlewares do Starlette)
+        for _ in range(50):
+            await client.get("/")
+
+        fila = asyncio.Queue()
+        for _ in range(requisicoes):
+            fila.put_nowait(None)
+
+        async def trabalhador():
+            while not fila.empty():
+                fila.get_nowait()
+                response = await client.get("/")
+                assert response.status_code == 200, response.status_code
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*[trabalhador() for _ in range(concorrencia)])
+        return requisicoes / (time.perf_counter() - inicio)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=5000)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--revisao", help="revisão do git com a pilha antiga (padrão: antes da conversão)")
+    args = parser.parse_args()
+    revisao = args.revisao or revisao_antiga()
+    antigos = carregar_antigos(revisao)
+    print(f"Pilha antiga: middleware/ em {revisao}")
+
+    # Limites altos para nenhuma requisição ser bloqueada; logs desligados nas duas pilhas
+    for limites in (RATE_LIMIT_CONFIG, RATE_LIMIT_CONFIG['por_api_key']):
+        limites['requests_per_minute'] = limites['requests_per_hour'] = 10 ** 9
+    logging.disable(logging.CRITICAL)
+
+    resultados = {}
+    for nome, pilha in (("BaseHTTPMiddleware", antigos), ("ASGI puro", None)):
+        resultados[nome] = await medir(criar_app(pilha), args.requisicoes, args.concorrencia)
+        print(f"{nome:>20}: {resultados[nome]:,.0f} req/s")
+
+    ganho = resultados["ASGI puro"] / resultados["BaseHTTPMiddleware"]
+    print(f"{'ganho':>20}: {ganho:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+import sqlite3
+from pathlib import Path
+import logging
+import os
+import sys
+import time
+
+# Corrige o caminho para importação
+current_dir = Path(__file__).resolve().parent
+src_dir = current_dir.parent
+sys.path.append(str(src_dir))
+
+from config.settings import NOME_FONETICO_CONFIG
+from database.connection import get_db_path
+from services.nome_service import chaves_foneticas
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 50000
+
+def build_nome_fonetico():
+    """
+    Gera o índice fonético de nomes a partir do SRS_CONTATOS.
+
+    Cada termo do NOME vira uma linha (CHAVE, ROW_ID), com ROW_ID igual ao rowid
+    da pessoa no SRS_CONTATOS. A tabela {tabela}_freq guarda quantas pessoas têm
+    cada chave, para a busca partir da mais rara. Deve ser gerado de novo sempre
+    que o SRS_CONTATOS for substituído.
+    """
+    conn = None
+    origem = None
+    try:
+        contatos_path = get_db_path("SRS_CONTATOS")
+        db_path = get_db_path(NOME_FONETICO_CONFIG['banco'])
+        tmp_path = db_path.with_suffix(".db.tmp")
+        tabela = NOME_FONETICO_CONFIG['tabela']
+
+        os.makedirs(db_path.parent, exist_ok=True)
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+        origem = sqlite3.connect(f"{contatos_path.resolve().as_uri()}?mode=ro", uri=True)
+        total_registros = origem.execute("SELECT COUNT(*) FROM SRS_CONTATOS").fetchone()[0]
+        logger.info(f"Total de registros a indexar: {total_registros:,}")
+
+        logger.info(f"Criando índice em {tmp_path}")
+        conn = sqlite3.connect(str(tmp_path))
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-1000000")
+        conn.execute("PRAGMA temp_store=FILE")
+        # Carga sem índice; a tabela final é montada já ordenada pela chave
+        conn.execute("CREATE TABLE carga (CHAVE TEXT, ROW_ID INTEGER)")
+
+        inicio = time.time()
+        ultimo_rowid = 0
+        total_indexados = 0
+        while True:
+            linhas = origem.execute("""
+                SELECT rowid, NOME
+                FROM SRS_CONTATOS
+                WHERE rowid > ?
+                ORDER BY rowid
+                LIMIT ?
+            """, (ultimo_rowid, TAMANHO_LOTE)).fetchall()
+            if not linhas:
+                break
+
+            conn.executemany(
+                "INSERT INTO carga (CHAVE, ROW_ID) VALUES (?, ?)",
+                [(chave, rowid) for rowid, nome in linhas for chave in chaves_foneticas(nome)]
+            )
+            conn.commit()
+            ultimo_rowid = linhas[-1][0]
+            total_indexados += len(linhas)
+            logger.info(f"Indexados {total_indexados:,}/{total_registros:,} "
+                        f"({total_indexados / max(time.time() - inicio, 1e-6):,.0f} registros/s)")
+
+        logger.info("Ordenando chaves e criando índices...")
+        conn.execute(f"""
+            CREATE TABLE {tabela} (
+                CHAVE TEXT NOT NULL,
+                ROW_ID INTEGER NOT NULL,
+                PRIMARY KEY (CHAVE, ROW_ID)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"INSERT OR IGNORE INTO {tabela} SELECT CHAVE, ROW_ID FROM carga ORDER BY CHAVE, ROW_ID")
+        conn.execute("DROP TABLE carga")
+        conn.execute(f"CREATE INDEX idx_{tabela}_row ON {tabela} (ROW_ID, CHAVE)")
+        conn.execute(f"""
+            CREATE TABLE {tabela}_freq (
+                CHAVE TEXT PRIMARY KEY,
+                FREQ INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"INSERT INTO {tabela}_freq SELECT CHAVE, COUNT(*) FROM {tabela} GROUP BY CHAVE")
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+
+        conn.close()
+        conn = None
+        os.replace(tmp_path, db_path)
+        logger.info(f"Índice fonético concluído em {time.time() - inicio:.1f}s: {db_path}")
+
+    except Exception as e:
+        logger.error(f"Erro ao gerar índice fonético: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+        if origem:
+            origem.close()
+
+if __name__ == "__main__":
+    build_nome_fonetico()
@@ -0,0 +1,108 @@
+import sqlite3
+from pathlib import Path
+import logging
+import os
+import sys
+import time
+
+# Corrige o caminho para importação
+current_dir = Path(__file__).resolve().parent
+src_dir = current_dir.parent
+sys.path.append(str(src_dir))
+
+from config.settings import NOME_FTS_CONFIG
+from database.connection import get_db_path
+from services.nome_service import COLUNAS_FTS, normalizar_nome
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 50000
+
+def build_nome_fts():
+    """
+    Gera o índice FTS5 de nomes a partir do SRS_CONTATOS.
+
+    A tabela é contentless (content=''): guarda só o índice invertido dos nomes
+    sem acento e usa como rowid o rowid da pessoa no SRS_CONTATOS, que a API lê
+    direto depois do ranking. Por isso o índice deve ser gerado de novo sempre
+    que o SRS_CONTATOS for substituído.
+    """
+    conn = None
+    origem = None
+    try:
+        contatos_path = get_db_path("SRS_CONTATOS")
+        db_path = get_db_path(NOME_FTS_CONFIG['banco'])
+        tmp_path = db_path.with_suffix(".db.tmp")
+        tabela = NOME_FTS_CONFIG['tabela']
+
+        os.makedirs(db_path.parent, exist_ok=True)
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+        origem = sqlite3.connect(f"{contatos_path.resolve().as_uri()}?mode=ro", uri=True)
+        total_registros = origem.execute("SELECT COUNT(*) FROM SRS_CONTATOS").fetchone()[0]
+        logger.info(f"Total de registros a indexar: {total_registros:,}")
+
+        logger.info(f"Criando índice em {tmp_path}")
+        conn = sqlite3.connect(str(tmp_path))
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-1000000")
+        # detail=column basta para filtro por coluna + prefixo; prefix acelera termos curtos
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE {tabela} USING fts5(
+                {', '.join(COLUNAS_FTS)},
+                content='',
+                detail=column,
+                prefix='2 3 4',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+
+        inicio = time.time()
+        ultimo_rowid = 0
+        total_indexados = 0
+        while True:
+            linhas = origem.execute(f"""
+                SELECT rowid, {', '.join(COLUNAS_FTS)}
+                FROM SRS_CONTATOS
+                WHERE rowid > ?
+                ORDER BY rowid
+                LIMIT ?
+            """, (ultimo_rowid, TAMANHO_LOTE)).fetchall()
+            if not linhas:
+                break
+
+            conn.executemany(
+                f"INSERT INTO {tabela} (rowid, {', '.join(COLUNAS_FTS)}) VALUES (?, ?, ?, ?)",
+                [(row[0], *[normalizar_nome(valor) for valor in row[1:]]) for row in linhas]
+            )
+            conn.commit()
+            ultimo_rowid = linhas[-1][0]
+            total_indexados += len(linhas)
+            logger.info(f"Indexados {total_indexados:,}/{total_registros:,} "
+                        f"({total_indexados / max(time.time() - inicio, 1e-6):,.0f} registros/s)")
+
+        logger.info("Otimizando índice...")
+        conn.execute(f"INSERT INTO {tabela} ({tabela}) VALUES ('optimize')")
+        conn.commit()
+        conn.execute("VACUUM")
+
+        conn.close()
+        conn = None
+        os.replace(tmp_path, db_path)
+        logger.info(f"Índice de nomes concluído em {time.time() - inicio:.1f}s: {db_path}")
+
+    except Exception as e:
+        logger.error(f"Erro ao gerar índice de nomes: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+        if origem:
+            origem.close()
+
+if __name__ == "__main__":
+    build_nome_fts()
@@ -0,0 +1,177 @@
+import mmap
+import sqlite3
+from array import array
+from pathlib import Path
+import logging
+import os
+import sys
+import time
+
+# Corrige o caminho para importação
+current_dir = Path(__file__).resolve().parent
+src_dir = current_dir.parent
+sys.path.append(str(src_dir))
+
+from config.settings import SUGESTOES_NOMES_CONFIG
+from database.connection import get_db_path
+from services.nome_service import normalizar_nome
+from services.sugestoes_nomes import CABECALHO, MAGICO, VAZIO, NomesOrdenados, layout
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 50000
+
+def _carregar_nomes(origem, trabalho, blob) -> tuple:
+    """Grava os nomes distintos (normalizados, em ordem) no blob; retorna offsets e frequências"""
+    trabalho.execute("CREATE TABLE nomes (NOME TEXT)")
+    ultimo_rowid = 0
+    total = 0
+    while True:
+        linhas = origem.execute("""
+            SELECT rowid, NOME
+            FROM SRS_CONTATOS
+            WHERE rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """, (ultimo_rowid, TAMANHO_LOTE)).fetchall()
+        if not linhas:
+            break
+        trabalho.executemany(
+            "INSERT INTO nomes (NOME) VALUES (?)",
+            [(nome,) for nome in (" ".join(normalizar_nome(row[1]).split()) for row in linhas) if nome]
+        )
+        trabalho.commit()
+        ultimo_rowid = linhas[-1][0]
+        total += len(linhas)
+        logger.info(f"Lidos {total:,} registros")
+
+    # GROUP BY no SQLite (ordenação em disco): só os nomes distintos passam pela memória
+    offsets = array("Q", [0])
+    frequencias = array("I")
+    for nome, frequencia in trabalho.execute("SELECT NOME, COUNT(*) FROM nomes GROUP BY NOME ORDER BY NOME"):
+        dados = nome.encode("ascii", "ignore")
+        blob.write(dados)
+        offsets.append(offsets[-1] + len(dados))
+        frequencias.append(min(frequencia, VAZIO - 1))
+    blob.flush()
+    return offsets, frequencias
+
+def _pre_computar(nomes: NomesOrdenados, k: int, limite: int) -> list:
+    """
+    Top-k de todo prefixo com mais de `limite` nomes.
+
+    De baixo para cima: o top-k de um prefixo sai do top-k dos filhos (prefixo + uma
+    letra) e do próprio prefixo, se for um nome. Só os filhos pequenos são percorridos,
+    e cada nome cai em no máximo um deles.
+    """
+    pre_computados = []
+
+    def visitar(prefixo: bytes, inicio: int, fim: int) -> list:
+        if fim - inicio <= limite:
+            return nomes.top_k(range(inicio, fim), k)
+        candidatos = []
+        i = inicio
+        if nomes.nome(i) == prefixo:
+            candidatos.append(i)
+            i += 1
+        while i < fim:
+            filho = nomes.nome(i)[:len(prefixo) + 1]
+            _, fim_filho = nomes.faixa(filho, i, fim)
+            candidatos.extend(visitar(filho, i, fim_filho))
+            i = fim_filho
+        top = nomes.top_k(candidatos, k)
+        if prefixo:
+            pre_computados.append((prefixo, top))
+        return top
+
+    visitar(b"", 0, nomes.total)
+    pre_computados.sort()
+    return pre_computados
+
+def build_sugestoes_nomes():
+    """
+    Gera o arquivo de autocomplete de nomes a partir do SRS_CONTATOS.
+
+    Guarda os nomes completos distintos (sem acento, em ordem) com a frequência de
+    cada um e o top-k dos prefixos muito comuns. A API mapeia o arquivo em memória
+    (services/sugestoes_nomes.py). Deve ser gerado de novo quando o SRS_CONTATOS
+    for substituído; a API percebe o arquivo novo sozinha.
+    """
+    origem = None
+    trabalho = None
+    destino = Path(SUGESTOES_NOMES_CONFIG['arquivo'])
+    trabalho_path = destino.with_suffix(".tmp.db")
+    blob_path = destino.with_suffix(".nomes.tmp")
+    tmp_path = destino.with_suffix(".tmp")
+    k = SUGESTOES_NOMES_CONFIG['top_k']
+    limite = SUGESTOES_NOMES_CONFIG['limite_varredura']
+    try:
+        os.makedirs(destino.parent, exist_ok=True)
+        for caminho in (trabalho_path, blob_path, tmp_path):
+            if caminho.exists():
+                caminho.unlink()
+
+        inicio = time.time()
+        contatos_path = get_db_path("SRS_CONTATOS")
+        origem = sqlite3.connect(f"{contatos_path.resolve().as_uri()}?mode=ro", uri=True)
+        trabalho = sqlite3.connect(str(trabalho_path))
+        trabalho.execute("PRAGMA journal_mode=OFF")
+        trabalho.execute("PRAGMA synchronous=OFF")
+        trabalho.execute("PRAGMA temp_store=FILE")
+
+        with open(blob_path, "w+b") as blob:
+            offsets, frequencias = _carregar_nomes(origem, trabalho, blob)
+            n = len(frequencias)
+            logger.info(f"{n:,} nomes distintos")
+
+            with mmap.mmap(blob.fileno(), 0, access=mmap.ACCESS_READ) if n else memoryview(b"") as dados:
+                nomes = NomesOrdenados(dados, offsets, frequencias)
+                pre_computados = _pre_computar(nomes, k, limite)
+            logger.info(f"{len(pre_computados):,} prefixos com top-k pré-computado")
+
+            offsets_prefixos = array("Q", [0])
+            top_k = array("I")
+            for prefixo, top in pre_computados:
+                offsets_prefixos.append(offsets_prefixos[-1] + len(prefixo))
+                top_k.extend(top + [VAZIO] * (k - len(top)))
+
+            m = len(pre_computados)
+            posicoes = layout(n, m, k, offsets[-1])
+            with open(tmp_path, "wb") as f:
+                f.write(CABECALHO.pack(MAGICO, k, limite, 0, n, m, offsets[-1]))
+                for secao, conteudo in (
+                    ("offsets_nomes", offsets),
+                    ("offsets_prefixos", offsets_prefixos),
+                    ("frequencias", frequencias),
+                    ("top_k", top_k),
+                ):
+                    f.write(b"\0" * (posicoes[secao] - f.tell()))
+                    conteudo.tofile(f)
+                f.write(b"\0" * (posicoes["nomes"] - f.tell()))
+                blob.seek(0)
+                while bloco := blob.read(16 * 1024 * 1024):
+                    f.write(bloco)
+                f.write(b"\0" * (posicoes["prefixos"] - f.tell()))
+                f.write(b"".join(prefixo for prefixo, _ in pre_computados))
+                f.flush()
+                os.fsync(f.fileno())
+
+        os.replace(tmp_path, destino)
+        logger.info(f"Sugestões de nomes concluídas em {time.time() - inicio:.1f}s: {destino}")
+
+    except Exception as e:
+        logger.error(f"Erro ao gerar sugestões de nomes: {str(e)}")
+        raise
+    finally:
+        if trabalho:
+            trabalho.close()
+        if origem:
+            origem.close()
+        for caminho in (trabalho_path, blob_path):
+            if caminho.exists():
+                caminho.unlink()
+
+if __name__ == "__main__":
+    build_sugestoes_nomes()
@@ -0,0 +1,123 @@
+import sqlite3
+from pathlib import Path
+import logging
+import os
+import sys
+import time
+
+# Corrige o caminho para importação
+current_dir = Path(__file__).resolve().parent
+src_dir = current_dir.parent
+sys.path.append(str(src_dir))
+
+from config.settings import TELEFONE_REVERSO_CONFIG
+from database.connection import get_db_path
+from services.telefone_service import normalizar_telefone
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 100000
+
+def build_telefone_reverso():
+    """
+    Gera o índice reverso telefone normalizado → CONTATOS_ID.
+
+    A tabela é WITHOUT ROWID com chave (TELEFONE_NORM, CONTATOS_ID): os
+    CONTATOS_IDs de um telefone ficam contíguos e a busca é uma única leitura
+    de intervalo. A normalização é a mesma da API (services.telefone_service).
+    """
+    conn = None
+    origem = None
+    try:
+        telefones_path = get_db_path("SRS_HISTORICO_TELEFONES")
+        db_path = get_db_path(TELEFONE_REVERSO_CONFIG['banco'])
+        tmp_path = db_path.with_suffix(".db.tmp")
+        tabela = TELEFONE_REVERSO_CONFIG['tabela']
+
+        os.makedirs(db_path.parent, exist_ok=True)
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+        origem = sqlite3.connect(f"{telefones_path.resolve().as_uri()}?mode=ro", uri=True)
+        total_registros = origem.execute("SELECT COUNT(*) FROM SRS_HISTORICO_TELEFONES").fetchone()[0]
+        logger.info(f"Total de telefones a processar: {total_registros:,}")
+
+        logger.info(f"Criando índice em {tmp_path}")
+        conn = sqlite3.connect(str(tmp_path))
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=FILE")
+        conn.execute("PRAGMA cache_size=-1000000")
+        conn.execute("CREATE TABLE telefones_carga (TELEFONE_NORM TEXT, CONTATOS_ID INTEGER)")
+
+        inicio = time.time()
+        ultimo_rowid = 0
+        processados = 0
+        descartados = 0
+        while True:
+            linhas = origem.execute("""
+                SELECT rowid, DDD, TELEFONE, CONTATOS_ID
+                FROM SRS_HISTORICO_TELEFONES
+                WHERE rowid > ?
+                ORDER BY rowid
+                LIMIT ?
+            """, (ultimo_rowid, TAMANHO_LOTE)).fetchall()
+            if not linhas:
+                break
+
+            registros = []
+            for _, ddd, telefone, contatos_id in linhas:
+                chave = normalizar_telefone(f"{ddd or ''}{telefone or ''}")
+                if chave and contatos_id is not None:
+                    registros.append((chave, contatos_id))
+                else:
+                    descartados += 1
+            conn.executemany("INSERT INTO telefones_carga VALUES (?, ?)", registros)
+            conn.commit()
+
+            ultimo_rowid = linhas[-1][0]
+            processados += len(linhas)
+            logger.info(f"Processados {processados:,}/{total_registros:,} "
+                        f"({processados / max(time.time() - inicio, 1e-6):,.0f} registros/s)")
+
+        # Reescreve ordenado numa tabela agrupada pela chave (sem duplicados)
+        logger.info("Criando tabela agrupada por telefone...")
+        conn.execute(f"""
+            CREATE TABLE {tabela} (
+                TELEFONE_NORM TEXT NOT NULL,
+                CONTATOS_ID INTEGER NOT NULL,
+                PRIMARY KEY (TELEFONE_NORM, CONTATOS_ID)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {tabela} (TELEFONE_NORM, CONTATOS_ID)
+            SELECT TELEFONE_NORM, CONTATOS_ID
+            FROM telefones_carga
+            ORDER BY TELEFONE_NORM, CONTATOS_ID
+        """)
+        conn.execute("DROP TABLE telefones_carga")
+        conn.commit()
+
+        logger.info("Otimizando banco de dados...")
+        conn.execute("VACUUM")
+        conn.execute("ANALYZE")
+
+        conn.close()
+        conn = None
+        os.replace(tmp_path, db_path)
+        logger.info(f"Índice reverso concluído em {time.time() - inicio:.1f}s "
+                    f"({descartados:,} telefones inválidos ignorados): {db_path}")
+
+    except Exception as e:
+        logger.error(f"Erro ao gerar índice reverso de telefones: {str(e)}")
+        raise
+    finally:
+        if conn:
+            conn.close()
+        if origem:
+            origem.close()
+
+if __name__ == "__main__":
+    build_telefone_reverso()
@@ -3,71 +3,122 @@ import pandas as pd
 from pathlib import Path
 import logging
 import os
+import sys
+
+# Corrige o caminho para importação
+current_dir = Path(__file__).resolve().parent
+src_dir = current_dir.parent
+sys.path.append(str(src_dir))
+
+from config.settings import ENDERECOS_CONFIG
+from database.connection import get_db_path
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def convert_csv_to_sqlite():
+    """
+    Gera o índice de endereços a partir do CSV.
+
+    Os registros são gravados numa tabela WITHOUT ROWID com chave
+    (CONTATOS_ID, SEQ), ou seja, fisicamente ordenados por CONTATOS_ID:
+    os endereços de uma pessoa ficam nas mesmas páginas e a busca vira
+    uma única leitura de intervalo no índice.
+
+    O índice novo é gerado num .tmp e trocado com os.replace. As conexões já
+    abertas pela API continuam no arquivo antigo até o pool notar a troca de
+    inode/mtime (DB_POOL_CONFIG['verificacao_arquivo']) e reabri-las.
+    """
+    conn = None
     try:
         # Caminhos dos arquivos
-        csv_path = Path(r"G:\SERASA DB\serasa_enderecos\srs_enderecos.csv")
-        db_dir = Path(r"F:\SRS_TB_ENDERECOS")
-        db_path = db_dir / "SRS_TB_ENDERECOS.db"
-        
+        csv_path = Path(ENDERECOS_CONFIG['csv_path'])
+        db_path = get_db_path("SRS_TB_ENDERECOS")
+        db_dir = db_path.parent
+        tmp_path = db_path.with_suffix(".db.tmp")
+        tabela = ENDERECOS_CONFIG['tabela']
+        colunas = ENDERECOS_CONFIG['colunas']
+
         # Criar diretório se não existir
         if not db_dir.exists():
             logger.info(f"Criando diretório {db_dir}")
             os.makedirs(db_dir, exist_ok=True)
-        
+
         # Verificar permissões
         if not os.access(db_dir, os.W_OK):
             logger.error(f"Sem permissão de escrita em {db_dir}")
             raise PermissionError(f"Sem permissão de escrita em {db_dir}")
-        
-        # Ler primeira linha do CSV para pegar os nomes das colunas
-        df_sample = pd.read_csv(csv_path, nrows=1)
-        columns = df_sample.columns.tolist()
-        
-        logger.info(f"Colunas encontradas no CSV: {columns}")
-        
-        # Criar conexão com o banco SQLite
-        logger.info(f"Criando banco de dados em {db_path}")
-        conn = sqlite3.connect(str(db_path))
-        
-        # Criar tabela dinamicamente com as colunas do CSV
-        columns_sql = ", ".join([f"{col} TEXT" for col in columns])
-        create_table_sql = f"""
-            CREATE TABLE IF NOT EXISTS enderecos (
-                {columns_sql}
-            )
-        """
-        
-        logger.info("Criando tabela e índice...")
-        conn.execute(create_table_sql)
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_contatos_id ON enderecos(CONTATOS_ID)")
-        
-        # Ler e inserir em chunks
+
+        # O índice é montado num arquivo temporário e só substitui o atual no fim
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+        logger.info(f"Criando banco de dados em {tmp_path}")
+        conn = sqlite3.connect(str(tmp_path))
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=FILE")
+        conn.execute("PRAGMA cache_size=-1000000")
+
+        # Tabela de carga com as colunas usadas pela API
+        colunas_texto = ", ".join([f"{col} TEXT" for col in colunas[1:]])
+        conn.execute(f"CREATE TABLE enderecos_carga (CONTATOS_ID INTEGER, {colunas_texto})")
+
+        # Ler e inserir em chunks (mesmas opções de leitura do fallback em Dask)
         chunksize = 100000
         total_rows = 0
-        
+
         logger.info(f"Iniciando conversão do arquivo {csv_path}")
-        for chunk in pd.read_csv(csv_path, chunksize=chunksize, low_memory=False):
-            chunk.to_sql('enderecos', conn, if_exists='append', index=False)
+        for chunk in pd.read_csv(csv_path,
+                                 chunksize=chunksize,
+                                 header=0,
+                                 usecols=colunas,
+                                 dtype={col: 'object' for col in colunas[1:]},
+                                 on_bad_lines='skip',
+                                 skip_blank_lines=True,
+                                 comment='('):
+            chunk['CONTATOS_ID'] = pd.to_numeric(chunk['CONTATOS_ID'], errors='coerce').astype('Int64')
+            chunk = chunk.dropna(subset=['CONTATOS_ID'])
+            chunk[colunas].to_sql('enderecos_carga', conn, if_exists='append', index=False)
             total_rows += len(chunk)
             logger.info(f"Processadas {total_rows:,} linhas...")
-            
+
+        # Reescreve ordenado por CONTATOS_ID numa tabela agrupada pela chave
+        logger.info("Criando tabela agrupada por CONTATOS_ID...")
+        conn.execute(f"""
+            CREATE TABLE {tabela} (
+                CONTATOS_ID INTEGER NOT NULL,
+                SEQ INTEGER NOT NULL,
+                {colunas_texto},
+                PRIMARY KEY (CONTATOS_ID, SEQ)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"""
+            INSERT INTO {tabela} (CONTATOS_ID, SEQ, {', '.join(colunas[1:])})
+            SELECT CONTATOS_ID, rowid, {', '.join(colunas[1:])}
+            FROM enderecos_carga
+            ORDER BY CONTATOS_ID, rowid
+        """)
+        conn.execute("DROP TABLE enderecos_carga")
+        conn.commit()
+
         # Otimizar banco
         logger.info("Otimizando banco de dados...")
         conn.execute("VACUUM")
         conn.execute("ANALYZE")
-        
+
         conn.close()
-        logger.info("Conversão concluída com sucesso!")
-        
+        conn = None
+        os.replace(tmp_path, db_path)
+        logger.info(f"Conversão concluída com sucesso! Índice em {db_path}")
+
     except Exception as e:
         logger.error(f"Erro durante a conversão: {str(e)}")
         raise
+    finally:
+        if conn:
+            conn.close()
 
 if __name__ == "__main__":
-    convert_csv_to_sqlite() 
\ No newline at end of file
+    convert_csv_to_sqlite()
@@ -28,14 +28,18 @@ from src.services.elasticsearch_service import ElasticsearchService
 
 async def main():
     es_service = ElasticsearchService()
+    await es_service.iniciar()
     
-    if not await es_service.check_connection():
-        print("❌ Erro: Elasticsearch não está rodando. Por favor, inicie o serviço primeiro.")
-        return
-        
-    print("✅ Conectado ao Elasticsearch")
-    await es_service.create_index()
-    await es_service.index_data(batch_size=500)
+    try:
+        if not await es_service.check_connection():
+            print("❌ Erro: Elasticsearch não está rodando. Por favor, inicie o serviço primeiro.")
+            return
+            
+        print("✅ Conectado ao Elasticsearch")
+        await es_service.create_index()
+        await es_service.index_data(batch_size=500)
+    finally:
+        await es_service.fechar()
 
 if __name__ == "__main__":
     asyncio.run(main())
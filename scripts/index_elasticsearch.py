@@ -1,4 +1,6 @@
+import argparse
 import asyncio
+import logging
 import sys
 from pathlib import Path
 import os
@@ -10,9 +12,9 @@ sys.path.append(str(src_dir))
 
 from services.elasticsearch_service import ElasticsearchService
 
-async def main():
-    # Corrige o caminho do HD com barras normais
-    es_service = ElasticsearchService("E:/Elastic_search")
+async def main(args):
+    es_service = ElasticsearchService()
+    await es_service.iniciar()
     
     try:
         if not await es_service.check_connection():
@@ -21,16 +23,23 @@ async def main():
             
         print("✅ Conectado ao Elasticsearch")
         
-        print("Criando índice...")
-        await es_service.create_index()
-        
         print("Iniciando indexação dos dados...")
-        await es_service.index_data(batch_size=1000)
+        await es_service.index_data(
+            batch_size=args.chunk, particoes=args.particoes, retomar=not args.recomecar, delta=args.delta
+        )
         
         print("✅ Indexação concluída com sucesso!")
         
     except Exception as e:
         print(f"❌ Erro durante a indexação: {str(e)}")
+    finally:
+        await es_service.fechar()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Reindexa o SRS_CONTATOS no Elasticsearch")
+    parser.add_argument("--particoes", type=int, default=None, help="faixas de rowid indexadas em paralelo")
+    parser.add_argument("--chunk", type=int, default=2000, help="documentos por requisição _bulk")
+    parser.add_argument("--delta", action="store_true", help="indexa só as linhas novas desde a última carga")
+    parser.add_argument("--recomecar", action="store_true", help="ignora o checkpoint e recomeça do zero")
+    asyncio.run(main(parser.parse_args()))
\ No newline at end of file
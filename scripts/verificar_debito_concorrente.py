@@ -0,0 +1,220 @@
+"""
+Verifica o débito transacional de saldo sob concorrência.
+
+Dispara N débitos simultâneos (debitar_saldo_async) contra um usuário com saldo
+para apenas parte deles e confere que o saldo final é exato: nenhum débito
+aprovado a mais, nenhuma transação registrada sem o débito correspondente.
+
+Com FIRESTORE_EMULATOR_HOST definido, usa o emulador do Firestore. Sem ele, usa
+um Firestore em memória que, como o servidor, trava os documentos lidos na
+transação até o commit ou rollback, executado pelo mesmo decorator transactional
+do SDK. Débitos que esgotam as tentativas de commit contam como recusados.
+
+Uso: python scripts/verificar_debito_concorrente.py [--debitos 100] [--saldo 60] [--valor 1] [--latencia 0.002]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# Corrige o caminho para importação
+current_dir = Path(__file__).resolve().parent
+src_dir = current_dir.parent
+sys.path.append(str(src_dir))
+
+from fastapi import HTTPException
+from google.api_core.exceptions import Aborted
+
+from services.firebase_service import debitar_saldo_async
+
+
+class _Snapshot:
+    def __init__(self, dados):
+        self.exists = dados is not None
+        self._dados = dados
+
+    def to_dict(self):
+        return dict(self._dados) if self._dados is not None else None
+
+
+class _DocumentoMemoria:
+    def __init__(self, banco, caminho):
+        self._banco = banco
+        self.caminho = caminho
+
+    def get(self, transaction=None):
+        if transaction is not None and self.caminho not in transaction.lidos:
+            # Trava do documento até o fim da transação (o servidor serializa os débitos)
+            trava = self._banco.trava(self.caminho)
+            trava.acquire()
+            transaction.travas.append(trava)
+        with self._banco.lock:
+            dados, versao = self._banco.docs.get(self.caminho, (None, 0))
+        if transaction is not None:
+            transaction.lidos.setdefault(self.caminho, versao)
+            # Simula a ida ao servidor, para as transações se sobreporem
+            time.sleep(self._banco.latencia)
+        return _Snapshot(dados)
+
+    def set(self, dados):
+        with self._banco.lock:
+            versao = self._banco.docs.get(self.caminho, (None, 0))[1]
+            self._banco.docs[self.caminho] = (dict(dados), versao + 1)
+
+    def collection(self, nome):
+        return _ColecaoMemoria(self._banco, f"{self.caminho}/{nome}")
+
+
+class _ColecaoMemoria:
+    def __init__(self, banco, caminho):
+        self._banco = banco
+        self.caminho = caminho
+
+    def document(self, doc_id=None):
+        return _DocumentoMemoria(self._banco, f"{self.caminho}/{doc_id or uuid.uuid4().hex}")
+
+
+class _TransacaoMemoria:
+    """Implementa a interface que o decorator firestore.transactional espera"""
+    _ids = itertools.count(1)
+
+    def __init__(self, banco):
+        self._banco = banco
+        self._read_only = False
+        self._max_attempts = 5
+        self._id = None
+        self.lidos = {}
+        self.escritas = []
+        self.travas = []
+
+    def _clean_up(self):
+        for trava in self.travas:
+            trava.release()
+        self._id = None
+        self.lidos = {}
+        self.escritas = []
+        self.travas = []
+
+    def _begin(self, retry_id=None):
+        self._id = next(self._ids)
+
+    def set(self, doc_ref, dados):
+        self.escritas.append((doc_ref.caminho, lambda atual, dados=dados: dict(dados)))
+
+    def update(self, doc_ref, campos):
+        self.escritas.append((doc_ref.caminho, lambda atual, campos=campos: {**atual, **campos}))
+
+    def _commit(self):
+        with self._banco.lock:
+            for caminho, versao in self.lidos.items():
+                if self._banco.docs.get(caminho, (None, 0))[1] != versao:
+                    self._banco.conflitos += 1
+                    self._clean_up()
+                    raise Aborted("Documento alterado por outra transação")
+            for caminho, aplicar in self.escritas:
+                dados, versao = self._banco.docs.get(caminho, (None, 0))
+                self._banco.docs[caminho] = (aplicar(dados), versao + 1)
+        self._clean_up()
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class FirestoreMemoria:
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+        self.docs = {}
+        self.lock = threading.Lock()
+        self.travas = {}
+        self.conflitos = 0
+
+    def trava(self, caminho):
+        with self.lock:
+            return self.travas.setdefault(caminho, threading.Lock())
+
+    def collection(self, nome):
+        return _ColecaoMemoria(self, nome)
+
+    def transaction(self):
+        return _TransacaoMemoria(self)
+
+    def transacoes(self, user_id):
+        prefixo = f"usuarios/{user_id}/transacoes/"
+        with self.lock:
+            return [dados for caminho, (dados, _) in self.docs.items() if caminho.startswith(prefixo)]
+
+
+def _cliente(latencia: float):
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        from google.cloud import firestore as gcloud_firestore
+        return gcloud_firestore.Client(project=os.getenv("GCLOUD_PROJECT", "demo-api-scamm")), "emulador"
+    return FirestoreMemoria(latencia), "memória"
+
+
+def _contar_transacoes(db_firestore, user_id):
+    if isinstance(db_firestore, FirestoreMemoria):
+        return len(db_firestore.transacoes(user_id))
+    return sum(1 for _ in db_firestore.collection('usuarios').document(user_id).collection('transacoes').stream())
+
+
+async def main(debitos: int, saldo: float, valor: float, latencia: float):
+    db_firestore, backend = _cliente(latencia)
+    user_id = f"teste-debito-{uuid.uuid4().hex[:8]}"
+    doc_ref = db_firestore.collection('usuarios').document(user_id)
+    doc_ref.set({'coins': saldo})
+
+    transacao_data = {'tipo': 'consulta', 'valor': -valor, 'descricao': 'Consulta teste'}
+
+    async def debitar():
+        try:
+            await debitar_saldo_async(db_firestore, user_id, valor, transacao_data)
+            return "ok"
+        except HTTPException as e:
+            return e.status_code
+        except (ValueError, Aborted):
+            # Tentativas de commit esgotadas: o débito não foi aplicado
+            return "abortado"
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*[debitar() for _ in range(debitos)])
+    duracao = time.perf_counter() - inicio
+
+    aprovados = resultados.count("ok")
+    recusados = resultados.count(402)
+    abortados = resultados.count("abortado")
+    saldo_final = doc_ref.get().to_dict()['coins']
+    registradas = _contar_transacoes(db_firestore, user_id)
+    esperado_aprovados = min(debitos, int(saldo // valor))
+
+    print(f"Backend: {backend}")
+    print(f"Débitos: {debitos} em {duracao:.2f}s ({aprovados} aprovados, {recusados} recusados por saldo, "
+          f"{abortados} recusados por conflito)")
+    print(f"Saldo: inicial {saldo}, final {saldo_final}, esperado {saldo - esperado_aprovados * valor}")
+    print(f"Transações registradas: {registradas}")
+    if isinstance(db_firestore, FirestoreMemoria):
+        print(f"Conflitos (tentativas refeitas): {db_firestore.conflitos}")
+
+    ok = (
+        # Só um débito abortado pode deixar saldo sobrando
+        (aprovados == esperado_aprovados if not abortados else aprovados <= esperado_aprovados)
+        and aprovados + recusados + abortados == debitos
+        and saldo_final == saldo - aprovados * valor
+        and registradas == aprovados
+    )
+    print("OK" if ok else "FALHOU")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica débitos concorrentes de saldo")
+    parser.add_argument("--debitos", type=int, default=100)
+    parser.add_argument("--saldo", type=float, default=60)
+    parser.add_argument("--valor", type=float, default=1)
+    parser.add_argument("--latencia", type=float, default=0.002, help="latência simulada da leitura (só em memória)")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.debitos, args.saldo, args.valor, args.latencia)) else 1)
@@ -0,0 +1,302 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from firebase_admin import firestore
+from config.settings import BILLING_CONFIG
+from utils.firebase_retry import executar_com_retry
+
+logger = logging.getLogger(__name__)
+
+class UsuarioNaoEncontradoError(Exception):
+    pass
+
+@firestore.transactional
+def _aplicar_lancamentos(transaction, db_firestore, user_id: str, lancamentos: List[Dict]) -> Dict:
+    """
+    Aplica os lançamentos de um usuário numa transação do Firestore.
+
+    O id do lançamento é o id do documento em `transacoes`: lançamentos que já
+    existem (reenvio depois de uma queda) são ignorados, então o envio é idempotente.
+    O saldo é conferido aqui, dentro da transação: um lançamento que não cabe no
+    saldo (outro host ou ledger gastou antes) é recusado em vez de negativar a conta.
+    """
+    doc_ref = db_firestore.collection('usuarios').document(user_id)
+    transacoes_ref = doc_ref.collection('transacoes')
+    refs = [transacoes_ref.document(l['id']) for l in lancamentos]
+
+    # Todas as leituras antes das escritas (exigência das transações do Firestore)
+    usuario = doc_ref.get(transaction=transaction)
+    if not usuario.exists:
+        raise UsuarioNaoEncontradoError(user_id)
+    existentes = {doc.id for doc in db_firestore.get_all(refs, transaction=transaction) if doc.exists}
+
+    saldo = (usuario.to_dict() or {}).get('coins', 0)
+    novos, sem_saldo = [], []
+    for l in lancamentos:
+        if l['id'] in existentes:
+            continue
+        if l['valor'] > saldo:
+            sem_saldo.append(l['id'])
+            continue
+        saldo -= l['valor']
+        novos.append(l)
+    if novos:
+        transaction.update(doc_ref, {
+            'coins': saldo,
+            'ultima_consulta': datetime.now().isoformat()
+        })
+        for l in novos:
+            transaction.set(transacoes_ref.document(l['id']), {
+                'tipo': 'consulta',
+                'valor': -l['valor'],
+                'data': l['criado_em'],
+                'descricao': f"Consulta {l['tipo_consulta']}",
+                'detalhes': l['detalhes']
+            })
+    return {'saldo': saldo, 'aplicados': len(novos), 'duplicados': len(existentes), 'sem_saldo': sem_saldo}
+
+class BillingLedger:
+    """
+    Ledger local de cobranças (write-behind).
+
+    A reserva do débito é feita no SQLite (WAL, synchronous=FULL) contra o saldo do
+    Firestore em cache menos os lançamentos ainda pendentes, e a requisição segue sem
+    esperar o Firestore. Uma tarefa em background envia os pendentes em transações
+    por usuário. Se o processo cair, os pendentes continuam no arquivo e são enviados
+    na próxima inicialização.
+    """
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(BillingLedger, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self.path = Path(BILLING_CONFIG['ledger_path'])
+        self._conn = None
+        self._lock = threading.Lock()
+        # user_id -> (saldo no Firestore, lido em (monotonic), versão, lido em (ISO)); a versão muda a cada envio
+        self._saldos: Dict[str, tuple] = {}
+        self._tarefa: Optional[asyncio.Task] = None
+        BillingLedger._initialized = True
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS lancamentos (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    tipo_consulta TEXT NOT NULL,
+                    valor REAL NOT NULL,
+                    detalhes TEXT,
+                    criado_em TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    erro TEXT,
+                    enviado_em TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_lancamentos_status ON lancamentos (status, user_id)")
+            self._conn = conn
+        return self._conn
+
+    # --- Reserva -------------------------------------------------------------
+
+    def _ler_saldo(self, user_id: str) -> float:
+        doc = firestore.client().collection('usuarios').document(user_id).get()
+        if not doc.exists:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        return doc.to_dict().get('coins', 0)
+
+    async def _saldo_firestore(self, user_id: str) -> Tuple[float, str]:
+        """
+        Saldo do Firestore em cache (relido depois de ttl_saldo segundos) e o instante
+        da leitura. Lançamentos enviados depois desse instante (por qualquer processo)
+        podem não estar descontados nele.
+        """
+        cache = self._saldos.get(user_id)
+        if cache and time.monotonic() - cache[1] < BILLING_CONFIG['ttl_saldo']:
+            return cache[0], cache[3]
+
+        versao = cache[2] if cache else 0
+        # Marcado antes da leitura: na dúvida, o envio concorrente é descontado de novo
+        lido_em = datetime.now().isoformat()
+        saldo = await executar_com_retry(self._ler_saldo, user_id, circuito='firestore')
+        atual = self._saldos.get(user_id)
+        # Só grava se nenhum envio atualizou o saldo enquanto a leitura acontecia
+        if (atual[2] if atual else 0) == versao:
+            self._saldos[user_id] = (saldo, time.monotonic(), versao, lido_em)
+        return saldo, lido_em
+
+    def _reservar(self, user_id: str, tipo_consulta: str, valor: float, detalhes: Optional[Dict],
+                  saldo: float, lido_em: str) -> str:
+        with self._lock:
+            conn = self._conexao()
+            # BEGIN IMMEDIATE: a soma dos pendentes e a inserção são atômicas
+            # também entre processos que compartilham o mesmo arquivo
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Pendentes e também os enviados depois da leitura do saldo, que o saldo
+                # em cache (deste ou de outro processo) ainda não desconta
+                pendente = conn.execute("""
+                    SELECT COALESCE(SUM(valor), 0) FROM lancamentos
+                    WHERE user_id = ? AND (status = 'pendente' OR (status = 'enviado' AND enviado_em > ?))
+                """, (user_id, lido_em)).fetchone()[0]
+                disponivel = saldo - pendente
+                if disponivel < valor:
+                    raise HTTPException(
+                        status_code=402,
+                        detail=f"Saldo insuficiente. Necessário: {valor}, Disponível: {disponivel}"
+                    )
+                lancamento_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO lancamentos (id, user_id, tipo_consulta, valor, detalhes, criado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                    (lancamento_id, user_id, tipo_consulta, valor, json.dumps(detalhes), datetime.now().isoformat())
+                )
+                conn.execute("COMMIT")
+                return lancamento_id
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def reservar(self, user_id: str, tipo_consulta: str, valor: float, detalhes: Optional[Dict] = None) -> str:
+        """Reserva o débito no ledger e retorna o id do lançamento (402 se não houver saldo)"""
+        saldo, lido_em = await self._saldo_firestore(user_id)
+        return await asyncio.to_thread(self._reservar, user_id, tipo_consulta, valor, detalhes, saldo, lido_em)
+
+    # --- Envio ao Firestore --------------------------------------------------
+
+    def _pendentes(self) -> List[Dict]:
+        with self._lock:
+            result = self._conexao().execute("""
+                SELECT id, user_id, tipo_consulta, valor, detalhes, criado_em
+                FROM lancamentos
+                WHERE status = 'pendente'
+                ORDER BY user_id, criado_em
+            """)
+            return [
+                {
+                    'id': row[0], 'user_id': row[1], 'tipo_consulta': row[2],
+                    'valor': row[3], 'detalhes': json.loads(row[4]) if row[4] else None,
+                    'criado_em': row[5]
+                }
+                for row in result.fetchall()
+            ]
+
+    def _atualizar_status(self, ids: List[str], status: str, erro: Optional[str] = None,
+                          enviado_em: Optional[str] = None):
+        with self._lock:
+            conn = self._conexao()
+            marcadores = ",".join("?" * len(ids))
+            if status == 'pendente':
+                conn.execute(
+                    f"UPDATE lancamentos SET tentativas = tentativas + 1, erro = ? WHERE id IN ({marcadores})",
+                    [erro, *ids]
+                )
+            else:
+                conn.execute(
+                    f"UPDATE lancamentos SET status = ?, erro = ?, enviado_em = ? WHERE id IN ({marcadores})",
+                    [status, erro, enviado_em or datetime.now().isoformat(), *ids]
+                )
+
+    def _enviar(self, user_id: str, lancamentos: List[Dict]) -> Dict:
+        db_firestore = firestore.client()
+        return _aplicar_lancamentos(db_firestore.transaction(), db_firestore, user_id, lancamentos)
+
+    async def flush(self) -> int:
+        """Envia os lançamentos pendentes ao Firestore; retorna quantos foram confirmados"""
+        pendentes = await asyncio.to_thread(self._pendentes)
+        por_usuario: Dict[str, List[Dict]] = {}
+        for lancamento in pendentes:
+            por_usuario.setdefault(lancamento['user_id'], []).append(lancamento)
+
+        confirmados = 0
+        lote = BILLING_CONFIG['lote_flush']
+        for user_id, lancamentos in por_usuario.items():
+            for i in range(0, len(lancamentos), lote):
+                parte = lancamentos[i:i + lote]
+                ids = [l['id'] for l in parte]
+                try:
+                    resultado = await asyncio.to_thread(self._enviar, user_id, parte)
+                except UsuarioNaoEncontradoError:
+                    logger.error(f"Usuário {user_id} não existe mais: {len(ids)} lançamentos rejeitados")
+                    await asyncio.to_thread(self._atualizar_status, ids, 'rejeitado', "Usuário não encontrado")
+                    continue
+                except Exception as e:
+                    logger.error(f"Erro ao enviar lançamentos de {user_id} ao Firestore: {str(e)}")
+                    await asyncio.to_thread(self._atualizar_status, ids, 'pendente', str(e))
+                    continue
+
+                # O saldo lido na transação já desconta o que acabou de ser enviado. Vai
+                # para o cache antes de os lançamentos deixarem de contar como pendentes,
+                # com o mesmo instante de envio deles (que então não são descontados de novo)
+                enviado_em = datetime.now().isoformat()
+                versao = self._saldos.get(user_id, (0, 0, 0, ''))[2] + 1
+                self._saldos[user_id] = (resultado['saldo'], time.monotonic(), versao, enviado_em)
+                sem_saldo = set(resultado['sem_saldo'])
+                enviados = [i for i in ids if i not in sem_saldo]
+                if enviados:
+                    await asyncio.to_thread(self._atualizar_status, enviados, 'enviado', None, enviado_em)
+                if sem_saldo:
+                    logger.error(f"Saldo de {user_id} insuficiente na conciliação: {len(sem_saldo)} lançamentos rejeitados")
+                    await asyncio.to_thread(self._atualizar_status, list(sem_saldo), 'rejeitado', "Saldo insuficiente")
+                confirmados += len(enviados)
+                if resultado['duplicados']:
+                    logger.warning(f"{resultado['duplicados']} lançamentos de {user_id} já estavam no Firestore")
+        return confirmados
+
+    def _limpar_enviados(self):
+        limite = (datetime.now() - timedelta(days=BILLING_CONFIG['retencao_dias'])).isoformat()
+        with self._lock:
+            self._conexao().execute(
+                "DELETE FROM lancamentos WHERE status = 'enviado' AND enviado_em < ?", (limite,)
+            )
+
+    async def _loop_flush(self):
+        while True:
+            await asyncio.sleep(BILLING_CONFIG['intervalo_flush'])
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Erro no envio de lançamentos: {str(e)}")
+
+    async def iniciar(self):
+        """Inicia o envio em background (pendentes de uma execução anterior saem no primeiro ciclo)"""
+        await asyncio.to_thread(self._limpar_enviados)
+        self._tarefa = asyncio.create_task(self._loop_flush())
+        logger.info(f"Ledger de cobrança iniciado em {self.path}")
+
+    async def parar(self):
+        """Para o envio em background e faz um último envio"""
+        if self._tarefa:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
+        await self.flush()
+
+    def metricas(self) -> Dict:
+        with self._lock:
+            rows = self._conexao().execute(
+                "SELECT status, COUNT(*), COALESCE(SUM(valor), 0) FROM lancamentos GROUP BY status"
+            ).fetchall()
+        return {status: {"quantidade": quantidade, "valor": valor} for status, quantidade, valor in rows}
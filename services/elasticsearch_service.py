@@ -1,60 +1,196 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch, NotFoundError
 from pathlib import Path
 import apsw
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
-from database.connection import get_db_connection
+from database.connection import get_db_connection, get_db_connection_async
 from fastapi import HTTPException
+from config.settings import ELASTICSEARCH_CONFIG
+from services.indexador_pessoas import IndexadorPessoas, checkpoint_pendente, documento_pessoa
+from services.nome_service import indice_disponivel as indice_nomes_disponivel, ranquear_nomes
+from utils.fanout import executar_em_thread
+import asyncio
+import base64
+import json
 import os
 
 logger = logging.getLogger(__name__)
 
+BUSCA_NOME_CONFIG = ELASTICSEARCH_CONFIG['busca_nome']
+
+def _codificar_cursor(sort) -> str:
+    return base64.urlsafe_b64encode(json.dumps(sort).encode()).decode()
+
+def _decodificar_cursor(cursor: str) -> List:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+def _consultar_contatos(query: str, params: list) -> List[tuple]:
+    """Executa a consulta no SRS_CONTATOS (bloqueante, roda no pool de threads)"""
+    with get_db_connection("SRS_CONTATOS") as conn:
+        return conn.cursor().execute(query, params).fetchall()
+
+def montar_query_nome(nome: str, limit: int = 10, ano_nascimento: Optional[int] = None,
+                      sexo: Optional[str] = None, apos: Optional[str] = None) -> Dict:
+    """
+    Corpo da busca por nome.
+
+    Todos os termos precisam casar (com tolerância a erros de digitação); entre os que
+    casam, o nome completo exato vem primeiro, depois a frase na mesma ordem, depois
+    os termos sem correção. Ano de nascimento e sexo são filtros (não alteram o score).
+    """
+    pesos = BUSCA_NOME_CONFIG['pesos']
+    filtros = []
+    if ano_nascimento:
+        filtros.append({"range": {"nascimento": {"gte": f"{ano_nascimento}-01-01", "lte": f"{ano_nascimento}-12-31"}}})
+    if sexo:
+        filtros.append({"term": {"sexo": sexo.upper()}})
+
+    corpo = {
+        "query": {
+            "bool": {
+                "must": [{
+                    "match": {
+                        "nome": {
+                            "query": nome,
+                            "fuzziness": "AUTO",
+                            "prefix_length": 1,
+                            "max_expansions": 20,
+                            "minimum_should_match": BUSCA_NOME_CONFIG['minimo_termos']
+                        }
+                    }
+                }],
+                "should": [
+                    {"term": {"nome.exato": {"value": nome, "boost": pesos['exato']}}},
+                    {"match_phrase": {"nome": {"query": nome, "slop": 1, "boost": pesos['frase']}}},
+                    {"match": {"nome": {"query": nome, "operator": "and", "boost": pesos['termos']}}}
+                ],
+                "filter": filtros
+            }
+        },
+        "_source": BUSCA_NOME_CONFIG['campos'],
+        # Desempate estável para o search_after
+        "sort": [{"_score": "desc"}, {"cpf": "asc"}],
+        "size": min(limit, BUSCA_NOME_CONFIG['max_limit']),
+        "track_total_hits": False
+    }
+    if apos:
+        corpo["search_after"] = _decodificar_cursor(apos)
+    return corpo
+
+CLIENTE_CONFIG = ELASTICSEARCH_CONFIG['cliente']
+
 class ElasticsearchService:
+    """
+    Acesso ao Elasticsearch.
+
+    As buscas usam um único AsyncElasticsearch, aberto no lifespan (iniciar) e
+    compartilhado por todos os requests. A indexação e a gestão de índices continuam
+    no cliente síncrono, executadas em threads (asyncio.to_thread).
+    """
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ElasticsearchService, cls).__new__(cls)
+        return cls._instance
+
     def __init__(self):
+        if self._initialized:
+            return
         try:
-            # Inicializa o cliente do Elasticsearch
+            # Cliente síncrono da indexação (roda em threads, fora do event loop)
             self.es = Elasticsearch(
-                hosts=['http://elasticsearch:9200'],
+                hosts=ELASTICSEARCH_CONFIG['hosts'],
                 verify_certs=False
             )
+            self.es_async: Optional[AsyncElasticsearch] = None
+            # Alias de leitura; os dados ficam em índices versionados ({alias}_vN)
+            self.index_name = ELASTICSEARCH_CONFIG['indice']
+            ElasticsearchService._initialized = True
             logger.info("Elasticsearch inicializado com sucesso")
         except Exception as e:
             logger.error(f"Erro ao inicializar Elasticsearch: {str(e)}")
             raise
+
+    async def iniciar(self):
+        """Abre o cliente assíncrono compartilhado (chamado no lifespan)"""
+        if self.es_async is not None:
+            return
+        self.es_async = AsyncElasticsearch(
+            hosts=ELASTICSEARCH_CONFIG['hosts'],
+            verify_certs=False,
+            connections_per_node=CLIENTE_CONFIG['connections_per_node'],
+            request_timeout=CLIENTE_CONFIG['request_timeout'],
+            max_retries=CLIENTE_CONFIG['max_retries'],
+            retry_on_timeout=CLIENTE_CONFIG['retry_on_timeout']
+        )
+        logger.info(f"Cliente assíncrono do Elasticsearch aberto ({CLIENTE_CONFIG['connections_per_node']} conexões por nó)")
+
+    async def fechar(self):
+        """Fecha o cliente assíncrono e o pool de conexões"""
+        if self.es_async is not None:
+            await self.es_async.close()
+            self.es_async = None
+        self.es.close()
+
+    @property
+    def cliente(self) -> AsyncElasticsearch:
+        if self.es_async is None:
+            raise RuntimeError("Cliente do Elasticsearch não iniciado; chame ElasticsearchService().iniciar()")
+        return self.es_async
     
-    def check_connection(self):
+    async def check_connection(self) -> bool:
         """Verifica se a conexão com o Elasticsearch está funcionando"""
         try:
-            return self.es.ping()
+            return await self.cliente.options(request_timeout=CLIENTE_CONFIG['timeout_ping'], max_retries=0).ping()
         except Exception as e:
             logger.error(f"Erro ao verificar conexão com Elasticsearch: {str(e)}")
             return False
     
-    async def search_nome(self, nome: str, limit: int = 10):
-        """Busca pessoas por nome"""
+    async def buscar_nome(self, nome: str, limit: int = 10, ano_nascimento: Optional[int] = None,
+                          sexo: Optional[str] = None, apos: Optional[str] = None) -> Dict:
+        """
+        Busca pessoas por nome, ordenadas por relevância.
+
+        Retorna {"resultados": [...], "proximo": cursor}; `proximo` vai em `apos` para
+        buscar a página seguinte (None quando não há mais resultados).
+        """
         try:
-            query = {
-                "query": {
-                    "match": {
-                        "nome": nome
-                    }
-                },
-                "size": limit
-            }
-            
-            response = self.es.search(
-                index="pessoas",
-                body=query
+            response = await self.cliente.search(
+                index=self.index_name,
+                body=montar_query_nome(nome, limit, ano_nascimento, sexo, apos)
             )
             
             hits = response['hits']['hits']
-            return [hit['_source'] for hit in hits]
+            proximo = _codificar_cursor(hits[-1]['sort']) if len(hits) == min(limit, BUSCA_NOME_CONFIG['max_limit']) else None
+            return {"resultados": [hit['_source'] for hit in hits], "proximo": proximo}
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Erro ao buscar por nome: {str(e)}")
             raise
+
+    async def search_nome(self, nome: str, limit: int = 10, **filtros) -> List[Dict]:
+        """Busca pessoas por nome (só a lista de resultados)"""
+        return (await self.buscar_nome(nome, limit, **filtros))["resultados"]
         
     async def create_index(self):
+        """Garante que o alias exista (cria o primeiro índice versionado, se não houver nenhum)"""
+        await asyncio.to_thread(self._garantir_alias)
+
+    def _garantir_alias(self):
+        if self.es.indices.exists(index=self.index_name):
+            return
+        indice = self._nome_versao(self._proxima_versao())
+        self._criar_indice(indice)
+        self.es.indices.put_alias(index=indice, name=self.index_name)
+
+    def _criar_indice(self, indice: str):
         settings = {
             "settings": {
                 "index": {
@@ -69,6 +205,12 @@ class ElasticsearchService:
                             "tokenizer": "standard",
                             "filter": ["lowercase", "asciifolding"]
                         }
+                    },
+                    "normalizer": {
+                        "nome_normalizer": {
+                            "type": "custom",
+                            "filter": ["lowercase", "asciifolding"]
+                        }
                     }
                 }
             },
@@ -76,7 +218,15 @@ class ElasticsearchService:
                 "properties": {
                     "nome": {
                         "type": "text",
-                        "analyzer": "nome_analyzer"
+                        "analyzer": "nome_analyzer",
+                        # Nome completo inteiro, para o casamento exato pesar mais no ranking
+                        "fields": {
+                            "exato": {
+                                "type": "keyword",
+                                "normalizer": "nome_normalizer",
+                                "ignore_above": 256
+                            }
+                        }
                     },
                     "cpf": {
                         "type": "keyword"
@@ -99,12 +249,59 @@ class ElasticsearchService:
             }
         }
         
-        if not self.es.indices.exists(index=self.index_name):
-            self.es.indices.create(index=self.index_name, body=settings)
+        if not self.es.indices.exists(index=indice):
+            self.es.indices.create(index=indice, body=settings)
+
+    # --- Índices versionados e alias -----------------------------------------
+
+    def _nome_versao(self, versao: int) -> str:
+        return f"{self.index_name}_v{versao}"
+
+    def _versoes(self) -> List[int]:
+        prefixo = f"{self.index_name}_v"
+        indices = self.es.indices.get(index=f"{prefixo}*", ignore_unavailable=True, allow_no_indices=True)
+        return sorted(int(nome[len(prefixo):]) for nome in indices if nome[len(prefixo):].isdigit())
+
+    def _proxima_versao(self) -> int:
+        versoes = self._versoes()
+        return versoes[-1] + 1 if versoes else 1
+
+    def _indice_atual(self) -> Optional[str]:
+        """Índice para o qual o alias aponta (None se o alias não existir)"""
+        try:
+            return next(iter(self.es.indices.get_alias(name=self.index_name)))
+        except NotFoundError:
+            return None
+
+    def _high_water(self, indice: str) -> Optional[int]:
+        meta = self.es.indices.get_mapping(index=indice)[indice]["mappings"].get("_meta", {})
+        return meta.get("high_water_rowid")
+
+    def _gravar_high_water(self, indice: str, rowid: int):
+        # Fica no _meta do próprio índice: a marca acompanha os dados que ela descreve
+        self.es.indices.put_mapping(index=indice, meta={"high_water_rowid": rowid})
+
+    def _trocar_alias(self, novo: str):
+        """Aponta o alias para `novo` numa única operação atômica e apaga versões antigas"""
+        acoes = [{"add": {"index": novo, "alias": self.index_name}}]
+        atual = self._indice_atual()
+        if atual:
+            acoes.insert(0, {"remove": {"index": atual, "alias": self.index_name}})
+        elif self.es.indices.exists(index=self.index_name):
+            # Índice legado com o nome do alias: removido na mesma operação da troca
+            acoes.insert(0, {"remove_index": {"index": self.index_name}})
+        self.es.indices.update_aliases(actions=acoes)
+        logger.info(f"Alias {self.index_name} agora aponta para {novo}")
+
+        manter = ELASTICSEARCH_CONFIG['versoes_mantidas']
+        antigas = [self._nome_versao(v) for v in self._versoes() if self._nome_versao(v) != novo]
+        for indice in antigas[:max(0, len(antigas) - manter)]:
+            self.es.indices.delete(index=indice)
+            logger.info(f"Índice antigo removido: {indice}")
             
     async def _get_telefones(self, contatos_id: str) -> List[str]:
         try:
-            with get_db_connection("SRS_HISTORICO_TELEFONES") as tel_conn:
+            async with get_db_connection_async("SRS_HISTORICO_TELEFONES") as tel_conn:
                 tel_cursor = tel_conn.cursor()
                 result = tel_cursor.execute("""
                     SELECT DISTINCT DDD || TELEFONE as telefone
@@ -118,80 +315,69 @@ class ElasticsearchService:
             logger.error(f"Erro ao buscar telefones: {str(e)}")
             return []
     
-    async def index_data(self, batch_size: int = 1000):
-        try:
-            print("\n=== Iniciando indexação ===")
-            
-            if self.es.indices.exists(index=self.index_name):
-                self.es.indices.delete(index=self.index_name)
-                print("🗑️ Índice anterior removido")
-            
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM SRS_CONTATOS")
-                total_registros = cursor.fetchone()[0]
-                print(f"Total de registros a indexar: {total_registros:,}")
-                
-                offset = 0
-                total_indexados = 0
-                
-                while True:
-                    cursor.execute("""
-                        SELECT NOME, CPF, NASC, SEXO, NOME_MAE, NOME_PAI
-                        FROM SRS_CONTATOS 
-                        LIMIT ? OFFSET ?
-                    """, (batch_size, offset))
-                    
-                    rows = cursor.fetchall()
-                    if not rows:
-                        break
-                    
-                    actions = []
-                    for row in rows:
-                        # Converte a data para o formato ISO sem timezone
-                        data_nascimento = row[2].split()[0] if row[2] else None
-                        
-                        doc = {
-                            "nome": row[0],
-                            "cpf": row[1],
-                            "nascimento": data_nascimento,  # Apenas YYYY-MM-DD
-                            "sexo": row[3],
-                            "nome_mae": row[4],
-                            "nome_pai": row[5] if row[5] != "N/A" else None
-                        }
-                        actions.extend([
-                            {"index": {"_index": self.index_name}},
-                            doc
-                        ])
-                    
-                    if actions:
-                        response = self.es.bulk(body=actions, refresh=True)
-                        if response.get('errors'):
-                            erros = [item for item in response['items'] if item['index'].get('error')]
-                            print(f"❌ Erros na indexação do lote ({len(erros)} documentos):")
-                            for erro in erros[:3]:
-                                print(f"- {erro['index']['error']['reason']}")
-                        else:
-                            total_indexados += len(actions) // 2
-                            print(f"✓ Indexados {total_indexados:,} de {total_registros:,} registros")
-                    
-                    offset += batch_size
-                
-            print(f"\n✅ Indexação concluída! Total de registros: {total_indexados:,}")
-            
-            # Força um refresh do índice
-            self.es.indices.refresh(index=self.index_name)
-            
-            # Verifica o total indexado
-            count = self.es.count(index=self.index_name)
-            print(f"Total de documentos no Elasticsearch: {count['count']:,}")
-                    
-        except Exception as e:
-            print(f"❌ Erro ao indexar dados: {str(e)}")
-            raise
+    def _indexar(self, batch_size: int, particoes: Optional[int], retomar: bool, delta: bool) -> Dict:
+        pendente = checkpoint_pendente() if retomar else None
+        if pendente and pendente.get("delta", False) != delta:
+            pendente = None
+
+        if delta:
+            destino = self._indice_atual()
+            if destino is None:
+                raise RuntimeError(f"Alias {self.index_name} não existe; rode uma carga completa antes do delta")
+            desde_rowid = self._high_water(destino)
+            if desde_rowid is None:
+                raise RuntimeError(f"Índice {destino} sem high-water mark; rode uma carga completa")
+            if pendente and pendente["indice"] == destino:
+                desde_rowid = pendente["faixas"][0]["inicio"] - 1
+        else:
+            # Carga completa num índice novo; o alias continua servindo o atual até a troca
+            destino = pendente["indice"] if pendente else self._nome_versao(self._proxima_versao())
+            desde_rowid = None
+
+        print(f"Índice de destino: {destino} ({'delta desde rowid ' + str(desde_rowid) if delta else 'carga completa'})")
+        indexador = IndexadorPessoas(self.es, destino, particoes=particoes, chunk_size=batch_size)
+        relatorio = indexador.executar(lambda: self._criar_indice(destino), retomar, desde_rowid)
+
+        if relatorio["high_water_rowid"] is not None:
+            self._gravar_high_water(destino, relatorio["high_water_rowid"])
+        if not delta:
+            self._trocar_alias(destino)
+        return {**relatorio, "indice": destino}
+
+    async def index_data(self, batch_size: int = 1000, particoes: int = None, retomar: bool = True,
+                         delta: bool = False) -> Dict:
+        """
+        Indexa o SRS_CONTATOS sem tirar a busca do ar.
 
-    async def _search_nome_sqlite(self, nome: str, limit: int = 10) -> List[Dict]:
-        """Método de fallback para buscar por nome usando SQLite"""
+        A carga completa vai para um índice novo ({alias}_vN) e só no fim o alias é trocado,
+        atomicamente. O delta indexa no índice atual apenas as linhas com rowid acima do
+        high-water mark guardado no _meta dele.
+
+        - **batch_size**: documentos por requisição _bulk
+        - **particoes**: faixas de rowid lidas e enviadas em paralelo
+        - **retomar**: continua do último checkpoint, se houver
+        - **delta**: indexa só as linhas novas
+        """
+        print("\n=== Iniciando indexação ===")
+        relatorio = await asyncio.to_thread(self._indexar, batch_size, particoes, retomar, delta)
+
+        print(f"\n✅ Indexação concluída! Total de registros: {relatorio['indexados']:,}")
+        print(f"Erros: {relatorio['erros']:,} | Duração: {relatorio['duracao_s']}s | {relatorio['docs_por_segundo']:,} docs/s")
+
+        # Verifica o total indexado
+        count = await self.cliente.count(index=self.index_name)
+        print(f"Total de documentos no Elasticsearch: {count['count']:,}")
+        return relatorio
+
+    async def _search_nome_sqlite(self, nome: str, limit: int = 10, ano_nascimento: Optional[int] = None,
+                                  sexo: Optional[str] = None) -> List[Dict]:
+        """
+        Busca por nome no SQLite, usada quando o Elasticsearch está fora.
+
+        Usa o ranking do índice FTS5 de nomes quando ele existe (com LIKE como
+        último recurso). Os resultados têm os mesmos campos dos documentos do
+        Elasticsearch, então o cliente não distingue quem respondeu.
+        """
         try:
             nomes = nome.strip().split()
             if len(nomes) < 2:
@@ -200,55 +386,49 @@ class ElasticsearchService:
                     detail="Por favor, forneça nome e sobrenome para busca"
                 )
 
-            with get_db_connection("SRS_CONTATOS") as conn, \
-                 get_db_connection("SRS_HISTORICO_TELEFONES") as tel_conn:
-                
-                cursor = conn.cursor()
-                cursor.execute("PRAGMA temp_store=MEMORY")
-                cursor.execute("PRAGMA cache_size=-2000000")
-                
-                # Cria condições WHERE para cada parte do nome
-                where_conditions = []
-                params = []
-                for parte_nome in nomes:
-                    where_conditions.append("c.NOME LIKE ?")
-                    params.append(f"%{parte_nome}%")
-                
-                where_clause = " AND ".join(where_conditions)
-                
-                tel_cursor = tel_conn.cursor()
-                tel_cursor.execute("""
-                    CREATE TEMP TABLE IF NOT EXISTS temp_telefones AS
-                    SELECT CONTATOS_ID, GROUP_CONCAT(DDD || TELEFONE) as telefones
-                    FROM SRS_HISTORICO_TELEFONES
-                    GROUP BY CONTATOS_ID
-                """)
-                
+            condicoes = []
+            params = []
+            if ano_nascimento:
+                condicoes.append("substr(c.NASC, 1, 4) = ?")
+                params.append(str(ano_nascimento))
+            if sexo:
+                condicoes.append("c.SEXO = ?")
+                params.append(sexo.upper())
+
+            colunas = "c.NOME, c.CPF, c.NASC, c.SEXO, c.NOME_MAE, c.NOME_PAI"
+            if indice_nomes_disponivel():
+                # Com filtros, parte dos candidatos do ranking é descartada: busca alguns a mais
+                candidatos = limit * (ELASTICSEARCH_CONFIG['roteamento']['fator_candidatos'] if condicoes else 1)
+                rowids = await ranquear_nomes(nome, candidatos)
+                if not rowids:
+                    return []
+                valores = ", ".join("(?, ?)" for _ in rowids)
+                query = f"""
+                    WITH ranking(pos, id) AS (VALUES {valores})
+                    SELECT {colunas}
+                    FROM ranking
+                    JOIN SRS_CONTATOS c ON c.rowid = ranking.id
+                    {'WHERE ' + ' AND '.join(condicoes) if condicoes else ''}
+                    ORDER BY ranking.pos
+                    LIMIT ?
+                """
+                params = [v for pos, rowid in enumerate(rowids) for v in (pos, rowid)] + params
+            else:
+                condicoes = ["c.NOME LIKE ?" for _ in nomes] + condicoes
+                params = [f"%{parte_nome}%" for parte_nome in nomes] + params
                 query = f"""
-                    SELECT 
-                        c.NOME, c.CPF, c.NASC, c.CONTATOS_ID,
-                        COALESCE(t.telefones, '') as telefones
+                    SELECT {colunas}
                     FROM SRS_CONTATOS c
-                    LEFT JOIN temp_telefones t ON c.CONTATOS_ID = t.CONTATOS_ID
-                    WHERE {where_clause}
+                    WHERE {' AND '.join(condicoes)}
                     LIMIT ?
                 """
-                
-                params.append(limit)
-                cursor.execute(query, params)
-                
-                results = []
-                for row in cursor.fetchall():
-                    results.append({
-                        'nome': row[0],
-                        'cpf': row[1],
-                        'nascimento': row[2],
-                        'contatos_id': row[3],
-                        'telefones': row[4].split(',') if row[4] else []
-                    })
-                
-                print(f"✓ Encontrados {len(results)} resultados via SQLite")
-                return results
+            params.append(limit)
+
+            rows = await executar_em_thread(_consultar_contatos, query, params)
+            results = [documento_pessoa(row) for row in rows]
+            
+            print(f"✓ Encontrados {len(results)} resultados via SQLite")
+            return results
                 
         except HTTPException:
             raise
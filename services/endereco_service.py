@@ -1,58 +1,162 @@
 import dask.dataframe as dd
 import logging
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional
 from pathlib import Path
 import pandas as pd
+from config.settings import ENDERECOS_CONFIG, LOTE_CONFIG
+from database.connection import get_db_connection, get_db_path
+from utils.fanout import executar_em_thread
 
 logger = logging.getLogger(__name__)
 
-async def get_endereco(contatos_id: int) -> List[Dict]:
-    """Busca endereços usando Dask para processamento eficiente de grandes datasets"""
+# Resultado da última verificação do índice: (disponível, instante da verificação)
+_indice_status = (False, 0.0)
+
+def _valor(valor) -> str:
+    return str(valor) if pd.notna(valor) else ''
+
+def _formatar_endereco(tipo, nome, numero, complemento, bairro, cidade, uf, cep) -> Optional[Dict]:
+    """Monta o dicionário de saída (mesmo formato para índice e CSV)"""
+    if not (pd.notna(tipo) and pd.notna(nome)):
+        return None
+    return {
+        'logradouro': f"{tipo} {nome}".strip(),
+        'numero': _valor(numero),
+        'complemento': _valor(complemento),
+        'bairro': _valor(bairro),
+        'cidade': _valor(cidade),
+        'uf': _valor(uf),
+        'cep': _valor(cep)
+    }
+
+def indice_disponivel() -> bool:
+    """Verifica se o índice SQLite de endereços foi gerado (resultado cacheado)"""
+    global _indice_status
+    disponivel, verificado_em = _indice_status
+    if time.monotonic() - verificado_em < ENDERECOS_CONFIG['verificacao_indice_ttl']:
+        return disponivel
+
+    disponivel = False
+    try:
+        # Não abre o banco se o arquivo não existir (evita criar um .db vazio)
+        if get_db_path("SRS_TB_ENDERECOS").exists():
+            with get_db_connection("SRS_TB_ENDERECOS") as conn:
+                disponivel = conn.cursor().execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (ENDERECOS_CONFIG['tabela'],)
+                ).fetchone() is not None
+    except Exception as e:
+        logger.error(f"Erro ao verificar índice de endereços: {str(e)}")
+
+    if not disponivel:
+        logger.warning("Índice de endereços indisponível, usando leitura do CSV")
+    _indice_status = (disponivel, time.monotonic())
+    return disponivel
+
+def _buscar_enderecos_indice(contatos_id: int) -> List[Dict]:
+    """Leitura de intervalo na tabela agrupada por CONTATOS_ID"""
+    with get_db_connection("SRS_TB_ENDERECOS") as conn:
+        cursor = conn.cursor()
+        result = cursor.execute(f"""
+            SELECT LOGR_TIPO, LOGR_NOME, LOGR_NUMERO, LOGR_COMPLEMENTO,
+                   BAIRRO, CIDADE, UF, CEP
+            FROM {ENDERECOS_CONFIG['tabela']}
+            WHERE CONTATOS_ID = ?
+            ORDER BY SEQ
+        """, (contatos_id,))
+        enderecos = [_formatar_endereco(*row) for row in result.fetchall()]
+    return [e for e in enderecos if e]
+
+def _ler_csv_enderecos():
+    csv_path = Path(ENDERECOS_CONFIG['csv_path'])
+
+    # Configura Dask para processar o arquivo em chunks
+    ddf = dd.read_csv(csv_path,
+                     blocksize="64MB",
+                     header=0,  # Força primeira linha como cabeçalho
+                     usecols=ENDERECOS_CONFIG['colunas'],
+                     dtype={
+                         'CONTATOS_ID': 'Int64',
+                         'LOGR_TIPO': 'object',
+                         'LOGR_NOME': 'object',
+                         'LOGR_NUMERO': 'object',
+                         'LOGR_COMPLEMENTO': 'object',
+                         'BAIRRO': 'object',
+                         'CIDADE': 'object',
+                         'UF': 'object',
+                         'CEP': 'object'
+                     },
+                     on_bad_lines='skip',
+                     skip_blank_lines=True,  # Pula linhas em branco
+                     comment='(',  # Ignora linhas que começam com (
+                     assume_missing=True)
+    return ddf
+
+def _formatar_linhas_csv(df) -> Dict[int, List[Dict]]:
+    enderecos = {}
+    for _, row in df.iterrows():
+        endereco = _formatar_endereco(
+            row['LOGR_TIPO'], row['LOGR_NOME'], row['LOGR_NUMERO'], row['LOGR_COMPLEMENTO'],
+            row['BAIRRO'], row['CIDADE'], row['UF'], row['CEP']
+        )
+        if endereco:
+            enderecos.setdefault(int(row['CONTATOS_ID']), []).append(endereco)
+    return enderecos
+
+def _buscar_enderecos_csv(contatos_id: int) -> List[Dict]:
+    """Fallback: varre o CSV inteiro com Dask"""
+    ddf = _ler_csv_enderecos()
+
+    # Filtra apenas os registros do CONTATOS_ID específico
+    filtered_df = ddf[ddf.CONTATOS_ID == contatos_id].compute()
+    return _formatar_linhas_csv(filtered_df).get(int(contatos_id), [])
+
+def buscar_enderecos(contatos_id: int) -> List[Dict]:
+    """Busca endereços no índice SQLite (ou no CSV, se o índice não existir)"""
     logger.info(f"Buscando endereços para CONTATOS_ID: {contatos_id}")
+    if indice_disponivel():
+        enderecos = _buscar_enderecos_indice(contatos_id)
+    else:
+        enderecos = _buscar_enderecos_csv(contatos_id)
+
+    logger.info(f"Encontrados {len(enderecos)} endereços")
+    return enderecos
+
+def buscar_enderecos_lote(contatos_ids: List[int]) -> Dict[int, List[Dict]]:
+    """Busca os endereços de vários CONTATOS_IDs (IN por blocos no índice, ou uma única varredura do CSV)"""
+    contatos_ids = sorted({int(c) for c in contatos_ids})
+    if not contatos_ids:
+        return {}
+    logger.info(f"Buscando endereços em lote para {len(contatos_ids)} CONTATOS_IDs")
+
+    if not indice_disponivel():
+        ddf = _ler_csv_enderecos()
+        return _formatar_linhas_csv(ddf[ddf.CONTATOS_ID.isin(contatos_ids)].compute())
+
+    enderecos = {}
+    bloco = LOTE_CONFIG['tamanho_bloco']
+    with get_db_connection("SRS_TB_ENDERECOS") as conn:
+        cursor = conn.cursor()
+        for i in range(0, len(contatos_ids), bloco):
+            parte = contatos_ids[i:i + bloco]
+            result = cursor.execute(f"""
+                SELECT CONTATOS_ID, LOGR_TIPO, LOGR_NOME, LOGR_NUMERO, LOGR_COMPLEMENTO,
+                       BAIRRO, CIDADE, UF, CEP
+                FROM {ENDERECOS_CONFIG['tabela']}
+                WHERE CONTATOS_ID IN ({','.join('?' * len(parte))})
+                ORDER BY CONTATOS_ID, SEQ
+            """, parte)
+            for row in result:
+                endereco = _formatar_endereco(*row[1:])
+                if endereco:
+                    enderecos.setdefault(row[0], []).append(endereco)
+    return enderecos
+
+async def get_endereco(contatos_id: int) -> List[Dict]:
+    """Versão assíncrona: executa a busca no pool de threads"""
     try:
-        csv_path = Path(r"G:\SERASA DB\serasa_enderecos\srs_enderecos.csv")
-        
-        # Configura Dask para processar o arquivo em chunks
-        ddf = dd.read_csv(csv_path,
-                         blocksize="64MB",
-                         header=0,  # Força primeira linha como cabeçalho
-                         usecols=['CONTATOS_ID', 'LOGR_TIPO', 'LOGR_NOME', 'LOGR_NUMERO', 
-                                 'LOGR_COMPLEMENTO', 'BAIRRO', 'CIDADE', 'UF', 'CEP'],
-                         dtype={
-                             'CONTATOS_ID': 'Int64',
-                             'LOGR_TIPO': 'object',
-                             'LOGR_NOME': 'object',
-                             'LOGR_NUMERO': 'object',
-                             'LOGR_COMPLEMENTO': 'object',
-                             'BAIRRO': 'object',
-                             'CIDADE': 'object',
-                             'UF': 'object',
-                             'CEP': 'object'
-                         },
-                         on_bad_lines='skip',
-                         skip_blank_lines=True,  # Pula linhas em branco
-                         comment='(',  # Ignora linhas que começam com (
-                         assume_missing=True)
-        
-        # Filtra apenas os registros do CONTATOS_ID específico
-        filtered_df = ddf[ddf.CONTATOS_ID == contatos_id].compute()
-        
-        enderecos = []
-        for _, row in filtered_df.iterrows():
-            if pd.notna(row['LOGR_TIPO']) and pd.notna(row['LOGR_NOME']):
-                enderecos.append({
-                    'logradouro': f"{row['LOGR_TIPO']} {row['LOGR_NOME']}".strip(),
-                    'numero': str(row['LOGR_NUMERO']) if pd.notna(row['LOGR_NUMERO']) else '',
-                    'complemento': str(row['LOGR_COMPLEMENTO']) if pd.notna(row['LOGR_COMPLEMENTO']) else '',
-                    'bairro': str(row['BAIRRO']) if pd.notna(row['BAIRRO']) else '',
-                    'cidade': str(row['CIDADE']) if pd.notna(row['CIDADE']) else '',
-                    'uf': str(row['UF']) if pd.notna(row['UF']) else '',
-                    'cep': str(row['CEP']) if pd.notna(row['CEP']) else ''
-                })
-            
-        logger.info(f"Encontrados {len(enderecos)} endereços")
-        return enderecos
-            
+        return await executar_em_thread(buscar_enderecos, contatos_id)
     except Exception as e:
         logger.error(f"Erro ao buscar endereços: {str(e)}")
-        return [] 
\ No newline at end of file
+        return []
@@ -4,43 +4,74 @@ from fastapi import HTTPException
 from datetime import datetime
 import logging
 import json
-import time
-from functools import wraps
-from google.auth.exceptions import RefreshError
+import uuid
 from config.firebase_config import get_firebase_credentials
+from config.settings import BILLING_CONFIG, TOKEN_CACHE_CONFIG
+from utils.firebase_retry import firebase_retry, executar_com_retry, CircuitoAbertoError
+from services.billing_ledger import BillingLedger
+from services.token_cache import TokenCache
 
 logger = logging.getLogger(__name__)
 
-def firebase_retry(max_retries=3, delay=2):
-    """Decorator para retry automático em operações do Firebase"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except RefreshError as e:
-                    last_exception = e
-                    if "Invalid JWT Signature" in str(e):
-                        logger.warning(f"JWT Signature error, attempt {attempt + 1}/{max_retries}")
-                        if attempt < max_retries - 1:
-                            time.sleep(delay * (2 ** attempt))  # Exponential backoff
-                            continue
-                    raise
-                except Exception as e:
-                    last_exception = e
-                    logger.error(f"Firebase error: {str(e)}")
-                    if attempt < max_retries - 1:
-                        time.sleep(delay * (2 ** attempt))
-                        continue
-                    raise
-            
-            if last_exception:
-                raise last_exception
-        return wrapper
-    return decorator
+# Claims de tokens de admin já verificados (evita refazer a verificação RSA a cada requisição)
+tokens_verificados = TokenCache(TOKEN_CACHE_CONFIG['max_tokens'])
+
+def _formatar_detalhes(tipo_consulta: str, detalhes: dict = None) -> dict:
+    """Formata detalhes da transação para evitar campos undefined"""
+    detalhes_formatados = {
+        'tipo_consulta': tipo_consulta,
+        'params': {
+            'nome': detalhes.get('nome') if detalhes else None
+        }
+    }
+    if detalhes and 'quantidade' in detalhes:
+        detalhes_formatados['params']['quantidade'] = detalhes['quantidade']
+    return detalhes_formatados
+
+def _debitar_saldo(transaction, doc_ref, valor: float, transacao_data: dict, transacao_id: str) -> float:
+    """
+    Corpo da transação de débito: lê o saldo, valida e grava transação + novo saldo.
+
+    O Firestore refaz a função se outro débito alterar o documento antes do commit,
+    então duas consultas simultâneas nunca descontam do mesmo saldo. O id fixo da
+    transação torna a chamada idempotente: se um commit confirmado teve a resposta
+    perdida, a nova tentativa encontra a transação e não debita de novo.
+    """
+    transacao_ref = doc_ref.collection('transacoes').document(transacao_id)
+    doc = doc_ref.get(transaction=transaction)
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+    saldo_atual = doc.to_dict().get('coins', 0)
+    if transacao_ref.get(transaction=transaction).exists:
+        return saldo_atual
+    if saldo_atual < valor:
+        raise HTTPException(
+            status_code=402,
+            detail=f"Saldo insuficiente. Necessário: {valor}, Disponível: {saldo_atual}"
+        )
+
+    novo_saldo = saldo_atual - valor
+    transaction.set(transacao_ref, transacao_data)
+    transaction.update(doc_ref, {
+        'coins': novo_saldo,
+        'ultima_consulta': datetime.now().isoformat()
+    })
+    return novo_saldo
+
+_debitar_saldo_transacional = firestore.transactional(_debitar_saldo)
+
+def debitar_saldo(db_firestore, user_id: str, valor: float, transacao_data: dict, transacao_id: str) -> float:
+    """Debita o saldo numa transação do Firestore e retorna o novo saldo (bloqueante)"""
+    doc_ref = db_firestore.collection('usuarios').document(user_id)
+    return _debitar_saldo_transacional(db_firestore.transaction(), doc_ref, valor, transacao_data, transacao_id)
+
+async def debitar_saldo_async(db_firestore, user_id: str, valor: float, transacao_data: dict) -> float:
+    """Versão assíncrona: a transação roda fora do event loop, com retry em falhas transitórias"""
+    transacao_id = uuid.uuid4().hex
+    return await executar_com_retry(
+        debitar_saldo, db_firestore, user_id, valor, transacao_data, transacao_id, circuito='firestore'
+    )
 
 class FirebaseService:
     _instance = None
@@ -93,39 +124,17 @@ class FirebaseService:
             logger.error(f"Erro ao verificar conexão com Firestore: {str(e)}")
             return False
         
-    @firebase_retry(max_retries=3, delay=2)
     async def verificar_saldo(self, user_id: str, tipo_consulta: str, valor_consulta: float, detalhes: dict = None) -> bool:
         logger.info(f"Verificando saldo para usuário {user_id} - tipo consulta: {tipo_consulta} - valor: {valor_consulta}")
         
         try:
-            # Busca o usuário no Firestore
-            db_firestore = firestore.client()
-            doc_ref = db_firestore.collection('usuarios').document(user_id)
-            doc = doc_ref.get()
-            if not doc.exists:
-                raise HTTPException(status_code=404, detail="Usuário não encontrado")
-
-            usuario = doc.to_dict()
-            saldo_atual = usuario.get('coins', 0)
-            
-            if saldo_atual < valor_consulta:
-                raise HTTPException(
-                    status_code=402,
-                    detail=f"Saldo insuficiente. Necessário: {valor_consulta}, Disponível: {saldo_atual}"
-                )
-            
-            novo_saldo = saldo_atual - valor_consulta
-            
-            # Formata detalhes para evitar campos undefined
-            detalhes_formatados = {
-                'tipo_consulta': tipo_consulta,
-                'params': {
-                    'nome': detalhes.get('nome') if detalhes else None
-                }
-            }
-            
-            # Registra transação
-            transacoes_ref = doc_ref.collection('transacoes')
+            detalhes_formatados = _formatar_detalhes(tipo_consulta, detalhes)
+
+            if BILLING_CONFIG['write_behind']:
+                # Reserva no ledger local; o débito chega ao Firestore em background
+                await BillingLedger().reservar(user_id, tipo_consulta, valor_consulta, detalhes_formatados)
+                return True
+
             transacao_data = {
                 'tipo': 'consulta',
                 'valor': -valor_consulta,
@@ -133,18 +142,15 @@ class FirebaseService:
                 'descricao': f"Consulta {tipo_consulta}",
                 'detalhes': detalhes_formatados
             }
-            transacoes_ref.add(transacao_data)
-            
-            # Atualiza saldo
-            doc_ref.update({
-                'coins': novo_saldo,
-                'ultima_consulta': datetime.now().isoformat()
-            })
+            await debitar_saldo_async(firestore.client(), user_id, valor_consulta, transacao_data)
             
             return True
             
         except HTTPException:
             raise
+        except CircuitoAbertoError as e:
+            logger.error(f"Erro ao verificar saldo: {str(e)}")
+            raise HTTPException(status_code=503, detail="Serviço de saldo temporariamente indisponível")
         except Exception as e:
             logger.error(f"Erro ao verificar saldo: {str(e)}")
             raise HTTPException(status_code=500, detail="Erro ao processar verificação de saldo")
@@ -171,16 +177,18 @@ class FirebaseService:
                 detail="Erro ao registrar transação"
             )
 
-    @firebase_retry(max_retries=3, delay=2)
     async def authenticate_user(self, email: str, password: str):
         """Autentica um usuário com email e senha"""
         try:
             # Tenta fazer login com email/senha
-            user = auth.get_user_by_email(email)
+            user = await executar_com_retry(auth.get_user_by_email, email, circuito='firebase_auth')
             return user
         except auth.UserNotFoundError:
             logger.error(f"Usuário não encontrado: {email}")
             return None
+        except CircuitoAbertoError as e:
+            logger.error(f"Erro ao autenticar usuário: {str(e)}")
+            raise HTTPException(status_code=503, detail="Serviço de autenticação temporariamente indisponível")
         except Exception as e:
             logger.error(f"Erro ao autenticar usuário: {str(e)}")
             raise HTTPException(
@@ -188,11 +196,13 @@ class FirebaseService:
                 detail="Erro ao autenticar usuário"
             )
 
-    @firebase_retry(max_retries=3, delay=2)
     async def create_custom_token(self, uid: str) -> str:
         """Cria um token JWT personalizado para o usuário"""
         try:
-            return auth.create_custom_token(uid)
+            return await executar_com_retry(auth.create_custom_token, uid, circuito='firebase_auth')
+        except CircuitoAbertoError as e:
+            logger.error(f"Erro ao criar token: {str(e)}")
+            raise HTTPException(status_code=503, detail="Serviço de autenticação temporariamente indisponível")
         except Exception as e:
             logger.error(f"Erro ao criar token: {str(e)}")
             raise HTTPException(
@@ -200,12 +210,18 @@ class FirebaseService:
                 detail="Erro ao gerar token de autenticação"
             )
 
-    @firebase_retry(max_retries=3, delay=2)
     async def verify_admin_token(self, token: str):
         """Verifica se o token é válido e pertence a um admin"""
+        decoded_token = tokens_verificados.obter(token)
+        if decoded_token is not None:
+            return decoded_token
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = await executar_com_retry(auth.verify_id_token, token, circuito='firebase_auth')
+            tokens_verificados.guardar(token, decoded_token)
             return decoded_token
+        except CircuitoAbertoError as e:
+            logger.error(f"Erro ao verificar token: {str(e)}")
+            raise HTTPException(status_code=503, detail="Serviço de autenticação temporariamente indisponível")
         except Exception as e:
             logger.error(f"Erro ao verificar token: {str(e)}")
             raise HTTPException(
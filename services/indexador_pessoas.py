@@ -0,0 +1,265 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from elasticsearch import Elasticsearch, helpers
+from config.settings import ELASTICSEARCH_CONFIG
+from database.connection import create_db_connection
+
+logger = logging.getLogger(__name__)
+
+CONFIG = ELASTICSEARCH_CONFIG['indexacao']
+
+def documento_pessoa(row) -> Dict:
+    """Documento do índice a partir de (NOME, CPF, NASC, SEXO, NOME_MAE, NOME_PAI)"""
+    return {
+        "nome": row[0],
+        "cpf": row[1],
+        # Converte a data para o formato ISO sem timezone (apenas YYYY-MM-DD)
+        "nascimento": row[2].split()[0] if row[2] else None,
+        "sexo": row[3],
+        "nome_mae": row[4],
+        "nome_pai": row[5] if row[5] != "N/A" else None
+    }
+
+def _particionar(inicio: int, fim: int, particoes: int) -> List[Dict]:
+    """Divide [inicio, fim] de rowid em faixas contíguas de tamanho parecido"""
+    tamanho = max(1, -(-(fim - inicio + 1) // particoes))
+    faixas = []
+    for ini in range(inicio, fim + 1, tamanho):
+        faixas.append({"inicio": ini, "fim": min(ini + tamanho - 1, fim), "ultimo_rowid": ini - 1, "indexados": 0, "erros": 0})
+    return faixas
+
+class Checkpoint:
+    """Progresso por partição num JSON gravado de forma atômica (tmp + rename)"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.estado: Dict = {}
+
+    def carregar(self) -> Optional[Dict]:
+        if not self.path.exists():
+            return None
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def gravar(self):
+        with self.lock:
+            conteudo = json.dumps(self.estado, indent=1)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def remover(self):
+        if self.path.exists():
+            self.path.unlink()
+
+def checkpoint_pendente(checkpoint_path: Optional[str] = None) -> Optional[Dict]:
+    """Estado de uma execução interrompida (índice de destino, modo e progresso), se houver"""
+    return Checkpoint(Path(checkpoint_path or CONFIG['checkpoint_path'])).carregar()
+
+class IndexadorPessoas:
+    """
+    Indexação do SRS_CONTATOS no Elasticsearch (carga completa ou delta por rowid).
+
+    A tabela é dividida em faixas de rowid lidas em paralelo com paginação keyset
+    (WHERE rowid > último lido), sem OFFSET. Cada faixa alimenta um streaming_bulk
+    próprio e o último rowid confirmado pelo Elasticsearch vai para o checkpoint: depois
+    de uma queda, a carga continua de onde parou. O _id do documento é o rowid, então
+    reenviar o trecho entre o checkpoint e a queda não duplica nada. Durante a carga o
+    índice fica sem refresh e sem réplicas; os valores originais voltam no fim.
+    """
+
+    def __init__(self, es: Elasticsearch, indice: str, particoes: Optional[int] = None,
+                 chunk_size: Optional[int] = None, checkpoint_path: Optional[str] = None):
+        # Requisições _bulk grandes demoram mais que o timeout padrão do cliente
+        self.es = es.options(request_timeout=120)
+        self.indice = indice
+        self.particoes = particoes or CONFIG['particoes']
+        self.chunk_size = chunk_size or CONFIG['chunk_size']
+        self.checkpoint = Checkpoint(Path(checkpoint_path or CONFIG['checkpoint_path']))
+        self._parar = threading.Event()
+
+    def _limites_rowid(self):
+        conn = create_db_connection("SRS_CONTATOS")
+        try:
+            return conn.execute("SELECT MIN(rowid), MAX(rowid) FROM SRS_CONTATOS").fetchone()
+        finally:
+            conn.close()
+
+    def _ler_faixa(self, faixa: Dict, lidos: deque) -> Iterator[Dict]:
+        """Ações de indexação da faixa, em ordem de rowid, a partir do checkpoint (rowids anotados em `lidos`)"""
+        conn = create_db_connection("SRS_CONTATOS")
+        try:
+            ultimo = faixa["ultimo_rowid"]
+            while not self._parar.is_set():
+                rows = conn.execute("""
+                    SELECT rowid, NOME, CPF, NASC, SEXO, NOME_MAE, NOME_PAI
+                    FROM SRS_CONTATOS
+                    WHERE rowid > ? AND rowid <= ?
+                    ORDER BY rowid
+                    LIMIT ?
+                """, (ultimo, faixa["fim"], CONFIG['leitura_bloco'])).fetchall()
+                if not rows:
+                    return
+                for row in rows:
+                    lidos.append(row[0])
+                    yield {"_index": self.indice, "_id": row[0], "_source": documento_pessoa(row[1:])}
+                ultimo = rows[-1][0]
+        finally:
+            conn.close()
+
+    def _indexar_faixa(self, numero: int, faixa: Dict):
+        lidos = deque()
+        confirmados = set()
+        resultados = helpers.streaming_bulk(
+            self.es,
+            self._ler_faixa(faixa, lidos),
+            chunk_size=self.chunk_size,
+            max_chunk_bytes=CONFIG['max_chunk_bytes'],
+            max_retries=CONFIG['max_retries'],
+            raise_on_error=False,
+            raise_on_exception=True,
+            yield_ok=True
+        )
+        # Com max_retries, os itens recusados com 429 só saem depois dos seguintes: o
+        # checkpoint avança até o maior rowid sem nenhum anterior ainda em aberto
+        for ok, item in resultados:
+            info = item.get("index", item)
+            confirmados.add(int(info["_id"]))
+            with self.checkpoint.lock:
+                while lidos and lidos[0] in confirmados:
+                    confirmados.discard(lidos[0])
+                    faixa["ultimo_rowid"] = lidos.popleft()
+                if ok:
+                    faixa["indexados"] += 1
+                else:
+                    faixa["erros"] += 1
+            if not ok and faixa["erros"] <= 3:
+                logger.error(f"Erro ao indexar rowid {info['_id']} (partição {numero}): {info.get('error')}")
+        logger.info(f"Partição {numero} concluída: {faixa['indexados']:,} documentos")
+
+    def _preparar_indice(self, criar_indice) -> Dict:
+        """Cria o índice (se preciso) e desliga refresh e réplicas; retorna os valores originais"""
+        if not self.es.indices.exists(index=self.indice):
+            criar_indice()
+        atuais = self.es.indices.get_settings(index=self.indice, include_defaults=True)[self.indice]
+        originais = {
+            "refresh_interval": atuais["settings"]["index"].get("refresh_interval")
+                or atuais["defaults"]["index"].get("refresh_interval", "1s"),
+            "number_of_replicas": atuais["settings"]["index"].get("number_of_replicas", "1"),
+        }
+        self.es.indices.put_settings(index=self.indice, settings={
+            "index": {"refresh_interval": "-1", "number_of_replicas": 0}
+        })
+        return originais
+
+    def _restaurar_indice(self, originais: Dict):
+        self.es.indices.put_settings(index=self.indice, settings={"index": originais})
+        self.es.indices.refresh(index=self.indice)
+
+    def _total(self) -> int:
+        with self.checkpoint.lock:
+            return sum(f["indexados"] for f in self.checkpoint.estado["faixas"])
+
+    def _relatar(self, inicio: float, base: int):
+        total = self._total()
+        duracao = time.monotonic() - inicio
+        taxa = (total - base) / duracao if duracao else 0.0
+        logger.info(f"Indexados {total:,} documentos ({taxa:,.0f} docs/s)")
+        return taxa
+
+    def executar(self, criar_indice, retomar: bool = True, desde_rowid: Optional[int] = None) -> Dict:
+        """
+        Executa (ou retoma) a indexação.
+
+        - **criar_indice**: função que cria o índice com settings e mappings
+        - **retomar**: continua do checkpoint, se houver um do mesmo índice; senão recomeça do zero
+        - **desde_rowid**: modo delta; indexa só as linhas com rowid maior, num índice já em uso
+          (sem recriá-lo nem desligar o refresh)
+
+        O relatório traz `high_water_rowid`: o maior rowid coberto por esta execução.
+        """
+        delta = desde_rowid is not None
+        anterior = self.checkpoint.carregar() if retomar else None
+        if anterior and anterior.get("indice") == self.indice and anterior.get("delta", False) == delta:
+            logger.info(f"Retomando indexação do checkpoint {self.checkpoint.path}")
+            self.checkpoint.estado = anterior
+        else:
+            minimo, maximo = self._limites_rowid()
+            if delta:
+                minimo = desde_rowid + 1
+            elif self.es.indices.exists(index=self.indice):
+                self.es.indices.delete(index=self.indice)
+                logger.info("Índice anterior removido")
+            if maximo is None or minimo > maximo:
+                logger.info("Nenhuma linha nova a indexar")
+                return {
+                    "indexados": 0, "erros": 0, "duracao_s": 0.0, "docs_por_segundo": 0.0,
+                    "high_water_rowid": desde_rowid if delta else None, "particoes": []
+                }
+            self.checkpoint.estado = {
+                "indice": self.indice,
+                "delta": delta,
+                "high_water_rowid": maximo,
+                "faixas": _particionar(minimo, maximo, self.particoes),
+                "settings_originais": None
+            }
+
+        if not delta:
+            originais = self._preparar_indice(criar_indice)
+            # Numa retomada o índice já está sem refresh: valem os valores guardados na primeira execução
+            self.checkpoint.estado["settings_originais"] = self.checkpoint.estado["settings_originais"] or originais
+        self.checkpoint.gravar()
+
+        faixas = self.checkpoint.estado["faixas"]
+        pendentes = [(n, f) for n, f in enumerate(faixas) if f["ultimo_rowid"] < f["fim"]]
+        base = self._total()
+        inicio = time.monotonic()
+        logger.info(f"Indexando {len(pendentes)} partições em paralelo (chunk de {self.chunk_size} documentos)")
+
+        with ThreadPoolExecutor(max_workers=max(1, len(pendentes)), thread_name_prefix="indexador") as executor:
+            futuros = [executor.submit(self._indexar_faixa, n, f) for n, f in pendentes]
+            try:
+                while wait(futuros, timeout=CONFIG['intervalo_checkpoint']).not_done:
+                    self.checkpoint.gravar()
+                    self._relatar(inicio, base)
+                for futuro in futuros:
+                    futuro.result()
+            except BaseException:
+                # Ctrl+C ou erro numa partição: para as leituras e guarda o progresso
+                self._parar.set()
+                for futuro in futuros:
+                    futuro.cancel()
+                executor.shutdown(wait=True)
+                self.checkpoint.gravar()
+                raise
+
+        if delta:
+            self.es.indices.refresh(index=self.indice)
+        else:
+            self._restaurar_indice(self.checkpoint.estado["settings_originais"])
+        duracao = time.monotonic() - inicio
+        relatorio = {
+            "indexados": self._total(),
+            "erros": sum(f["erros"] for f in faixas),
+            "duracao_s": round(duracao, 1),
+            "docs_por_segundo": round((self._total() - base) / duracao, 1) if duracao else 0.0,
+            "high_water_rowid": self.checkpoint.estado["high_water_rowid"],
+            "particoes": [
+                {"inicio": f["inicio"], "fim": f["fim"], "indexados": f["indexados"], "erros": f["erros"]}
+                for f in faixas
+            ]
+        }
+        self.checkpoint.remover()
+        return relatorio
@@ -0,0 +1,189 @@
+import logging
+import re
+import time
+from typing import List, Optional, Tuple
+from unidecode import unidecode
+from config.settings import NOME_FONETICO_CONFIG, NOME_FTS_CONFIG
+from database.connection import get_db_connection, get_db_path
+from utils.fanout import executar_em_thread
+
+logger = logging.getLogger(__name__)
+
+# Resultado da última verificação de cada índice: (disponível, instante da verificação)
+_indice_status = (False, 0.0)
+_indice_fonetico_status = (False, 0.0)
+
+# Colunas indexadas, na ordem da tabela FTS5
+COLUNAS_FTS = ("NOME", "NOME_MAE", "NOME_PAI")
+
+# Partículas que não viram chave fonética
+PARTICULAS = frozenset(("DA", "DAS", "DE", "DO", "DOS", "E"))
+
+# Regras fonéticas do português do Brasil, aplicadas em ordem sobre o termo sem acento.
+# Letras minúsculas marcam sons já resolvidos (g e k duros antes de E/I).
+_REGRAS_FONETICAS = [
+    (re.compile(r"PH"), "F"),
+    (re.compile(r"TH"), "T"),
+    (re.compile(r"[CS]H"), "X"),
+    (re.compile(r"LH"), "L"),
+    (re.compile(r"NH"), "N"),
+    (re.compile(r"SC(?=[EI])"), "S"),
+    (re.compile(r"GU(?=[EI])"), "g"),
+    (re.compile(r"QU(?=[EI])"), "k"),
+    (re.compile(r"C(?=[EIY])"), "S"),
+    (re.compile(r"G(?=[EIY])"), "J"),
+    (re.compile(r"[CQ]"), "K"),
+    (re.compile(r"g"), "G"),
+    (re.compile(r"k"), "K"),
+    (re.compile(r"Y"), "I"),
+    (re.compile(r"W"), "V"),
+    (re.compile(r"Z"), "S"),
+    (re.compile(r"H"), ""),
+    (re.compile(r"M(?![AEIOU])"), "N"),
+    (re.compile(r"(.)\1+"), r"\1"),
+]
+
+
+def normalizar_nome(nome: Optional[str]) -> str:
+    """Remove acentos e converte para maiúsculas (mesma regra na carga e na busca)"""
+    return unidecode(nome).upper() if nome else ""
+
+
+def expressao_fts(nome: str, coluna: str = "NOME") -> Optional[str]:
+    """Monta a consulta FTS5: todos os termos, cada um como prefixo, na coluna pedida"""
+    termos = re.findall(r"[A-Z0-9]+", normalizar_nome(nome))
+    if not termos:
+        return None
+    prefixos = " AND ".join('"' + termo + '"*' for termo in termos)
+    return f"{coluna} : ({prefixos})"
+
+
+def chave_fonetica(termo: str) -> str:
+    """
+    Chave fonética de um termo do nome: grafias que soam igual dão a mesma chave
+    (SOUSA/SOUZA, LUIS/LUIZ, THIAGO/TIAGO, RAPHAEL/RAFAEL, WILLIAM/WILIAN, KATIA/CATIA)
+    """
+    chave = re.sub(r"[^A-Z]", "", normalizar_nome(termo))
+    for regra, substituto in _REGRAS_FONETICAS:
+        chave = regra.sub(substituto, chave)
+    return chave
+
+
+def chaves_foneticas(nome: Optional[str]) -> List[str]:
+    """Chaves fonéticas distintas dos termos do nome, sem as partículas (DA, DE, DOS...)"""
+    chaves = []
+    for termo in re.findall(r"[A-Z]+", normalizar_nome(nome)):
+        if termo in PARTICULAS:
+            continue
+        chave = chave_fonetica(termo)
+        if chave and chave not in chaves:
+            chaves.append(chave)
+    return chaves
+
+
+def indice_disponivel() -> bool:
+    """Verifica se o índice FTS de nomes foi gerado (resultado cacheado)"""
+    global _indice_status
+    disponivel, verificado_em = _indice_status
+    if time.monotonic() - verificado_em < NOME_FTS_CONFIG['verificacao_indice_ttl']:
+        return disponivel
+
+    disponivel = get_db_path(NOME_FTS_CONFIG['banco']).exists()
+    if not disponivel:
+        logger.warning("Índice FTS de nomes indisponível, usando busca com LIKE")
+    _indice_status = (disponivel, time.monotonic())
+    return disponivel
+
+
+def indice_fonetico_disponivel() -> bool:
+    """Verifica se o índice fonético de nomes foi gerado (resultado cacheado)"""
+    global _indice_fonetico_status
+    disponivel, verificado_em = _indice_fonetico_status
+    if time.monotonic() - verificado_em < NOME_FONETICO_CONFIG['verificacao_indice_ttl']:
+        return disponivel
+
+    disponivel = get_db_path(NOME_FONETICO_CONFIG['banco']).exists()
+    if not disponivel:
+        logger.warning("Índice fonético de nomes indisponível, usando busca literal")
+    _indice_fonetico_status = (disponivel, time.monotonic())
+    return disponivel
+
+
+def _ranquear_nomes(nome: str, limit: int, coluna: str) -> List[int]:
+    expressao = expressao_fts(nome, coluna)
+    if not expressao:
+        return []
+    tabela = NOME_FTS_CONFIG['tabela']
+    pesos = ", ".join(str(p) for p in NOME_FTS_CONFIG['pesos'])
+    with get_db_connection(NOME_FTS_CONFIG['banco']) as conn:
+        result = conn.cursor().execute(f"""
+            SELECT rowid
+            FROM {tabela}
+            WHERE {tabela} MATCH ?
+            ORDER BY bm25({tabela}, {pesos})
+            LIMIT ?
+        """, (expressao, limit))
+        return [row[0] for row in result.fetchall()]
+
+
+async def ranquear_nomes(nome: str, limit: int, coluna: str = "NOME") -> List[int]:
+    """Retorna os rowids de SRS_CONTATOS que casam com o nome, em ordem de relevância (bm25)"""
+    return await executar_em_thread(_ranquear_nomes, nome, limit, coluna)
+
+
+def montar_busca_por_rowids(rowids: List[int]) -> Tuple[str, list]:
+    """Query em SRS_CONTATOS que devolve as pessoas na mesma ordem dos rowids"""
+    if not rowids:
+        return "SELECT NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO FROM SRS_CONTATOS WHERE 0", []
+    valores = ", ".join("(?, ?)" for _ in rowids)
+    params = [valor for pos, rowid in enumerate(rowids) for valor in (pos, rowid)]
+    query = f"""
+        WITH ranking(pos, id) AS (VALUES {valores})
+        SELECT c.NOME, c.CPF, c.NASC, c.NOME_MAE, c.NOME_PAI, c.SEXO
+        FROM ranking
+        JOIN SRS_CONTATOS c ON c.rowid = ranking.id
+        ORDER BY ranking.pos
+    """
+    return query, params
+
+
+def _ranquear_nomes_foneticos(nome: str, limit: int) -> List[int]:
+    chaves = chaves_foneticas(nome)
+    if not chaves:
+        return []
+    tabela = NOME_FONETICO_CONFIG['tabela']
+    marcadores = ",".join("?" * len(chaves))
+    with get_db_connection(NOME_FONETICO_CONFIG['banco']) as conn:
+        cursor = conn.cursor()
+        frequencias = dict(cursor.execute(f"""
+            SELECT CHAVE, FREQ FROM {tabela}_freq WHERE CHAVE IN ({marcadores})
+        """, chaves).fetchall())
+        if len(frequencias) < len(chaves):
+            # Alguma chave não aparece em nenhum nome: a interseção é vazia
+            return []
+        mais_rara, *demais = sorted(chaves, key=frequencias.get)
+
+        intersecao = "".join(
+            f"\n              AND EXISTS (SELECT 1 FROM {tabela} WHERE CHAVE = ? AND ROW_ID = r.ROW_ID)"
+            for _ in demais
+        )
+        result = cursor.execute(f"""
+            SELECT r.ROW_ID
+            FROM {tabela} r
+            WHERE r.CHAVE = ?{intersecao}
+            ORDER BY (SELECT COUNT(*) FROM {tabela} t WHERE t.ROW_ID = r.ROW_ID), r.ROW_ID
+            LIMIT ?
+        """, (mais_rara, *demais, limit))
+        return [row[0] for row in result.fetchall()]
+
+
+async def ranquear_nomes_foneticos(nome: str, limit: int) -> List[int]:
+    """
+    Rowids de SRS_CONTATOS cujo nome soa como o buscado, do mais para o menos parecido.
+
+    Só entram os nomes que têm todas as chaves da busca: a lista da chave mais rara
+    (pela tabela de frequências) é intersectada com as demais, da mais rara para a
+    mais comum, por igualdade no índice de (CHAVE, ROW_ID). O ranking põe antes o
+    nome com menos termos a mais e só então aplica o limite.
+    """
+    return await executar_em_thread(_ranquear_nomes_foneticos, nome, limit)
@@ -1,10 +1,14 @@
-from database.connection import get_db_connection
+from database.connection import get_db_connection, get_attached_connection
+from config.settings import ATTACH_CONFIG, LOTE_CONFIG, DOSSIE_CACHE_CONFIG
+from cache.dossie_cache import DossieCache
 from typing import Dict, Optional, List
 import asyncio
 import logging
+from contextvars import ContextVar
 import apsw
 from fastapi import HTTPException
-from services.endereco_service import get_endereco
+from services.endereco_service import buscar_enderecos, buscar_enderecos_lote
+from utils.fanout import executar_em_thread, executar_secoes
 from pathlib import Path
 import pandas as pd
 from unidecode import unidecode
@@ -19,533 +23,636 @@ if not logger.handlers:
     handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
     logger.addHandler(handler)
 
-async def get_parentes(cpf: str) -> Dict:
+class ContextoPessoa:
+    """Identidade da pessoa resolvida uma única vez por requisição (CPF → CONTATOS_ID)"""
+    __slots__ = ("cpf", "contatos_id", "dados_basicos")
+
+    def __init__(self, cpf: Optional[str], contatos_id, dados_basicos: Optional[tuple] = None):
+        self.cpf = cpf
+        self.contatos_id = contatos_id
+        # Linha de SRS_CONTATOS: NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO, CONTATOS_ID
+        self.dados_basicos = dados_basicos
+
+# Contextos já resolvidos na requisição atual, indexados por CPF
+_contextos_requisicao: ContextVar[Optional[Dict[str, ContextoPessoa]]] = ContextVar(
+    "contextos_requisicao", default=None
+)
+
+def resolver_contexto(cpf: str, contatos_conn = None) -> Optional[ContextoPessoa]:
+    """Busca CONTATOS_ID e os dados básicos do CPF com uma única consulta"""
+    query = """
+        SELECT NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO, CONTATOS_ID
+        FROM SRS_CONTATOS 
+        WHERE CPF = ?
+    """
+    if contatos_conn:
+        row = contatos_conn.cursor().execute(query, (cpf,)).fetchone()
+    elif ATTACH_CONFIG['ativo']:
+        with get_attached_connection() as conn:
+            row = conn.cursor().execute(query, (cpf,)).fetchone()
+    else:
+        with get_db_connection("SRS_CONTATOS") as conn:
+            row = conn.cursor().execute(query, (cpf,)).fetchone()
+    if not row:
+        return None
+    return ContextoPessoa(cpf, row[6], tuple(row))
+
+async def obter_contexto(cpf: str, contatos_conn = None) -> Optional[ContextoPessoa]:
+    """Retorna o contexto do CPF, reaproveitando o já resolvido nesta requisição"""
+    contextos = _contextos_requisicao.get()
+    if contextos is None:
+        contextos = {}
+        _contextos_requisicao.set(contextos)
+    if cpf not in contextos:
+        contexto = await executar_em_thread(resolver_contexto, cpf, contatos_conn)
+        if contexto is None:
+            logger.warning(f"CONTATOS_ID não encontrado para CPF: {cpf}")
+            return None
+        contextos[cpf] = contexto
+    return contextos[cpf]
+
+def _buscar_parentes(ctx: ContextoPessoa) -> List[Dict]:
+    with get_db_connection("SRS_MAPA_PARENTES_ANALYTICS") as conn:
+        cursor = conn.cursor()
+        result = cursor.execute("""
+            SELECT VINCULO, CPF_VINCULO, NOME_VINCULO
+            FROM SRS_MAPA_PARENTES_ANALYTICS 
+            WHERE CPF_Completo = ?
+        """, (ctx.cpf,))
+        return [{"grau": row[0], "cpf": row[1], "nome": row[2]} for row in result]
+
+async def get_parentes(cpf: str) -> List[Dict]:
     try:
-        with get_db_connection("SRS_MAPA_PARENTES_ANALYTICS") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT VINCULO, CPF_VINCULO, NOME_VINCULO
-                FROM SRS_MAPA_PARENTES_ANALYTICS 
-                WHERE CPF_Completo = ?
-            """, (cpf,))
-            return [{"grau": row[0], "cpf": row[1], "nome": row[2]} for row in result]
+        return await executar_em_thread(_buscar_parentes, ContextoPessoa(cpf, None))
     except Exception as e:
         print(f"Erro ao buscar parentes: {str(e)}")
         return []
 
+def _formatar_irpf(row) -> Dict:
+    return {
+        "doc_number": row[0],
+        "instituicao": row[1] or "",
+        "agencia": row[2] or "",
+        "lote": row[3] or "",
+        "ano_referencia": row[4],
+        "data_lote": row[5] or "",
+        "situacao_rf": row[6],
+        "data_consulta": row[7]
+    }
+
+def _buscar_irpf(ctx: ContextoPessoa) -> Optional[Dict]:
+    with get_db_connection("SRS_TB_IRPF") as conn:
+        cursor = conn.cursor()
+        result = cursor.execute("""
+            SELECT 
+                DocNumber,
+                Instituicao_Bancaria,
+                Cod_Agencia,
+                Lote,
+                Ano_Referencia,
+                Dt_Lote,
+                Sit_Receita_Federal,
+                Dt_Consulta
+            FROM SRS_TB_IRPF 
+            WHERE DocNumber = ?
+            ORDER BY Dt_Consulta DESC
+            LIMIT 1
+        """, (ctx.cpf,))
+
+        row = result.fetchone()
+        return _formatar_irpf(row) if row else None
+
 async def get_irpf(cpf: str) -> Optional[Dict]:
     try:
-        with get_db_connection("SRS_TB_IRPF") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT 
-                    DocNumber,
-                    Instituicao_Bancaria,
-                    Cod_Agencia,
-                    Lote,
-                    Ano_Referencia,
-                    Dt_Lote,
-                    Sit_Receita_Federal,
-                    Dt_Consulta
-                FROM SRS_TB_IRPF 
-                WHERE DocNumber = ?
-                ORDER BY Dt_Consulta DESC
-                LIMIT 1
-            """, (cpf,))
-            
-            row = result.fetchone()
-            if row:
-                return {
-                    "doc_number": row[0],
-                    "instituicao": row[1] or "",
-                    "agencia": row[2] or "",
-                    "lote": row[3] or "",
-                    "ano_referencia": row[4],
-                    "data_lote": row[5] or "",
-                    "situacao_rf": row[6],
-                    "data_consulta": row[7]
-                }
-            return None
-            
+        return await executar_em_thread(_buscar_irpf, ContextoPessoa(cpf, None))
     except Exception as e:
         logger.error(f"Erro ao buscar IRPF: {str(e)}")
         return None
 
+def _formatar_score(row) -> Dict:
+    return {
+        "score_csb8": str(row[0]) if row[0] else None,
+        "faixa_csb8": row[1],
+        "score_csba": str(row[2]) if row[2] else None,
+        "faixa_csba": row[3]
+    }
+
+def _buscar_score(ctx: ContextoPessoa) -> Optional[Dict]:
+    with get_db_connection("SRS_TB_MODELOS_ANALYTICS_SCORE") as conn:
+        cursor = conn.cursor()
+        result = cursor.execute("""
+            SELECT CSB8, CSB8_FAIXA, CSBA, CSBA_FAIXA
+            FROM SRS_TB_MODELOS_ANALYTICS_SCORE 
+            WHERE CONTATOS_ID = ?
+        """, (ctx.contatos_id,))
+
+        row = result.fetchone()
+        return _formatar_score(row) if row else None
+
 async def get_score(cpf: str, contatos_conn = None) -> Optional[Dict]:
     try:
-        contatos_id = None
-        if contatos_conn:
-            cursor = contatos_conn.cursor()
-            result = cursor.execute("""
-                SELECT CONTATOS_ID FROM SRS_CONTATOS WHERE CPF = ?
-            """, (cpf,))
-            row = result.fetchone()
-            if row:
-                contatos_id = row[0]
-        else:
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                result = cursor.execute("""
-                    SELECT CONTATOS_ID FROM SRS_CONTATOS WHERE CPF = ?
-                """, (cpf,))
-                row = result.fetchone()
-                if row:
-                    contatos_id = row[0]
-
-        if not contatos_id:
-            return None
-
-        with get_db_connection("SRS_TB_MODELOS_ANALYTICS_SCORE") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT CSB8, CSB8_FAIXA, CSBA, CSBA_FAIXA
-                FROM SRS_TB_MODELOS_ANALYTICS_SCORE 
-                WHERE CONTATOS_ID = ?
-            """, (contatos_id,))
-            
-            row = result.fetchone()
-            if row:
-                return {
-                    "score_csb8": str(row[0]) if row[0] else None,
-                    "faixa_csb8": row[1],
-                    "score_csba": str(row[2]) if row[2] else None,
-                    "faixa_csba": row[3]
-                }
-            return None
-            
+        ctx = await obter_contexto(cpf, contatos_conn)
+        return await executar_em_thread(_buscar_score, ctx) if ctx else None
     except Exception as e:
         logger.error(f"Erro ao buscar score: {str(e)}")
         return None
 
-async def get_pis(cpf: str, contatos_conn = None) -> Optional[str]:
-    try:
-        if contatos_conn:
-            cursor = contatos_conn.cursor()
-        else:
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                
+def _buscar_pis(ctx: ContextoPessoa) -> Optional[str]:
+    with get_db_connection("SRS_TB_PIS") as conn:
+        cursor = conn.cursor()
         result = cursor.execute("""
-            SELECT CONTATOS_ID 
-            FROM SRS_CONTATOS 
-            WHERE CPF = ?
-        """, (cpf,))
+            SELECT PIS
+            FROM SRS_TB_PIS 
+            WHERE CONTATOS_ID = ?
+            ORDER BY DT_INCLUSAO DESC
+            LIMIT 1
+        """, (ctx.contatos_id,))
         row = result.fetchone()
-        if not row:
-            return None
-        contatos_id = row[0]
-
-        with get_db_connection("SRS_TB_PIS") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT PIS
-                FROM SRS_TB_PIS 
-                WHERE CONTATOS_ID = ?
-                ORDER BY DT_INCLUSAO DESC
-                LIMIT 1
-            """, (contatos_id,))
-            row = result.fetchone()
-            return str(row[0]) if row else None
+        return str(row[0]) if row else None
+
+async def get_pis(cpf: str, contatos_conn = None) -> Optional[str]:
+    try:
+        ctx = await obter_contexto(cpf, contatos_conn)
+        return await executar_em_thread(_buscar_pis, ctx) if ctx else None
     except Exception as e:
         print(f"Erro ao buscar PIS: {str(e)}")
         return None
 
-async def get_poder_aquisitivo(cpf: str, contatos_conn = None) -> Optional[Dict]:
-    try:
-        if contatos_conn:
-            cursor = contatos_conn.cursor()
-        else:
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                
-        result = cursor.execute("""
-            SELECT CONTATOS_ID 
-            FROM SRS_CONTATOS 
-            WHERE CPF = ?
-        """, (cpf,))
-        row = result.fetchone()
-        if not row:
+def _formatar_poder_aquisitivo(row) -> Dict:
+    def decode_value(value):
+        if value is None:
             return None
-        contatos_id = row[0]
-
         try:
-            with get_db_connection("SRS_TB_PODER_AQUISITIVO") as conn:
-                cursor = conn.cursor()
-                result = cursor.execute("""
-                    SELECT 
-                        PODER_AQUISITIVO,
-                        RENDA_PODER_AQUISITIVO,
-                        FX_PODER_AQUISITIVO,
-                        COD_PODER_AQUISITIVO
-                    FROM SRS_TB_PODER_AQUISITIVO 
-                    WHERE CONTATOS_ID = ?
-                """, (contatos_id,))
-                row = result.fetchone()
-                if row:
-                    def decode_value(value):
-                        if value is None:
-                            return None
-                        try:
-                            return str(value)
-                        except Exception as e:
-                            logger.error(f"Erro ao decodificar valor: {str(e)}")
-                            return None
-                    
-                    return {
-                        "poder_aquisitivo": decode_value(row[0]),
-                        "renda": decode_value(row[1]),
-                        "faixa": decode_value(row[2]),
-                        "codigo": decode_value(row[3])
-                    }
-                return None
-                
-        except Exception as db_error:
-            logger.error(f"Erro ao acessar banco SRS_TB_PODER_AQUISITIVO: {str(db_error)}")
+            return str(value)
+        except Exception as e:
+            logger.error(f"Erro ao decodificar valor: {str(e)}")
             return None
-            
-    except Exception as e:
-        logger.error(f"Erro ao buscar poder aquisitivo: {str(e)}")
-        return None
+    
+    return {
+        "poder_aquisitivo": decode_value(row[0]),
+        "renda": decode_value(row[1]),
+        "faixa": decode_value(row[2]),
+        "codigo": decode_value(row[3])
+    }
+
+def _buscar_poder_aquisitivo(ctx: ContextoPessoa) -> Optional[Dict]:
+    with get_db_connection("SRS_TB_PODER_AQUISITIVO") as conn:
+        cursor = conn.cursor()
+        result = cursor.execute("""
+            SELECT 
+                PODER_AQUISITIVO,
+                RENDA_PODER_AQUISITIVO,
+                FX_PODER_AQUISITIVO,
+                COD_PODER_AQUISITIVO
+            FROM SRS_TB_PODER_AQUISITIVO 
+            WHERE CONTATOS_ID = ?
+        """, (ctx.contatos_id,))
+        row = result.fetchone()
+        return _formatar_poder_aquisitivo(row) if row else None
 
-async def get_profissao(cpf: str, contatos_conn = None) -> Optional[Dict]:
+async def get_poder_aquisitivo(cpf: str, contatos_conn = None) -> Optional[Dict]:
     try:
-        if contatos_conn:
-            cursor = contatos_conn.cursor()
-        else:
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                
+        ctx = await obter_contexto(cpf, contatos_conn)
+        return await executar_em_thread(_buscar_poder_aquisitivo, ctx) if ctx else None
+    except Exception as db_error:
+        logger.error(f"Erro ao acessar banco SRS_TB_PODER_AQUISITIVO: {str(db_error)}")
+        return None
+
+def _formatar_profissao(row) -> Dict:
+    return {
+        "id_profissao": row[0],
+        "codigo": row[1],
+        "descricao": row[2],
+        "cadastro_id": row[3],
+        "data_inclusao": row[4],
+        "incremento": row[5],
+        "atualizacao": row[6],
+        "cbo_inexistente": row[7],
+        "profissao_igual": row[8]
+    }
+
+def _buscar_profissao(ctx: ContextoPessoa) -> Optional[Dict]:
+    with get_db_connection("SRS_TB_PROFISSAO") as conn:
+        cursor = conn.cursor()
         result = cursor.execute("""
-            SELECT CONTATOS_ID 
-            FROM SRS_CONTATOS 
-            WHERE CPF = ?
-        """, (cpf,))
+            SELECT 
+                ID_PROFISSAO,
+                COD_PROFISSAO,
+                DESCRICAO_PROFISSAO,
+                CADASTRO_ID,
+                DT_INCLUSAO,
+                INCREMENTO,
+                ATUALIZACAO,
+                CBO_INEXISTENTE,
+                PROFISSAO_IGUAL
+            FROM SRS_TB_PROFISSAO 
+            WHERE CONTATOS_ID = ?
+            ORDER BY DT_INCLUSAO DESC
+            LIMIT 1
+        """, (ctx.contatos_id,))
         row = result.fetchone()
-        if not row:
-            return None
-        contatos_id = row[0]
+        return _formatar_profissao(row) if row else None
 
-        with get_db_connection("SRS_TB_PROFISSAO") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT 
-                    ID_PROFISSAO,
-                    COD_PROFISSAO,
-                    DESCRICAO_PROFISSAO,
-                    CADASTRO_ID,
-                    DT_INCLUSAO,
-                    INCREMENTO,
-                    ATUALIZACAO,
-                    CBO_INEXISTENTE,
-                    PROFISSAO_IGUAL
-                FROM SRS_TB_PROFISSAO 
-                WHERE CONTATOS_ID = ?
-                ORDER BY DT_INCLUSAO DESC
-                LIMIT 1
-            """, (contatos_id,))
-            row = result.fetchone()
-            return {
-                "id_profissao": row[0],
-                "codigo": row[1],
-                "descricao": row[2],
-                "cadastro_id": row[3],
-                "data_inclusao": row[4],
-                "incremento": row[5],
-                "atualizacao": row[6],
-                "cbo_inexistente": row[7],
-                "profissao_igual": row[8]
-            } if row else None
+async def get_profissao(cpf: str, contatos_conn = None) -> Optional[Dict]:
+    try:
+        ctx = await obter_contexto(cpf, contatos_conn)
+        return await executar_em_thread(_buscar_profissao, ctx) if ctx else None
     except Exception as e:
         print(f"Erro ao buscar profissão: {str(e)}")
         return None
 
-async def get_dados_eleitorais(cpf: str, contatos_conn = None) -> Optional[Dict]:
-    try:
-        if contatos_conn:
-            cursor = contatos_conn.cursor()
-        else:
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                
+def _formatar_dados_eleitorais(row) -> Dict:
+    return {
+        "titulo": row[0],
+        "zona": row[1],
+        "secao": row[2]
+    }
+
+def _buscar_dados_eleitorais(ctx: ContextoPessoa) -> Optional[Dict]:
+    with get_db_connection("SRS_TB_TSE") as conn:
+        cursor = conn.cursor()
         result = cursor.execute("""
-            SELECT CONTATOS_ID 
-            FROM SRS_CONTATOS 
-            WHERE CPF = ?
-        """, (cpf,))
+            SELECT TITULO_ELEITOR, ZONA, SECAO
+            FROM SRS_TB_TSE 
+            WHERE CONTATOS_ID = ?
+        """, (ctx.contatos_id,))
         row = result.fetchone()
-        if not row:
-            return None
-        contatos_id = row[0]
-
-        with get_db_connection("SRS_TB_TSE") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT TITULO_ELEITOR, ZONA, SECAO
-                FROM SRS_TB_TSE 
-                WHERE CONTATOS_ID = ?
-            """, (contatos_id,))
-            row = result.fetchone()
-            return {
-                "titulo": row[0] if row else None,
-                "zona": row[1] if row else None,
-                "secao": row[2] if row else None
-            } if row else None
+        return _formatar_dados_eleitorais(row) if row else None
+
+async def get_dados_eleitorais(cpf: str, contatos_conn = None) -> Optional[Dict]:
+    try:
+        ctx = await obter_contexto(cpf, contatos_conn)
+        return await executar_em_thread(_buscar_dados_eleitorais, ctx) if ctx else None
     except Exception as e:
         print(f"Erro ao buscar dados eleitorais: {str(e)}")
         return None
 
-async def get_dados_universitarios(cpf: str, contatos_conn = None) -> Optional[Dict]:
-    try:
-        if contatos_conn:
-            cursor = contatos_conn.cursor()
-        else:
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                
+def _formatar_dados_universitarios(row) -> Dict:
+    return {
+        "nome": row[0],
+        "ano_vestibular": row[1],
+        "faculdade": row[2],
+        "uf": row[3],
+        "campus": row[4],
+        "curso": row[5],
+        "periodo": row[6],
+        "inscricao": row[7],
+        "data_nascimento": row[8],
+        "cota": row[9],
+        "ano_conclusao": row[10],
+        "data_inclusao": row[11],
+        "cadastro_id": row[12]
+    }
+
+def _buscar_dados_universitarios(ctx: ContextoPessoa) -> Optional[Dict]:
+    with get_db_connection("SRS_TB_UNIVERSITARIOS") as conn:
+        cursor = conn.cursor()
         result = cursor.execute("""
-            SELECT CONTATOS_ID 
-            FROM SRS_CONTATOS 
-            WHERE CPF = ?
-        """, (cpf,))
+            SELECT 
+                NOME,
+                ANO_VESTIBULAR,
+                FACULDADE,
+                UF,
+                CAMPUS,
+                CURSO,
+                PERIODO_CURSADO,
+                INSCRICAO_VESTIBULAR,
+                DATA_NASCIMENTO,
+                COTA,
+                ANO_CONCULSAO,
+                DT_INCLUSAO,
+                CADASTRO_ID
+            FROM SRS_TB_UNIVERSITARIOS 
+            WHERE CONTATOS_ID = ?
+            ORDER BY ANO_VESTIBULAR DESC
+            LIMIT 1
+        """, (ctx.contatos_id,))
         row = result.fetchone()
-        if not row:
-            return None
-        contatos_id = row[0]
+        return _formatar_dados_universitarios(row) if row else None
 
-        with get_db_connection("SRS_TB_UNIVERSITARIOS") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT 
-                    NOME,
-                    ANO_VESTIBULAR,
-                    FACULDADE,
-                    UF,
-                    CAMPUS,
-                    CURSO,
-                    PERIODO_CURSADO,
-                    INSCRICAO_VESTIBULAR,
-                    DATA_NASCIMENTO,
-                    COTA,
-                    ANO_CONCULSAO,
-                    DT_INCLUSAO,
-                    CADASTRO_ID
-                FROM SRS_TB_UNIVERSITARIOS 
-                WHERE CONTATOS_ID = ?
-                ORDER BY ANO_VESTIBULAR DESC
-                LIMIT 1
-            """, (contatos_id,))
-            row = result.fetchone()
-            return {
-                "nome": row[0],
-                "ano_vestibular": row[1],
-                "faculdade": row[2],
-                "uf": row[3],
-                "campus": row[4],
-                "curso": row[5],
-                "periodo": row[6],
-                "inscricao": row[7],
-                "data_nascimento": row[8],
-                "cota": row[9],
-                "ano_conclusao": row[10],
-                "data_inclusao": row[11],
-                "cadastro_id": row[12]
-            } if row else None
+async def get_dados_universitarios(cpf: str, contatos_conn = None) -> Optional[Dict]:
+    try:
+        ctx = await obter_contexto(cpf, contatos_conn)
+        return await executar_em_thread(_buscar_dados_universitarios, ctx) if ctx else None
     except Exception as e:
         print(f"Erro ao buscar dados universitários: {str(e)}")
         return None
 
+def _buscar_emails(ctx: ContextoPessoa) -> List[str]:
+    logger.info(f"Iniciando busca de emails para CONTATOS_ID: {ctx.contatos_id}")
+    with get_db_connection("SRS_EMAIL") as conn:
+        cursor = conn.cursor()
+        result = cursor.execute("""
+            SELECT DISTINCT EMAIL 
+            FROM SRS_EMAIL 
+            WHERE CONTATOS_ID = ?
+            AND EMAIL IS NOT NULL 
+            AND EMAIL != ''
+        """, (ctx.contatos_id,))
+        emails = [row[0] for row in result.fetchall()]
+        logger.info(f"Emails encontrados: {emails}")
+        return emails
+
 async def get_emails(cpf: str, contatos_conn = None) -> List[str]:
-    logger.info(f"Iniciando busca de emails para CPF: {cpf}")
     try:
-        contatos_id = None
-        if contatos_conn:
-            cursor = contatos_conn.cursor()
-            result = cursor.execute("""
-                SELECT CONTATOS_ID FROM SRS_CONTATOS WHERE CPF = ?
-            """, (cpf,))
-            row = result.fetchone()
-            if row:
-                contatos_id = row[0]
-        else:
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                result = cursor.execute("""
-                    SELECT CONTATOS_ID FROM SRS_CONTATOS WHERE CPF = ?
-                """, (cpf,))
-                row = result.fetchone()
-                if row:
-                    contatos_id = row[0]
-
-        if not contatos_id:
-            logger.warning(f"CONTATOS_ID não encontrado para CPF: {cpf}")
-            return []
-
-        logger.info(f"CONTATOS_ID encontrado: {contatos_id}")
-        with get_db_connection("SRS_EMAIL") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT DISTINCT EMAIL 
-                FROM SRS_EMAIL 
-                WHERE CONTATOS_ID = ?
-                AND EMAIL IS NOT NULL 
-                AND EMAIL != ''
-            """, (contatos_id,))
-            emails = [row[0] for row in result.fetchall()]
-            logger.info(f"Emails encontrados: {emails}")
-            return emails
-
+        ctx = await obter_contexto(cpf, contatos_conn)
+        return await executar_em_thread(_buscar_emails, ctx) if ctx else []
     except Exception as e:
         logger.error(f"Erro ao buscar emails: {str(e)}")
         return []
 
+def _buscar_telefones(ctx: ContextoPessoa) -> List[str]:
+    logger.info(f"Iniciando busca de telefones para CONTATOS_ID: {ctx.contatos_id}")
+    with get_db_connection("SRS_HISTORICO_TELEFONES") as conn:
+        cursor = conn.cursor()
+        result = cursor.execute("""
+            SELECT DISTINCT DDD || TELEFONE as telefone
+            FROM SRS_HISTORICO_TELEFONES 
+            WHERE CONTATOS_ID = ?
+        """, (ctx.contatos_id,))
+        telefones = [row[0] for row in result.fetchall()]
+        logger.info(f"Telefones encontrados: {telefones}")
+        return telefones
+
 async def get_telefones(cpf: str, contatos_conn = None) -> List[str]:
-    logger.info(f"Iniciando busca de telefones para CPF: {cpf}")
     try:
-        contatos_id = None
-        if contatos_conn:
-            cursor = contatos_conn.cursor()
-            result = cursor.execute("""
-                SELECT CONTATOS_ID FROM SRS_CONTATOS WHERE CPF = ?
-            """, (cpf,))
-            row = result.fetchone()
-            if row:
-                contatos_id = row[0]
-        else:
-            with get_db_connection("SRS_CONTATOS") as conn:
-                cursor = conn.cursor()
-                result = cursor.execute("""
-                    SELECT CONTATOS_ID FROM SRS_CONTATOS WHERE CPF = ?
-                """, (cpf,))
-                row = result.fetchone()
-                if row:
-                    contatos_id = row[0]
-
-        if not contatos_id:
-            logger.warning(f"CONTATOS_ID não encontrado para CPF: {cpf}")
-            return []
-
-        logger.info(f"CONTATOS_ID encontrado: {contatos_id}")
-        with get_db_connection("SRS_HISTORICO_TELEFONES") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT DISTINCT DDD || TELEFONE as telefone
-                FROM SRS_HISTORICO_TELEFONES 
-                WHERE CONTATOS_ID = ?
-            """, (contatos_id,))
-            telefones = [row[0] for row in result.fetchall()]
-            logger.info(f"Telefones encontrados: {telefones}")
-            return telefones
+        ctx = await obter_contexto(cpf, contatos_conn)
+        return await executar_em_thread(_buscar_telefones, ctx) if ctx else []
     except Exception as e:
         logger.error(f"Erro ao buscar telefones: {str(e)}")
         return []
 
-async def get_endereco(contatos_id: str) -> List[Dict]:
+def _buscar_endereco(ctx: ContextoPessoa) -> List[Dict]:
     """Busca endereços usando o serviço dedicado"""
+    # Usa o índice SQLite de endereços (ou o CSV, se o índice não existir)
+    enderecos = buscar_enderecos(int(ctx.contatos_id))
+
+    if not enderecos:
+        logger.warning(f"Nenhum endereço encontrado para CONTATOS_ID: {ctx.contatos_id}")
+        return []
+
+    return enderecos
+
+async def get_endereco(contatos_id: str) -> List[Dict]:
     try:
-        # Removendo a tentativa de conexão SQL e usando apenas o CSV
-        from services.endereco_service import get_endereco as get_endereco_service
-        enderecos = await get_endereco_service(int(contatos_id))
-        
-        if not enderecos:
-            logger.warning(f"Nenhum endereço encontrado para CONTATOS_ID: {contatos_id}")
-            return []
-            
-        return enderecos
-        
+        return await executar_em_thread(_buscar_endereco, ContextoPessoa(None, contatos_id))
     except Exception as e:
         logger.error(f"Erro ao buscar endereços: {str(e)}")
         return []
 
+# Modo attached: as seções de linha única saem de um único SELECT (um LEFT JOIN por
+# banco anexado, cada um com o mesmo filtro/ordenação da consulta isolada) e as listas
+# de um UNION ALL. O marcador "1" em cada subconsulta distingue "sem registro" de NULL.
+_QUERY_DOSSIE_ATTACHED = """
+    SELECT
+        s.m, s.CSB8, s.CSB8_FAIXA, s.CSBA, s.CSBA_FAIXA,
+        i.m, i.DocNumber, i.Instituicao_Bancaria, i.Cod_Agencia, i.Lote,
+            i.Ano_Referencia, i.Dt_Lote, i.Sit_Receita_Federal, i.Dt_Consulta,
+        p.m, p.PIS,
+        pr.m, pr.ID_PROFISSAO, pr.COD_PROFISSAO, pr.DESCRICAO_PROFISSAO, pr.CADASTRO_ID,
+            pr.DT_INCLUSAO, pr.INCREMENTO, pr.ATUALIZACAO, pr.CBO_INEXISTENTE, pr.PROFISSAO_IGUAL,
+        u.m, u.NOME, u.ANO_VESTIBULAR, u.FACULDADE, u.UF, u.CAMPUS, u.CURSO,
+            u.PERIODO_CURSADO, u.INSCRICAO_VESTIBULAR, u.DATA_NASCIMENTO, u.COTA,
+            u.ANO_CONCULSAO, u.DT_INCLUSAO, u.CADASTRO_ID,
+        t.m, t.TITULO_ELEITOR, t.ZONA, t.SECAO
+    FROM (SELECT 1) base
+    LEFT JOIN (
+        SELECT 1 AS m, CSB8, CSB8_FAIXA, CSBA, CSBA_FAIXA
+        FROM SRS_TB_MODELOS_ANALYTICS_SCORE.SRS_TB_MODELOS_ANALYTICS_SCORE
+        WHERE CONTATOS_ID = :contatos_id
+        LIMIT 1
+    ) s ON 1
+    LEFT JOIN (
+        SELECT 1 AS m, DocNumber, Instituicao_Bancaria, Cod_Agencia, Lote,
+               Ano_Referencia, Dt_Lote, Sit_Receita_Federal, Dt_Consulta
+        FROM SRS_TB_IRPF.SRS_TB_IRPF
+        WHERE DocNumber = :cpf
+        ORDER BY Dt_Consulta DESC
+        LIMIT 1
+    ) i ON 1
+    LEFT JOIN (
+        SELECT 1 AS m, PIS
+        FROM SRS_TB_PIS.SRS_TB_PIS
+        WHERE CONTATOS_ID = :contatos_id
+        ORDER BY DT_INCLUSAO DESC
+        LIMIT 1
+    ) p ON 1
+    LEFT JOIN (
+        SELECT 1 AS m, ID_PROFISSAO, COD_PROFISSAO, DESCRICAO_PROFISSAO, CADASTRO_ID,
+               DT_INCLUSAO, INCREMENTO, ATUALIZACAO, CBO_INEXISTENTE, PROFISSAO_IGUAL
+        FROM SRS_TB_PROFISSAO.SRS_TB_PROFISSAO
+        WHERE CONTATOS_ID = :contatos_id
+        ORDER BY DT_INCLUSAO DESC
+        LIMIT 1
+    ) pr ON 1
+    LEFT JOIN (
+        SELECT 1 AS m, NOME, ANO_VESTIBULAR, FACULDADE, UF, CAMPUS, CURSO,
+               PERIODO_CURSADO, INSCRICAO_VESTIBULAR, DATA_NASCIMENTO, COTA,
+               ANO_CONCULSAO, DT_INCLUSAO, CADASTRO_ID
+        FROM SRS_TB_UNIVERSITARIOS.SRS_TB_UNIVERSITARIOS
+        WHERE CONTATOS_ID = :contatos_id
+        ORDER BY ANO_VESTIBULAR DESC
+        LIMIT 1
+    ) u ON 1
+    LEFT JOIN (
+        SELECT 1 AS m, TITULO_ELEITOR, ZONA, SECAO
+        FROM SRS_TB_TSE.SRS_TB_TSE
+        WHERE CONTATOS_ID = :contatos_id
+        LIMIT 1
+    ) t ON 1
+"""
+
+_QUERY_CONTATOS_ATTACHED = """
+    SELECT * FROM (
+        SELECT DISTINCT 'email', EMAIL
+        FROM SRS_EMAIL.SRS_EMAIL
+        WHERE CONTATOS_ID = :contatos_id
+        AND EMAIL IS NOT NULL
+        AND EMAIL != ''
+    )
+    UNION ALL
+    SELECT * FROM (
+        SELECT DISTINCT 'telefone', DDD || TELEFONE
+        FROM SRS_HISTORICO_TELEFONES.SRS_HISTORICO_TELEFONES
+        WHERE CONTATOS_ID = :contatos_id
+    )
+"""
+
+# Seções do dossiê (cada uma cacheada com chave e TTL próprios)
+SECOES_DOSSIE = (
+    "emails", "telefones", "enderecos", "score", "irpf",
+    "pis", "profissao", "educacao", "eleitoral"
+)
+
+# Fatias de _QUERY_DOSSIE_ATTACHED por seção: (início, fim, formatador)
+_SECOES_ATTACHED = {
+    "score": (0, 5, _formatar_score),
+    "irpf": (5, 14, _formatar_irpf),
+    "pis": (14, 16, lambda row: str(row[0])),
+    "profissao": (16, 26, _formatar_profissao),
+    "educacao": (26, 40, _formatar_dados_universitarios),
+    "eleitoral": (40, 44, _formatar_dados_eleitorais),
+}
+
+def _buscar_secoes_attached(ctx: ContextoPessoa) -> Dict:
+    """Busca todas as seções do dossiê (exceto endereços) com duas consultas na conexão attached"""
+    parametros = {"cpf": ctx.cpf, "contatos_id": ctx.contatos_id}
+    with get_attached_connection() as conn:
+        cursor = conn.cursor()
+        row = cursor.execute(_QUERY_DOSSIE_ATTACHED, parametros).fetchone()
+        contatos = cursor.execute(_QUERY_CONTATOS_ATTACHED, parametros).fetchall()
+
+    secoes = {"emails": [], "telefones": []}
+    for tipo, valor in contatos:
+        secoes["emails" if tipo == "email" else "telefones"].append(valor)
+    for nome, (inicio, fim, formatar) in _SECOES_ATTACHED.items():
+        # A primeira coluna da fatia é o marcador de existência do registro
+        secoes[nome] = formatar(row[inicio + 1:fim]) if row[inicio] else None
+    return secoes
+
+async def _buscar_secoes(ctx: ContextoPessoa, secoes: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Executa as seções do dossiê: fan-out por banco ou, no modo attached, consultas combinadas.
+
+    - **secoes**: subconjunto de SECOES_DOSSIE a buscar (todas, se None). No modo attached
+      as seções combinadas vêm juntas, então o resultado pode trazer mais que o pedido.
+    """
+    secoes = set(SECOES_DOSSIE if secoes is None else secoes)
+    if ATTACH_CONFIG['ativo'] and secoes - {"enderecos"}:
+        execucao = await executar_secoes({
+            "attached": (_buscar_secoes_attached, ctx),
+            **({"enderecos": (_buscar_endereco, ctx)} if "enderecos" in secoes else {}),
+        })
+        combinadas = execucao["resultados"]["attached"]
+        status_combinadas = execucao["status"]["attached"]
+        if combinadas is not None:
+            # Todas as seções combinadas compartilham o status da mesma execução
+            resultados = dict(combinadas)
+            status = {nome: status_combinadas for nome in combinadas}
+            if "enderecos" in secoes:
+                resultados["enderecos"] = execucao["resultados"]["enderecos"]
+                status["enderecos"] = execucao["status"]["enderecos"]
+            return {"resultados": resultados, "status": status}
+        logger.warning(f"Modo attached falhou ({status_combinadas['erro']}), usando fan-out por banco")
+
+    fan_out = {
+        "emails": (_buscar_emails, ctx),
+        "telefones": (_buscar_telefones, ctx),
+        "enderecos": (_buscar_endereco, ctx),
+        "score": (_buscar_score, ctx),
+        "irpf": (_buscar_irpf, ctx),
+        "pis": (_buscar_pis, ctx),
+        "profissao": (_buscar_profissao, ctx),
+        "educacao": (_buscar_dados_universitarios, ctx),
+        "eleitoral": (_buscar_dados_eleitorais, ctx),
+    }
+    return await executar_secoes({nome: spec for nome, spec in fan_out.items() if nome in secoes})
+
+def _montar_dossie(pessoa: tuple, secoes: Dict) -> Dict:
+    """Formato de resposta do dossiê (consulta individual e em lote)"""
+    return {
+        "dados_basicos": {
+            "nome": pessoa[0],
+            "cpf": pessoa[1],
+            "nascimento": pessoa[2],
+            "nome_mae": pessoa[3],
+            "nome_pai": pessoa[4],
+            "sexo": pessoa[5]
+        },
+        "contatos": {
+            "emails": secoes["emails"] or [],
+            "telefones": secoes["telefones"] or []
+        },
+        "enderecos": secoes["enderecos"] or [],
+        "financeiro": {
+            "score": secoes["score"],
+            "irpf": secoes["irpf"]
+        },
+        "profissional": {
+            "pis": secoes["pis"],
+            "profissao": secoes["profissao"]
+        },
+        "educacao": secoes["educacao"],
+        "eleitoral": secoes["eleitoral"]
+    }
+
+_STATUS_CACHE = {"status": "cache", "latencia_ms": 0.0, "erro": None}
+
+async def _carregar_dossie(cpf: str, em_cache: Dict) -> Dict:
+    """Busca no banco as seções que não vieram do cache e grava as obtidas com sucesso"""
+    if "basicos" in em_cache:
+        basicos = tuple(em_cache["basicos"])
+        ctx = ContextoPessoa(cpf, basicos[6], basicos)
+    else:
+        logger.info("\n[1/2] Buscando dados básicos...")
+        ctx = await obter_contexto(cpf)
+        if not ctx:
+            logger.error("❌ Pessoa não encontrada")
+            raise HTTPException(status_code=404, detail="Pessoa não encontrada")
+    pessoa = ctx.dados_basicos
+
+    logger.info("✓ Dados básicos encontrados:")
+    logger.info(f"  Nome: {pessoa[0]}")
+    logger.info(f"  CPF: {pessoa[1]}")
+    logger.info(f"  Nascimento: {pessoa[2]}")
+    logger.info(f"  Nome Mãe: {pessoa[3]}")
+    logger.info(f"  Nome Pai: {pessoa[4]}")
+    logger.info(f"  Sexo: {pessoa[5]}")
+    logger.info(f"  CONTATOS_ID: {pessoa[6]}")
+
+    # Cada seção roda em paralelo no pool de threads com timeout próprio
+    faltantes = [secao for secao in SECOES_DOSSIE if secao not in em_cache]
+    logger.info(f"\n[2/2] Buscando {len(faltantes)} seções em paralelo ({len(SECOES_DOSSIE) - len(faltantes)} em cache)...")
+    execucao = await _buscar_secoes(ctx, faltantes)
+    secoes = {**execucao["resultados"], **{s: em_cache[s] for s in SECOES_DOSSIE if s in em_cache}}
+    status_secoes = {
+        secao: execucao["status"][secao] if secao in faltantes else _STATUS_CACHE
+        for secao in SECOES_DOSSIE
+    }
+
+    for nome, status in status_secoes.items():
+        logger.info(f"✓ {nome}: {status['status']} ({status['latencia_ms']}ms)")
+
+    if DOSSIE_CACHE_CONFIG['ativo']:
+        # Seções com erro ou timeout não entram no cache
+        novas = {
+            secao: execucao["resultados"][secao]
+            for secao in faltantes if execucao["status"][secao]["status"] == "ok"
+        }
+        if "basicos" not in em_cache:
+            novas["basicos"] = list(pessoa)
+        await DossieCache().guardar(cpf, novas)
+
+    return {**_montar_dossie(pessoa, secoes), "status_secoes": status_secoes}
+
 async def _consulta_cpf(cpf: str, api_key: str):
     logger.info("\n" + "="*50)
     logger.info(f"INICIANDO CONSULTA PARA CPF: {cpf}")
     logger.info("="*50)
     
     try:
-        logger.info("\n[1/8] Buscando dados básicos...")
-        with get_db_connection("SRS_CONTATOS") as conn:
-            cursor = conn.cursor()
-            result = cursor.execute("""
-                SELECT NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO, CONTATOS_ID
-                FROM SRS_CONTATOS 
-                WHERE CPF = ?
-            """, (cpf,))
-            
-            pessoa = result.fetchone()
-            if not pessoa:
-                logger.error("❌ Pessoa não encontrada")
-                raise HTTPException(status_code=404, detail="Pessoa não encontrada")
-            
-            logger.info("✓ Dados básicos encontrados:")
-            logger.info(f"  Nome: {pessoa[0]}")
-            logger.info(f"  CPF: {pessoa[1]}")
-            logger.info(f"  Nascimento: {pessoa[2]}")
-            logger.info(f"  Nome Mãe: {pessoa[3]}")
-            logger.info(f"  Nome Pai: {pessoa[4]}")
-            logger.info(f"  Sexo: {pessoa[5]}")
-            logger.info(f"  CONTATOS_ID: {pessoa[6]}")
-            
-            logger.info("\n[2/8] Buscando emails...")
-            emails = await get_emails(cpf, conn)
-            logger.info(f"✓ Emails: {emails if emails else 'Não encontrado'}")
-            
-            logger.info("\n[3/8] Buscando telefones...")
-            telefones = await get_telefones(cpf, conn)
-            logger.info(f"✓ Telefones: {telefones if telefones else 'Não encontrado'}")
-            
-            logger.info("\n[4/8] Buscando endereços...")
-            enderecos = await get_endereco(pessoa[6])
-            logger.info(f"✓ Endereços: {enderecos if enderecos else 'Não encontrado'}")
-
-            logger.info("\n[5/8] Buscando dados financeiros...")
-            score = await get_score(cpf, conn)
-            irpf = await get_irpf(cpf)
-            logger.info(f"✓ Score: {score if score else 'Não encontrado'}")
-            logger.info(f"✓ IRPF: {irpf if irpf else 'Não encontrado'}")
-
-            logger.info("\n[6/8] Buscando dados profissionais...")
-            pis = await get_pis(cpf, conn)
-            profissao = await get_profissao(cpf, conn)
-            logger.info(f"✓ PIS: {pis if pis else 'Não encontrado'}")
-            logger.info(f"✓ Profissão: {profissao if profissao else 'Não encontrado'}")
-
-            logger.info("\n[7/8] Buscando dados educacionais...")
-            educacao = await get_dados_universitarios(cpf, conn)
-            logger.info(f"✓ Educação: {educacao if educacao else 'Não encontrado'}")
-
-            logger.info("\n[8/8] Buscando dados eleitorais...")
-            eleitoral = await get_dados_eleitorais(cpf, conn)
-            logger.info(f"✓ Dados Eleitorais: {eleitoral if eleitoral else 'Não encontrado'}")
-
-            logger.info("\n" + "="*50)
-            logger.info("CONSULTA FINALIZADA COM SUCESSO")
-            logger.info("="*50 + "\n")
-
-            return {
-                "dados_basicos": {
-                    "nome": pessoa[0],
-                    "cpf": pessoa[1],
-                    "nascimento": pessoa[2],
-                    "nome_mae": pessoa[3],
-                    "nome_pai": pessoa[4],
-                    "sexo": pessoa[5]
-                },
-                "contatos": {
-                    "emails": emails,
-                    "telefones": telefones
-                },
-                "enderecos": enderecos,
-                "financeiro": {
-                    "score": score,
-                    "irpf": irpf
-                },
-                "profissional": {
-                    "pis": pis,
-                    "profissao": profissao
-                },
-                "educacao": educacao,
-                "eleitoral": eleitoral
-            }
+        if not DOSSIE_CACHE_CONFIG['ativo']:
+            resultado = await _carregar_dossie(cpf, {})
+        else:
+            cache = DossieCache()
+            em_cache = await cache.obter(cpf, ("basicos",) + SECOES_DOSSIE)
+            if len(em_cache) == len(SECOES_DOSSIE) + 1:
+                logger.info("✓ Dossiê completo em cache")
+                resultado = {
+                    **_montar_dossie(tuple(em_cache["basicos"]), em_cache),
+                    "status_secoes": {secao: _STATUS_CACHE for secao in SECOES_DOSSIE}
+                }
+            else:
+                # Consultas simultâneas ao mesmo CPF esperam a mesma busca no banco
+                resultado = await cache.coalescer(cpf, lambda: _carregar_dossie(cpf, em_cache))
+
+        logger.info("\n" + "="*50)
+        logger.info("CONSULTA FINALIZADA COM SUCESSO")
+        logger.info("="*50 + "\n")
+
+        return resultado
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro na consulta: {str(e)}")
         raise HTTPException(
@@ -553,6 +660,136 @@ async def _consulta_cpf(cpf: str, api_key: str):
             detail=f"Erro ao consultar dados: {str(e)}"
         )
 
+# Seções do lote: {nome: (banco, consulta, chave, formatador)}. A primeira coluna é a chave
+# (CONTATOS_ID ou CPF) e a consulta vem ordenada como a individual, de modo que nas seções
+# de linha única vale a primeira linha de cada pessoa. Sem formatador, a seção é uma lista.
+_SECOES_LOTE = {
+    "emails": ("SRS_EMAIL", """
+        SELECT DISTINCT CONTATOS_ID, EMAIL
+        FROM SRS_EMAIL
+        WHERE CONTATOS_ID IN ({marcadores})
+        AND EMAIL IS NOT NULL
+        AND EMAIL != ''
+    """, "contatos_id", None),
+    "telefones": ("SRS_HISTORICO_TELEFONES", """
+        SELECT DISTINCT CONTATOS_ID, DDD || TELEFONE
+        FROM SRS_HISTORICO_TELEFONES
+        WHERE CONTATOS_ID IN ({marcadores})
+    """, "contatos_id", None),
+    "score": ("SRS_TB_MODELOS_ANALYTICS_SCORE", """
+        SELECT CONTATOS_ID, CSB8, CSB8_FAIXA, CSBA, CSBA_FAIXA
+        FROM SRS_TB_MODELOS_ANALYTICS_SCORE
+        WHERE CONTATOS_ID IN ({marcadores})
+    """, "contatos_id", _formatar_score),
+    "irpf": ("SRS_TB_IRPF", """
+        SELECT DocNumber, DocNumber, Instituicao_Bancaria, Cod_Agencia, Lote,
+               Ano_Referencia, Dt_Lote, Sit_Receita_Federal, Dt_Consulta
+        FROM SRS_TB_IRPF
+        WHERE DocNumber IN ({marcadores})
+        ORDER BY DocNumber, Dt_Consulta DESC
+    """, "cpf", _formatar_irpf),
+    "pis": ("SRS_TB_PIS", """
+        SELECT CONTATOS_ID, PIS
+        FROM SRS_TB_PIS
+        WHERE CONTATOS_ID IN ({marcadores})
+        ORDER BY CONTATOS_ID, DT_INCLUSAO DESC
+    """, "contatos_id", lambda row: str(row[0])),
+    "profissao": ("SRS_TB_PROFISSAO", """
+        SELECT CONTATOS_ID, ID_PROFISSAO, COD_PROFISSAO, DESCRICAO_PROFISSAO, CADASTRO_ID,
+               DT_INCLUSAO, INCREMENTO, ATUALIZACAO, CBO_INEXISTENTE, PROFISSAO_IGUAL
+        FROM SRS_TB_PROFISSAO
+        WHERE CONTATOS_ID IN ({marcadores})
+        ORDER BY CONTATOS_ID, DT_INCLUSAO DESC
+    """, "contatos_id", _formatar_profissao),
+    "educacao": ("SRS_TB_UNIVERSITARIOS", """
+        SELECT CONTATOS_ID, NOME, ANO_VESTIBULAR, FACULDADE, UF, CAMPUS, CURSO,
+               PERIODO_CURSADO, INSCRICAO_VESTIBULAR, DATA_NASCIMENTO, COTA,
+               ANO_CONCULSAO, DT_INCLUSAO, CADASTRO_ID
+        FROM SRS_TB_UNIVERSITARIOS
+        WHERE CONTATOS_ID IN ({marcadores})
+        ORDER BY CONTATOS_ID, ANO_VESTIBULAR DESC
+    """, "contatos_id", _formatar_dados_universitarios),
+    "eleitoral": ("SRS_TB_TSE", """
+        SELECT CONTATOS_ID, TITULO_ELEITOR, ZONA, SECAO
+        FROM SRS_TB_TSE
+        WHERE CONTATOS_ID IN ({marcadores})
+    """, "contatos_id", _formatar_dados_eleitorais),
+}
+
+def _consultar_em_blocos(db_name: str, query: str, chaves: List) -> Dict:
+    """Executa a consulta com IN em blocos e agrupa as linhas pela primeira coluna"""
+    linhas = {}
+    bloco = LOTE_CONFIG['tamanho_bloco']
+    with get_db_connection(db_name) as conn:
+        cursor = conn.cursor()
+        for i in range(0, len(chaves), bloco):
+            parte = chaves[i:i + bloco]
+            result = cursor.execute(query.format(marcadores=",".join("?" * len(parte))), parte)
+            for row in result:
+                linhas.setdefault(row[0], []).append(row[1:])
+    return linhas
+
+def resolver_contextos_lote(cpfs: List[str]) -> Dict[str, ContextoPessoa]:
+    """Resolve CONTATOS_ID e dados básicos de vários CPFs com WHERE CPF IN (...)"""
+    linhas = _consultar_em_blocos("SRS_CONTATOS", """
+        SELECT CPF, NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO, CONTATOS_ID
+        FROM SRS_CONTATOS
+        WHERE CPF IN ({marcadores})
+    """, cpfs)
+    return {cpf: ContextoPessoa(cpf, rows[0][6], tuple(rows[0])) for cpf, rows in linhas.items()}
+
+def _buscar_secao_lote(secao: str, contextos: List[ContextoPessoa]) -> Dict:
+    """Busca uma seção para todas as pessoas do lote com uma consulta por tabela"""
+    db_name, query, chave, formatar = _SECOES_LOTE[secao]
+    chaves = list(dict.fromkeys(getattr(ctx, chave) for ctx in contextos))
+    linhas = _consultar_em_blocos(db_name, query, chaves)
+    if formatar is None:
+        return {k: [row[0] for row in rows] for k, rows in linhas.items()}
+    return {k: formatar(rows[0]) for k, rows in linhas.items()}
+
+def _buscar_enderecos_lote(contextos: List[ContextoPessoa]) -> Dict:
+    return buscar_enderecos_lote([ctx.contatos_id for ctx in contextos])
+
+async def consulta_cpf_lote(cpfs: List[str]) -> Dict:
+    """
+    Dossiê de vários CPFs (já validados) com consultas por conjunto.
+
+    Retorna {"resultados": {cpf: dossiê}, "nao_encontrados": [...], "status_secoes": {...}}.
+    """
+    logger.info(f"Iniciando consulta em lote de {len(cpfs)} CPFs")
+    contextos = await executar_em_thread(resolver_contextos_lote, cpfs)
+    encontrados = [contextos[cpf] for cpf in cpfs if cpf in contextos]
+    nao_encontrados = [cpf for cpf in cpfs if cpf not in contextos]
+    logger.info(f"{len(encontrados)} CPFs encontrados, {len(nao_encontrados)} não encontrados")
+
+    if not encontrados:
+        return {"resultados": {}, "nao_encontrados": nao_encontrados, "status_secoes": {}}
+
+    # Uma seção (tabela) por thread, todas em paralelo
+    secoes_lote = {secao: (_buscar_secao_lote, secao, encontrados) for secao in _SECOES_LOTE}
+    secoes_lote["enderecos"] = (_buscar_enderecos_lote, encontrados)
+    execucao = await executar_secoes(
+        secoes_lote,
+        timeouts={secao: LOTE_CONFIG['timeout'] for secao in secoes_lote}
+    )
+    por_secao = execucao["resultados"]
+    chaves = {secao: spec[2] for secao, spec in _SECOES_LOTE.items()}
+    chaves["enderecos"] = "contatos_id"
+
+    resultados = {}
+    for ctx in encontrados:
+        secoes = {
+            secao: (valores or {}).get(getattr(ctx, chaves[secao]))
+            for secao, valores in por_secao.items()
+        }
+        resultados[ctx.cpf] = _montar_dossie(ctx.dados_basicos, secoes)
+
+    return {
+        "resultados": resultados,
+        "nao_encontrados": nao_encontrados,
+        "status_secoes": execucao["status"]
+    }
+
 async def consulta_nome(nome: str, limit: int = 10) -> List[Dict]:
     try:
         async with get_db_connection() as conn:
@@ -1,13 +1,40 @@
 from firebase_admin import firestore
 from fastapi import HTTPException
 from datetime import datetime
+import asyncio
 import logging
-from typing import Dict
+import time
+from typing import Dict, Optional
+from config.settings import PRECOS_CONFIG
 
 logger = logging.getLogger(__name__)
 
+PRECOS_PADRAO = {
+    'cpf': 25.0,
+    'nome': 25.0,
+    'telefone': 25.0,
+    'score': 25.0,
+    'endereco': 25.0,
+    'parentes': 25.0,
+    'email': 25.0,
+    'pis': 25.0,
+    'profissao': 25.0,
+    'educacao': 25.0,
+    'eleitoral': 25.0,
+    'irpf': 25.0
+}
+
 class PrecoService:
+    """
+    Tabela de preços com cache no processo.
+
+    Dentro do TTL os preços saem da memória; depois dele o valor em cache continua
+    sendo servido enquanto uma única tarefa relê o Firestore em background
+    (stale-while-revalidate). Com o listener ativo, alterações feitas por outras
+    instâncias chegam pelo on_snapshot sem esperar o TTL.
+    """
     _instance = None
+    _initialized = False
     
     def __new__(cls):
         if cls._instance is None:
@@ -15,6 +42,8 @@ class PrecoService:
         return cls._instance
     
     def __init__(self):
+        if self._initialized:
+            return
         try:
             self.db = firestore.client()
             self._collection = 'configuracoes'
@@ -22,46 +51,90 @@ class PrecoService:
         except Exception as e:
             logger.error(f"Erro ao inicializar cliente Firestore: {str(e)}")
             raise HTTPException(status_code=500, detail="Erro ao conectar com Firebase")
-        
+
+        # (preços, instante da carga); trocado de uma vez, sem lock
+        self._cache: Optional[tuple] = None
+        # Muda a cada atualização (admin ou listener): uma releitura iniciada antes não grava
+        self._versao = 0
+        self._revalidacao: Optional[asyncio.Task] = None
+        self._listener = None
+        if PRECOS_CONFIG['listener']:
+            self._iniciar_listener()
+        PrecoService._initialized = True
+
+    def _doc_ref(self):
+        return self.db.collection(self._collection).document(self._document)
+
+    def _iniciar_listener(self):
+        def _ao_alterar(snapshots, changes, read_time):
+            for doc in snapshots:
+                if doc.exists:
+                    self._versao += 1
+                    self._cache = (doc.to_dict().get('precos', {}), time.monotonic())
+                    logger.info("Tabela de preços atualizada pelo listener")
+
+        try:
+            self._listener = self._doc_ref().on_snapshot(_ao_alterar)
+        except Exception as e:
+            logger.error(f"Erro ao iniciar listener de preços, usando apenas o TTL: {str(e)}")
+
+    def _ler_precos(self) -> Dict[str, float]:
+        doc_ref = self._doc_ref()
+        doc = doc_ref.get()
+        if doc.exists:
+            data = doc.to_dict()
+            return data.get('precos', {})
+
+        # Cria configuração padrão
+        doc_ref.set({
+            'precos': PRECOS_PADRAO,
+            'ultima_atualizacao': datetime.now().isoformat()
+        })
+        return dict(PRECOS_PADRAO)
+
+    async def _recarregar(self) -> Dict[str, float]:
+        versao = self._versao
+        precos = await asyncio.wait_for(
+            asyncio.to_thread(self._ler_precos),
+            timeout=PRECOS_CONFIG['timeout_firestore']
+        )
+        if self._versao != versao and self._cache is not None:
+            # Os preços mudaram durante a leitura: o que ela trouxe pode ser anterior
+            return self._cache[0]
+        self._cache = (precos, time.monotonic())
+        return precos
+
+    async def _revalidar(self):
+        try:
+            await self._recarregar()
+        except Exception as e:
+            logger.warning(f"Erro ao revalidar preços, mantendo os preços em cache: {str(e) or type(e).__name__}")
+
     async def get_precos(self) -> Dict[str, float]:
+        cache = self._cache
+        if cache is not None:
+            if time.monotonic() - cache[1] >= PRECOS_CONFIG['ttl'] and (
+                self._revalidacao is None or self._revalidacao.done()
+            ):
+                self._revalidacao = asyncio.create_task(self._revalidar())
+            return dict(cache[0])
+
         try:
-            doc_ref = self.db.collection(self._collection).document(self._document)
-            doc = doc_ref.get()
-            if doc.exists:
-                data = doc.to_dict()
-                return data.get('precos', {})
-            else:
-                # Cria configuração padrão
-                precos_padrao = {
-                    'cpf': 25.0,
-                    'nome': 25.0,
-                    'telefone': 25.0,
-                    'score': 25.0,
-                    'endereco': 25.0,
-                    'parentes': 25.0,
-                    'email': 25.0,
-                    'pis': 25.0,
-                    'profissao': 25.0,
-                    'educacao': 25.0,
-                    'eleitoral': 25.0,
-                    'irpf': 25.0
-                }
-                doc_ref.set({
-                    'precos': precos_padrao,
-                    'ultima_atualizacao': datetime.now().isoformat()
-                })
-                return precos_padrao
+            return dict(await self._recarregar())
         except Exception as e:
-            logger.error(f"Erro ao buscar preços: {str(e)}")
+            logger.error(f"Erro ao buscar preços: {str(e) or type(e).__name__}")
             raise HTTPException(status_code=500, detail="Erro ao buscar preços")
         
     async def atualizar_precos(self, novos_precos: dict):
         try:
-            doc_ref = self.db.collection(self._collection).document(self._document)
-            doc_ref.update({
+            doc_ref = self._doc_ref()
+            await asyncio.to_thread(doc_ref.update, {
                 'precos': novos_precos,
                 'ultima_atualizacao': datetime.now().isoformat()
             })
+            # Vale imediatamente nesta instância; as demais recebem pelo listener (ou no TTL)
+            self._versao += 1
+            self._cache = (dict(novos_precos), time.monotonic())
             return novos_precos
         except Exception as e:
             logger.error(f"Erro ao atualizar preços: {str(e)}")
@@ -74,4 +147,4 @@ class PrecoService:
                 status_code=400,
                 detail=f"Tipo de consulta inválido: {tipo_consulta}"
             )
-        return precos[tipo_consulta] 
\ No newline at end of file
+        return precos[tipo_consulta] 
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException
+from config.settings import ELASTICSEARCH_CONFIG
+from services.elasticsearch_service import ElasticsearchService
+
+logger = logging.getLogger(__name__)
+
+CONFIG = ELASTICSEARCH_CONFIG['roteamento']
+
+class RoteadorBuscaNome:
+    """
+    Decide quem responde a busca por nome: o Elasticsearch ou o SQLite local.
+
+    A saúde do Elasticsearch vem de uma sondagem em background (monitorar), não de
+    um ping por request. Ele atende enquanto a última sondagem deu certo e a latência
+    média está dentro do orçamento. Uma busca que falha ou estoura o timeout_busca o
+    marca como degradado e é refeita no SQLite. A próxima sondagem boa o traz de volta.
+    """
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RoteadorBuscaNome, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self.es_service = ElasticsearchService()
+        self._saudavel = False  # até a primeira sondagem
+        self._latencia: Optional[float] = None
+        self._motivo: Optional[str] = "aguardando a primeira sondagem"
+        self._contadores = {"elasticsearch": 0, "sqlite": 0, "fallbacks": 0, "sondagens_falhas": 0}
+        RoteadorBuscaNome._initialized = True
+
+    # --- Saúde ---------------------------------------------------------------
+
+    def _registrar_latencia(self, duracao: float):
+        peso = CONFIG['peso_media']
+        self._latencia = duracao if self._latencia is None else peso * duracao + (1 - peso) * self._latencia
+        if self._latencia > CONFIG['orcamento_latencia']:
+            self._degradar(f"latência média de {self._latencia * 1000:.0f}ms acima do orçamento")
+
+    def _degradar(self, motivo: str):
+        if self._saudavel:
+            logger.warning(f"Busca por nome passando para o SQLite: {motivo}")
+        self._saudavel = False
+        self._motivo = motivo
+
+    def es_disponivel(self) -> bool:
+        return self._saudavel
+
+    async def sondar(self):
+        """Busca vazia no alias: cobre rede, cluster e a existência do índice"""
+        inicio = time.monotonic()
+        try:
+            await self.es_service.cliente.options(
+                request_timeout=CONFIG['timeout_sondagem'], max_retries=0
+            ).search(index=self.es_service.index_name, size=0, track_total_hits=False)
+        except Exception as e:
+            self._contadores["sondagens_falhas"] += 1
+            self._degradar(f"sondagem falhou: {str(e) or type(e).__name__}")
+            return
+        self._registrar_latencia(time.monotonic() - inicio)
+        if self._latencia <= CONFIG['orcamento_latencia'] and not self._saudavel:
+            logger.info("Elasticsearch saudável, busca por nome volta para ele")
+            self._saudavel = True
+            self._motivo = None
+
+    async def monitorar(self):
+        """Sonda o Elasticsearch periodicamente (tarefa do lifespan)"""
+        while True:
+            await self.sondar()
+            await asyncio.sleep(CONFIG['intervalo_sondagem'])
+
+    # --- Busca ---------------------------------------------------------------
+
+    async def buscar(self, nome: str, limit: int = 10, ano_nascimento: Optional[int] = None,
+                     sexo: Optional[str] = None, apos: Optional[str] = None) -> Tuple[Dict, str]:
+        """Retorna a página de resultados e o backend que respondeu ("elasticsearch" ou "sqlite")"""
+        if self.es_disponivel():
+            inicio = time.monotonic()
+            try:
+                pagina = await asyncio.wait_for(
+                    self.es_service.buscar_nome(nome, limit, ano_nascimento, sexo, apos),
+                    timeout=CONFIG['timeout_busca']
+                )
+            except HTTPException:
+                raise
+            except Exception as e:
+                self._contadores["fallbacks"] += 1
+                if isinstance(e, asyncio.TimeoutError):
+                    # Conta como uma medida lenta: uma única sondagem rápida não basta para voltar
+                    self._registrar_latencia(CONFIG['timeout_busca'])
+                self._degradar(f"busca falhou: {str(e) or type(e).__name__}")
+            else:
+                self._registrar_latencia(time.monotonic() - inicio)
+                self._contadores["elasticsearch"] += 1
+                return pagina, "elasticsearch"
+
+        if apos:
+            # O cursor é um search_after do Elasticsearch; o SQLite não tem como continuá-lo
+            raise HTTPException(
+                status_code=503,
+                detail="Paginação indisponível no momento; refaça a busca sem o cursor"
+            )
+        resultados = await self.es_service._search_nome_sqlite(nome, limit, ano_nascimento, sexo)
+        self._contadores["sqlite"] += 1
+        return {"resultados": resultados, "proximo": None}, "sqlite"
+
+    def metricas(self) -> Dict:
+        return {
+            **self._contadores,
+            "backend": "elasticsearch" if self.es_disponivel() else "sqlite",
+            "latencia_media_ms": round(self._latencia * 1000, 1) if self._latencia is not None else None,
+            "motivo": self._motivo
+        }
@@ -0,0 +1,174 @@
+import heapq
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from config.settings import SUGESTOES_NOMES_CONFIG
+from services.nome_service import normalizar_nome
+
+logger = logging.getLogger(__name__)
+
+# Layout do arquivo (little-endian, como os arrays da máquina que gera e lê; seções alinhadas em 8 bytes):
+#   cabeçalho | offsets dos nomes (u64, n+1) | offsets dos prefixos (u64, m+1)
+#   | frequências (u32, n) | top-k por prefixo (u32, m*k) | nomes | prefixos
+MAGICO = b"SGN1"
+CABECALHO = struct.Struct("<4sIIIQQQ")  # mágico, k, limite_varredura, reservado, n, m, bytes dos nomes
+VAZIO = 0xFFFFFFFF  # posição sem sugestão no top-k
+
+_indice: Optional["IndiceSugestoes"] = None
+_indice_lock = threading.Lock()
+_verificado_em = 0.0
+
+
+def normalizar_prefixo(texto: str) -> str:
+    """Mesma normalização dos nomes; espaço no fim é mantido (palavra já completa)"""
+    normalizado = " ".join(normalizar_nome(texto).split())
+    if normalizado and texto[-1:].isspace():
+        normalizado += " "
+    return normalizado
+
+
+def layout(n: int, m: int, k: int, bytes_nomes: int) -> Dict[str, int]:
+    """Posição de cada seção no arquivo"""
+    posicoes = {}
+    atual = CABECALHO.size
+    for secao, tamanho in (
+        ("offsets_nomes", 8 * (n + 1)),
+        ("offsets_prefixos", 8 * (m + 1)),
+        ("frequencias", 4 * n),
+        ("top_k", 4 * m * k),
+        ("nomes", bytes_nomes),
+        ("prefixos", 0),
+    ):
+        atual = (atual + 7) & ~7
+        posicoes[secao] = atual
+        atual += tamanho
+    return posicoes
+
+
+class NomesOrdenados:
+    """Nomes em ordem binária (ASCII) com frequência; busca de faixa por prefixo"""
+
+    def __init__(self, nomes, offsets, frequencias):
+        self.nomes = nomes
+        self.offsets = offsets
+        self.frequencias = frequencias
+        self.total = len(frequencias)
+
+    def nome(self, i: int) -> bytes:
+        return bytes(self.nomes[self.offsets[i]:self.offsets[i + 1]])
+
+    def _limite(self, chave: bytes, lo: int = 0, hi: Optional[int] = None) -> int:
+        """Primeira posição com nome >= chave"""
+        hi = self.total if hi is None else hi
+        while lo < hi:
+            meio = (lo + hi) // 2
+            if self.nome(meio) < chave:
+                lo = meio + 1
+            else:
+                hi = meio
+        return lo
+
+    def faixa(self, prefixo: bytes, lo: int = 0, hi: Optional[int] = None) -> Tuple[int, int]:
+        """[inicio, fim) dos nomes que começam com o prefixo"""
+        inicio = self._limite(prefixo, lo, hi)
+        return inicio, self._limite(prefixo + b"\xff", inicio, hi)
+
+    def top_k(self, posicoes, k: int) -> List[int]:
+        """As k posições mais frequentes (empate: ordem alfabética)"""
+        frequencias = self.frequencias
+        return heapq.nlargest(k, posicoes, key=lambda i: (frequencias[i], -i))
+
+
+class IndiceSugestoes:
+    """
+    Autocomplete de nomes completos sobre um arquivo mapeado em memória (mmap).
+
+    Os nomes ficam ordenados, então os que começam com um prefixo formam uma faixa
+    contígua, achada por busca binária. Faixas pequenas são percorridas na hora;
+    para prefixos com mais de `limite_varredura` nomes o top-k já vem pronto do
+    arquivo. O mapeamento é só leitura: os workers do uvicorn compartilham as
+    mesmas páginas do cache do sistema operacional.
+    """
+
+    def __init__(self, caminho: str):
+        with open(caminho, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            estado = os.fstat(f.fileno())
+        self.identidade = (estado.st_ino, estado.st_mtime_ns)
+        magico, self.k, self.limite_varredura, _, n, m, bytes_nomes = CABECALHO.unpack_from(self._mmap, 0)
+        if magico != MAGICO:
+            raise ValueError(f"Arquivo de sugestões inválido: {caminho}")
+
+        posicoes = layout(n, m, self.k, bytes_nomes)
+        dados = memoryview(self._mmap)
+        self.nomes = NomesOrdenados(
+            dados[posicoes["nomes"]:posicoes["nomes"] + bytes_nomes],
+            dados[posicoes["offsets_nomes"]:posicoes["offsets_nomes"] + 8 * (n + 1)].cast("Q"),
+            dados[posicoes["frequencias"]:posicoes["frequencias"] + 4 * n].cast("I"),
+        )
+        offsets_prefixos = dados[posicoes["offsets_prefixos"]:posicoes["offsets_prefixos"] + 8 * (m + 1)].cast("Q")
+        self.prefixos = NomesOrdenados(
+            dados[posicoes["prefixos"]:posicoes["prefixos"] + offsets_prefixos[m]],
+            offsets_prefixos,
+            range(m),
+        )
+        self._top_k = dados[posicoes["top_k"]:posicoes["top_k"] + 4 * m * self.k].cast("I")
+
+    def _pre_computado(self, prefixo: bytes) -> Optional[List[int]]:
+        i = self.prefixos._limite(prefixo)
+        if i == self.prefixos.total or self.prefixos.nome(i) != prefixo:
+            return None
+        return [p for p in self._top_k[i * self.k:(i + 1) * self.k] if p != VAZIO]
+
+    def sugerir(self, texto: str, limit: int = 10) -> List[Dict]:
+        """Nomes completos mais frequentes que começam com o texto"""
+        prefixo = normalizar_prefixo(texto).encode("ascii", "ignore")
+        if len(prefixo) < SUGESTOES_NOMES_CONFIG['min_caracteres']:
+            return []
+        limit = min(limit, self.k)
+        inicio, fim = self.nomes.faixa(prefixo)
+        if fim - inicio > self.limite_varredura:
+            posicoes = self._pre_computado(prefixo)
+            if posicoes is None:
+                logger.warning(f"Prefixo sem top-k pré-computado: {prefixo!r}")
+                posicoes = self.nomes.top_k(range(inicio, fim), limit)
+        else:
+            posicoes = self.nomes.top_k(range(inicio, fim), limit)
+        return [
+            {"nome": self.nomes.nome(i).decode("ascii"), "frequencia": self.nomes.frequencias[i]}
+            for i in posicoes[:limit]
+        ]
+
+
+def obter_indice() -> Optional[IndiceSugestoes]:
+    """
+    Índice carregado na primeira chamada. A cada `verificacao_arquivo_ttl` segundos
+    confere se o arquivo foi substituído (nova geração) e, nesse caso, recarrega.
+    """
+    global _indice, _verificado_em
+    if _indice is not None and time.monotonic() - _verificado_em < SUGESTOES_NOMES_CONFIG['verificacao_arquivo_ttl']:
+        return _indice
+
+    with _indice_lock:
+        if _indice is not None and time.monotonic() - _verificado_em < SUGESTOES_NOMES_CONFIG['verificacao_arquivo_ttl']:
+            return _indice
+        caminho = SUGESTOES_NOMES_CONFIG['arquivo']
+        try:
+            estado = os.stat(caminho)
+        except FileNotFoundError:
+            if _indice is None:
+                logger.warning(f"Arquivo de sugestões de nomes não encontrado: {caminho}")
+            _verificado_em = time.monotonic()
+            return _indice
+
+        if _indice is None or _indice.identidade != (estado.st_ino, estado.st_mtime_ns):
+            # O índice anterior não é fechado: requests em andamento ainda podem usá-lo
+            _indice = IndiceSugestoes(caminho)
+            logger.info(f"Sugestões de nomes carregadas: {_indice.nomes.total:,} nomes, "
+                        f"{_indice.prefixos.total:,} prefixos pré-computados")
+        _verificado_em = time.monotonic()
+        return _indice
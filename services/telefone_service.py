@@ -0,0 +1,134 @@
+import logging
+import time
+from typing import Dict, List, Optional
+from config.settings import TELEFONE_REVERSO_CONFIG
+from database.connection import get_db_connection, get_db_path
+from utils.fanout import executar_em_thread
+
+logger = logging.getLogger(__name__)
+
+# Resultado da última verificação do índice: (disponível, instante da verificação)
+_indice_status = (False, 0.0)
+
+
+def normalizar_telefone(telefone) -> Optional[str]:
+    """
+    Chave canônica do telefone: DDD + últimos 8 dígitos.
+
+    Aceita +55/0055, prefixo de tronco (0XX) com código de operadora e o 9 extra
+    dos celulares, de modo que 8 e 9 dígitos caem na mesma chave. Retorna None
+    se não sobrar DDD + 8/9 dígitos.
+    """
+    digitos = ''.join(filter(str.isdigit, str(telefone or '')))
+    if digitos.startswith('00'):
+        digitos = digitos[2:]  # discagem internacional
+    if digitos.startswith('0'):
+        digitos = digitos[1:]  # prefixo de tronco
+        if len(digitos) in (12, 13):
+            digitos = digitos[2:]  # código da operadora
+    elif digitos.startswith('55') and len(digitos) in (12, 13):
+        digitos = digitos[2:]  # código do país
+
+    if len(digitos) == 11 and digitos[2] == '9':
+        digitos = digitos[:2] + digitos[3:]  # 9 extra do celular
+    if len(digitos) != 10:
+        return None
+    return digitos
+
+
+def indice_disponivel() -> bool:
+    """Verifica se o índice reverso de telefones foi gerado (resultado cacheado)"""
+    global _indice_status
+    disponivel, verificado_em = _indice_status
+    if time.monotonic() - verificado_em < TELEFONE_REVERSO_CONFIG['verificacao_indice_ttl']:
+        return disponivel
+
+    disponivel = get_db_path(TELEFONE_REVERSO_CONFIG['banco']).exists()
+    if not disponivel:
+        logger.warning("Índice reverso de telefones indisponível, usando busca por DDD + número")
+    _indice_status = (disponivel, time.monotonic())
+    return disponivel
+
+
+def _contatos_ids_por_telefone(telefone: str) -> List:
+    if indice_disponivel():
+        chave = normalizar_telefone(telefone)
+        if not chave:
+            return []
+        with get_db_connection(TELEFONE_REVERSO_CONFIG['banco']) as conn:
+            result = conn.cursor().execute(f"""
+                SELECT CONTATOS_ID
+                FROM {TELEFONE_REVERSO_CONFIG['tabela']}
+                WHERE TELEFONE_NORM = ?
+            """, (chave,))
+            return [row[0] for row in result.fetchall()]
+
+    # Sem o índice: busca exata por DDD + número, como antes
+    telefone = ''.join(filter(str.isdigit, telefone))
+    ddd, num = telefone[:2], telefone[2:]
+    with get_db_connection("SRS_HISTORICO_TELEFONES") as conn:
+        result = conn.cursor().execute("""
+            SELECT DISTINCT CONTATOS_ID 
+            FROM SRS_HISTORICO_TELEFONES 
+            WHERE DDD = ? AND TELEFONE = ?
+        """, (ddd, num))
+        return [row[0] for row in result.fetchall()]
+
+
+async def contatos_ids_por_telefone(telefone: str) -> List:
+    """CONTATOS_IDs que já usaram o telefone (uma leitura no índice reverso)"""
+    return await executar_em_thread(_contatos_ids_por_telefone, telefone)
+
+
+def _telefones_por_contatos_ids(contatos_ids: List) -> Dict[int, List[str]]:
+    if not contatos_ids:
+        return {}
+    telefones = {}
+    with get_db_connection("SRS_HISTORICO_TELEFONES") as conn:
+        result = conn.cursor().execute(f"""
+            SELECT DISTINCT CONTATOS_ID, DDD || TELEFONE
+            FROM SRS_HISTORICO_TELEFONES 
+            WHERE CONTATOS_ID IN ({','.join('?' * len(contatos_ids))})
+        """, list(contatos_ids))
+        for contatos_id, telefone in result:
+            telefones.setdefault(contatos_id, []).append(telefone)
+    return telefones
+
+
+async def telefones_por_contatos_ids(contatos_ids: List) -> Dict[int, List[str]]:
+    """Todos os telefones de vários CONTATOS_IDs com uma única consulta"""
+    if not contatos_ids:
+        return {}
+    return await executar_em_thread(_telefones_por_contatos_ids, contatos_ids)
+
+
+def _buscar_pessoas_por_telefone(telefone: str) -> List[Dict]:
+    contatos_ids = _contatos_ids_por_telefone(telefone)
+    if not contatos_ids:
+        return []
+
+    with get_db_connection("SRS_CONTATOS") as conn:
+        pessoas = conn.cursor().execute(f"""
+            SELECT NOME, CPF, NASC, NOME_MAE, NOME_PAI, SEXO, CONTATOS_ID
+            FROM SRS_CONTATOS 
+            WHERE CONTATOS_ID IN ({','.join('?' * len(contatos_ids))})
+        """, contatos_ids).fetchall()
+
+    telefones = _telefones_por_contatos_ids([row[6] for row in pessoas])
+    return [
+        {
+            "nome": row[0],
+            "cpf": row[1],
+            "nascimento": row[2],
+            "nome_mae": row[3],
+            "nome_pai": row[4],
+            "sexo": row[5],
+            "telefones": telefones.get(row[6], [])
+        }
+        for row in pessoas
+    ]
+
+
+async def buscar_pessoas_por_telefone(telefone: str) -> List[Dict]:
+    """Pessoas que usaram o telefone, com todos os telefones de cada uma"""
+    return await executar_em_thread(_buscar_pessoas_por_telefone, telefone)
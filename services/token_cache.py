@@ -0,0 +1,61 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class TokenCache:
+    """
+    LRU de claims de ID tokens já verificados, indexado pelo SHA-256 do token.
+
+    Cada entrada vale até o `exp` do próprio token, então o cache nunca aceita um
+    token que o verify_id_token recusaria por expiração. Tudo roda no event loop,
+    sem await entre leitura e escrita, então não há lock.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self._tokens: "OrderedDict[str, tuple]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._expirados = 0
+
+    @staticmethod
+    def _chave(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def obter(self, token: str) -> Optional[Dict]:
+        chave = self._chave(token)
+        entrada = self._tokens.get(chave)
+        if entrada is None:
+            self._misses += 1
+            return None
+        claims, exp = entrada
+        if time.time() >= exp:
+            del self._tokens[chave]
+            self._expirados += 1
+            self._misses += 1
+            return None
+        self._tokens.move_to_end(chave)
+        self._hits += 1
+        return claims
+
+    def guardar(self, token: str, claims: Dict):
+        exp = claims.get('exp')
+        if not exp:
+            return
+        self._tokens[self._chave(token)] = (claims, exp)
+        self._tokens.move_to_end(self._chave(token))
+        while len(self._tokens) > self.max_tokens:
+            self._tokens.popitem(last=False)
+
+    def metricas(self) -> Dict:
+        total = self._hits + self._misses
+        return {
+            "tokens": len(self._tokens),
+            "hits": self._hits,
+            "misses": self._misses,
+            "expirados": self._expirados,
+            "taxa_hit": round(self._hits / total, 4) if total else 0.0
+        }
+
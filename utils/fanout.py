@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config.settings import FANOUT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Pool de threads compartilhado por todas as consultas (limita a concorrência no SQLite)
+_executor = ThreadPoolExecutor(
+    max_workers=FANOUT_CONFIG['max_workers'],
+    thread_name_prefix="fanout"
+)
+
+# Latências acumuladas por seção
+_metricas: Dict[str, Dict[str, float]] = {}
+_metricas_lock = threading.Lock()
+
+
+def _registrar_latencia(secao: str, status: str, latencia_ms: float):
+    with _metricas_lock:
+        m = _metricas.setdefault(secao, {
+            "chamadas": 0, "erros": 0, "timeouts": 0,
+            "latencia_total_ms": 0.0, "latencia_max_ms": 0.0
+        })
+        m["chamadas"] += 1
+        if status == "erro":
+            m["erros"] += 1
+        elif status == "timeout":
+            m["timeouts"] += 1
+        m["latencia_total_ms"] += latencia_ms
+        m["latencia_max_ms"] = max(m["latencia_max_ms"], latencia_ms)
+
+
+def metricas_secoes() -> Dict[str, Dict[str, float]]:
+    """Retorna as latências agregadas por seção"""
+    with _metricas_lock:
+        return {
+            secao: {
+                **m,
+                "latencia_media_ms": round(m["latencia_total_ms"] / m["chamadas"], 2) if m["chamadas"] else 0.0
+            }
+            for secao, m in _metricas.items()
+        }
+
+
+async def executar_em_thread(func: Callable, *args) -> Any:
+    """Executa uma função bloqueante no pool de threads do fan-out"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
+
+
+async def _executar_secao(secao: str, func: Callable, args: tuple, timeout: float):
+    inicio = time.perf_counter()
+    try:
+        resultado = await asyncio.wait_for(executar_em_thread(func, *args), timeout=timeout)
+        status, erro = "ok", None
+    except asyncio.TimeoutError:
+        # A thread continua até o fim da query, mas a resposta não espera por ela
+        resultado, status, erro = None, "timeout", f"Tempo limite excedido ({timeout}s)"
+    except Exception as e:
+        resultado, status, erro = None, "erro", str(e)
+
+    latencia_ms = round((time.perf_counter() - inicio) * 1000, 2)
+    _registrar_latencia(secao, status, latencia_ms)
+    if status != "ok":
+        logger.warning(f"Seção {secao} terminou com status {status} em {latencia_ms}ms: {erro}")
+    return resultado, {"status": status, "latencia_ms": latencia_ms, "erro": erro}
+
+
+async def executar_secoes(
+    secoes: Dict[str, tuple],
+    timeouts: Optional[Dict[str, float]] = None
+) -> Dict[str, Dict]:
+    """
+    Executa as seções em paralelo no pool de threads.
+
+    - **secoes**: {nome: (funcao_bloqueante, *args)}
+    - **timeouts**: timeout em segundos por seção (usa FANOUT_CONFIG como padrão)
+
+    Retorna {"resultados": {nome: valor}, "status": {nome: {status, latencia_ms, erro}}}.
+    Seções com erro ou timeout retornam None sem derrubar as demais. As funções devem
+    deixar a exceção subir: é ela que marca a seção como "erro" (e a mantém fora do cache).
+    """
+    timeouts = {**FANOUT_CONFIG['timeouts'], **(timeouts or {})}
+    nomes = list(secoes.keys())
+    execucoes = await asyncio.gather(*[
+        _executar_secao(
+            nome,
+            secoes[nome][0],
+            tuple(secoes[nome][1:]),
+            timeouts.get(nome, FANOUT_CONFIG['timeout_padrao'])
+        )
+        for nome in nomes
+    ])
+    return {
+        "resultados": {nome: resultado for nome, (resultado, _) in zip(nomes, execucoes)},
+        "status": {nome: status for nome, (_, status) in zip(nomes, execucoes)}
+    }
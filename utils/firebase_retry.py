@@ -1,40 +1,216 @@
-
-import time
+import asyncio
+import inspect
 import logging
+import random
+import threading
+import time
 from functools import wraps
-from google.auth.exceptions import RefreshError
+from typing import Any, Callable, Dict, Optional
+import requests
+from google.api_core import exceptions as google_exceptions
+from google.auth.exceptions import RefreshError, TransportError
 from firebase_admin import auth, firestore
+from firebase_admin import exceptions as firebase_exceptions
+from config.settings import FIREBASE_RETRY_CONFIG
 
 logger = logging.getLogger(__name__)
 
-def firebase_retry(max_retries=3, delay=1):
-    """Decorator para retry automático em operações do Firebase"""
+# Falhas de rede/servidor que valem nova tentativa; o resto (usuário inexistente,
+# token inválido, HTTPException da própria API) sobe na primeira ocorrência
+ERROS_TRANSITORIOS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.Aborted,
+    firebase_exceptions.UnavailableError,
+    firebase_exceptions.DeadlineExceededError,
+    firebase_exceptions.InternalError,
+    firebase_exceptions.ResourceExhaustedError,
+    auth.CertificateFetchError,
+    TransportError,
+    requests.ConnectionError,
+    requests.Timeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+class CircuitoAbertoError(Exception):
+    """Chamada recusada sem tentar: o serviço falhou seguidamente e o circuito está aberto"""
+    pass
+
+class CircuitBreaker:
+    """
+    Circuito por serviço: depois de `limite_falhas` falhas transitórias seguidas, recusa
+    chamadas por `tempo_aberto` segundos; então deixa uma passar (meio-aberto) e fecha
+    de novo se ela der certo.
+    """
+
+    def __init__(self, nome: str, limite_falhas: int, tempo_aberto: float):
+        self.nome = nome
+        self.limite_falhas = limite_falhas
+        self.tempo_aberto = tempo_aberto
+        self._lock = threading.Lock()
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._sondando = False
+        self._recusadas = 0
+
+    def permitir(self):
+        with self._lock:
+            if self._falhas < self.limite_falhas:
+                return
+            if time.monotonic() >= self._aberto_ate and not self._sondando:
+                self._sondando = True
+                return
+            self._recusadas += 1
+        raise CircuitoAbertoError(f"Circuito {self.nome} aberto após {self._falhas} falhas seguidas")
+
+    def sucesso(self):
+        with self._lock:
+            if self._falhas >= self.limite_falhas:
+                logger.info(f"Circuito {self.nome} fechado")
+            self._falhas = 0
+            self._sondando = False
+
+    def falha(self):
+        with self._lock:
+            self._falhas += 1
+            self._sondando = False
+            if self._falhas >= self.limite_falhas:
+                self._aberto_ate = time.monotonic() + self.tempo_aberto
+                if self._falhas == self.limite_falhas:
+                    logger.error(f"Circuito {self.nome} aberto por {self.tempo_aberto}s")
+
+    def liberar(self):
+        """Encerra uma sondagem que terminou sem falha transitória"""
+        with self._lock:
+            self._sondando = False
+
+    def metricas(self) -> Dict:
+        with self._lock:
+            return {
+                "estado": "aberto" if self._falhas >= self.limite_falhas else "fechado",
+                "falhas_seguidas": self._falhas,
+                "recusadas": self._recusadas
+            }
+
+_circuitos: Dict[str, CircuitBreaker] = {}
+_circuitos_lock = threading.Lock()
+
+def get_circuito(nome: str) -> CircuitBreaker:
+    circuito = _circuitos.get(nome)
+    if circuito is None:
+        with _circuitos_lock:
+            circuito = _circuitos.setdefault(nome, CircuitBreaker(
+                nome,
+                FIREBASE_RETRY_CONFIG['circuito']['limite_falhas'],
+                FIREBASE_RETRY_CONFIG['circuito']['tempo_aberto']
+            ))
+    return circuito
+
+def metricas_circuitos() -> Dict[str, Dict]:
+    return {nome: circuito.metricas() for nome, circuito in _circuitos.items()}
+
+def erro_transitorio(e: Exception) -> bool:
+    if isinstance(e, RefreshError):
+        # Relógio fora de sincronia com o Google (ver fix_firebase_time_sync.py)
+        return "Invalid JWT Signature" in str(e)
+    return isinstance(e, ERROS_TRANSITORIOS)
+
+def _espera(tentativa: int, atraso: float) -> float:
+    """Backoff exponencial com full jitter"""
+    return random.uniform(0, min(FIREBASE_RETRY_CONFIG['atraso_max'], atraso * (2 ** tentativa)))
+
+async def executar_com_retry(
+    func: Callable,
+    *args,
+    tentativas: Optional[int] = None,
+    atraso: Optional[float] = None,
+    prazo: Optional[float] = None,
+    circuito: str = 'firebase',
+    **kwargs
+) -> Any:
+    """
+    Executa `func` com novas tentativas sem bloquear o event loop.
+
+    Funções síncronas (chamadas do SDK do Firebase) rodam numa thread; corrotinas
+    são aguardadas diretamente. `prazo` limita o tempo total, somando tentativas e
+    esperas. Só erros transitórios são repetidos e contam para o circuito.
+    """
+    tentativas = tentativas or FIREBASE_RETRY_CONFIG['tentativas']
+    atraso = FIREBASE_RETRY_CONFIG['atraso'] if atraso is None else atraso
+    prazo = prazo or FIREBASE_RETRY_CONFIG['prazo']
+    disjuntor = get_circuito(circuito)
+    limite = time.monotonic() + prazo
+
+    for tentativa in range(tentativas):
+        disjuntor.permitir()
+        restante = limite - time.monotonic()
+        try:
+            if inspect.iscoroutinefunction(func):
+                resultado = await asyncio.wait_for(func(*args, **kwargs), timeout=restante)
+            else:
+                resultado = await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout=restante)
+        except Exception as e:
+            if not erro_transitorio(e):
+                disjuntor.liberar()
+                raise
+            disjuntor.falha()
+            espera = _espera(tentativa, atraso)
+            if tentativa == tentativas - 1 or time.monotonic() + espera >= limite:
+                logger.error(f"Firebase ({circuito}) falhou após {tentativa + 1} tentativas: {str(e) or type(e).__name__}")
+                raise
+            logger.warning(f"Firebase ({circuito}) erro transitório, tentativa {tentativa + 1}/{tentativas}: {str(e) or type(e).__name__}")
+            await asyncio.sleep(espera)
+        except BaseException:
+            # Cancelamento (ou interrupção) no meio da tentativa: a sondagem não pode ficar presa
+            disjuntor.liberar()
+            raise
+        else:
+            disjuntor.sucesso()
+            return resultado
+
+def firebase_retry(max_retries=3, delay=1, prazo=None, circuito='firebase'):
+    """
+    Decorator para retry automático em operações do Firebase.
+
+    Em funções async as esperas usam asyncio.sleep; em funções síncronas usam
+    time.sleep e só devem ser chamadas fora do event loop.
+    """
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await executar_com_retry(
+                    func, *args, tentativas=max_retries, atraso=delay, prazo=prazo, circuito=circuito, **kwargs
+                )
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-            
+            disjuntor = get_circuito(circuito)
+            limite = time.monotonic() + (prazo or FIREBASE_RETRY_CONFIG['prazo'])
             for attempt in range(max_retries):
+                disjuntor.permitir()
                 try:
-                    return func(*args, **kwargs)
-                except RefreshError as e:
-                    last_exception = e
-                    if "Invalid JWT Signature" in str(e):
-                        logger.warning(f"JWT Signature error, attempt {attempt + 1}/{max_retries}")
-                        if attempt < max_retries - 1:
-                            time.sleep(delay * (2 ** attempt))  # Exponential backoff
-                            continue
-                    raise
+                    resultado = func(*args, **kwargs)
                 except Exception as e:
-                    last_exception = e
-                    logger.error(f"Firebase error: {str(e)}")
-                    if attempt < max_retries - 1:
-                        time.sleep(delay * (2 ** attempt))
-                        continue
+                    if not erro_transitorio(e):
+                        disjuntor.liberar()
+                        raise
+                    disjuntor.falha()
+                    espera = _espera(attempt, delay)
+                    if attempt == max_retries - 1 or time.monotonic() + espera >= limite:
+                        raise
+                    logger.warning(f"Firebase error, attempt {attempt + 1}/{max_retries}: {str(e)}")
+                    time.sleep(espera)
+                except BaseException:
+                    disjuntor.liberar()
                     raise
-            
-            if last_exception:
-                raise last_exception
+                else:
+                    disjuntor.sucesso()
+                    return resultado
         return wrapper
     return decorator
 
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Optional, Sequence
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from config.settings import STREAM_CONFIG
+from database.connection import get_db_connection_async
+from utils.fanout import executar_em_thread
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def quer_ndjson(request: Request) -> bool:
+    """Verifica se o cliente pediu a resposta em streaming (Accept: application/x-ndjson)"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _linha(registro: Any) -> str:
+    return json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+
+
+async def _executar_interrompivel(conn, func: Callable, *args) -> Any:
+    """
+    Executa uma chamada do cursor numa thread; se a tarefa for cancelada
+    (cliente desconectou), interrompe a query e espera a thread largar a conexão.
+    """
+    tarefa = asyncio.ensure_future(executar_em_thread(func, *args))
+    try:
+        return await asyncio.shield(tarefa)
+    except asyncio.CancelledError:
+        conn.interrupt()
+        try:
+            await tarefa
+        except Exception:
+            pass
+        raise
+
+
+async def stream_query(
+    request: Request,
+    db_name: str,
+    query: str,
+    params: Sequence,
+    formatar: Callable[[tuple], dict],
+    linhas_por_bloco: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Gera NDJSON direto do cursor, um bloco de linhas por vez.
+
+    O próximo bloco só é lido depois que o anterior foi enviado (backpressure do
+    StreamingResponse). Se o cliente desconectar, a query em andamento é interrompida
+    e a conexão volta ao pool.
+    """
+    linhas_por_bloco = linhas_por_bloco or STREAM_CONFIG['linhas_por_bloco']
+    enviados = 0
+    async with get_db_connection_async(db_name) as conn:
+        cursor = conn.cursor()
+        try:
+            await _executar_interrompivel(conn, cursor.execute, query, params)
+            while True:
+                linhas = await _executar_interrompivel(conn, cursor.fetchmany, linhas_por_bloco)
+                if not linhas:
+                    break
+                yield "".join(_linha(formatar(row)) for row in linhas).encode("utf-8")
+                enviados += len(linhas)
+                if await request.is_disconnected():
+                    logger.info(f"Cliente desconectou após {enviados} registros, encerrando stream")
+                    break
+        except asyncio.CancelledError:
+            logger.info(f"Stream cancelado após {enviados} registros")
+            raise
+        except Exception as e:
+            # O status 200 já foi enviado: o erro vai como última linha
+            logger.error(f"Erro durante o stream: {str(e)}")
+            yield _linha({"erro": str(e)}).encode("utf-8")
+        finally:
+            cursor.close()
+
+
+def resposta_ndjson(stream: AsyncIterator[bytes]) -> StreamingResponse:
+    return StreamingResponse(stream, media_type=NDJSON_MEDIA_TYPE)